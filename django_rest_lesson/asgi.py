@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_rest_lesson.settings")
 
 application = get_asgi_application()
+
+from django_rest_lesson.warmup import warm_up  # noqa: E402 (needs django.setup())
+
+warm_up()
@@ -0,0 +1,9 @@
+"""Helpers shared by the bench_* management commands."""
+
+
+def percentile(samples, pct):
+    """The ``pct`` percentile of ``samples`` (nearest rank), 0.0 if empty."""
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
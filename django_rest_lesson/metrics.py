@@ -0,0 +1,348 @@
+"""Request metrics in the Prometheus text format, served at /metrics.
+
+MetricsMiddleware records, per view action (``BusViewSet.list``,
+``OrderViewSet.create``, ``BusViewSet.upload_image``, ...) rather than per
+path: request counts, latency, database time and queries, and response
+size. Values are kept in memory, under one lock, by each process.
+
+Worker processes share their values through ``METRICS_DIR``: every process
+writes a snapshot to ``<METRICS_DIR>/<pid>.json`` at most once per
+``METRICS_FLUSH_INTERVAL`` seconds (and when its gunicorn worker exits),
+and /metrics adds up the snapshots of all processes. Snapshots of exited
+workers are kept, so counters never go down; gunicorn.conf.py empties the
+directory when the server starts. Without ``METRICS_DIR`` every process
+reports only its own requests.
+
+Requests with a method other than the usual ones are labelled "other".
+Database time and queries are recorded for requests served through WSGI,
+as gunicorn.conf.py does; under ASGI the queries run in other threads,
+out of the middleware's reach, and only the other metrics are recorded.
+Streaming responses are timed up to the start of the stream and their
+size is not recorded.
+
+/metrics needs ``Authorization: Bearer <METRICS_TOKEN>``, or a staff user
+signed in to the admin when no token is set.
+"""
+
+import bisect
+import json
+import os
+import pathlib
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# name -> (type, labels, help); histogram buckets come from settings
+METRICS = {
+    "http_requests_total": (
+        COUNTER,
+        ("view", "method", "status"),
+        "Requests handled.",
+    ),
+    "http_request_duration_seconds": (
+        HISTOGRAM,
+        ("view", "method"),
+        "Time to the response, in seconds.",
+    ),
+    "http_request_db_duration_seconds": (
+        HISTOGRAM,
+        ("view", "method"),
+        "Time spent in database queries per request, in seconds.",
+    ),
+    "http_request_db_queries_total": (
+        COUNTER,
+        ("view", "method"),
+        "Database queries run.",
+    ),
+    "http_response_size_bytes": (
+        HISTOGRAM,
+        ("view", "method"),
+        "Response body size, in bytes (not recorded for streaming responses).",
+    ),
+}
+
+
+# request methods labelled as such, any other one is "other"
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+def _buckets(name):
+    if name == "http_response_size_bytes":
+        return settings.METRICS_SIZE_BUCKETS
+    return settings.METRICS_LATENCY_BUCKETS
+
+
+class Registry:
+    """This process's metric values.
+
+    Counters are ``{(name, labels): value}``; histograms are
+    ``{(name, labels): [count per bucket..., count above the last, sum]}``,
+    made cumulative only when rendered.
+    """
+
+    def __init__(self):
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._histograms = {}
+        self._flushed_at = time.monotonic()
+
+    def record_request(self, view, method, status, duration, db, size):
+        """Record one request; ``db`` is a DatabaseTimer, None when the
+        queries weren't timed, ``size`` None for streaming responses."""
+        labels = (view, method)
+        latency_buckets = settings.METRICS_LATENCY_BUCKETS
+        with self._lock:
+            self._counters["http_requests_total", (view, method, str(status))] += 1
+            self._observe(
+                "http_request_duration_seconds", labels, duration, latency_buckets
+            )
+            if db is not None:
+                self._counters["http_request_db_queries_total", labels] += db.queries
+                self._observe(
+                    "http_request_db_duration_seconds",
+                    labels,
+                    db.duration,
+                    latency_buckets,
+                )
+            if size is not None:
+                self._observe(
+                    "http_response_size_bytes",
+                    labels,
+                    size,
+                    settings.METRICS_SIZE_BUCKETS,
+                )
+        if (
+            settings.METRICS_DIR
+            and time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def _observe(self, name, labels, value, buckets):
+        values = self._histograms.get((name, labels))
+        if values is None:
+            values = self._histograms[name, labels] = [0] * (len(buckets) + 1) + [0]
+        # "le" buckets: a value equal to a bound belongs to that bucket
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [name, list(labels), value]
+                for (name, labels), value in self._counters.items()
+            ] + [
+                [name, list(labels), list(values)]
+                for (name, labels), values in self._histograms.items()
+            ]
+
+    def flush(self):
+        """Write this process's snapshot to ``METRICS_DIR``."""
+        self._flushed_at = time.monotonic()
+        directory = pathlib.Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.snapshot()))
+        temporary.replace(path)  # readers never see a half-written file
+
+    def collect(self):
+        """``{(name, labels): value}`` summed over all processes."""
+        if settings.METRICS_DIR:
+            self.flush()
+            snapshots = []
+            for path in pathlib.Path(settings.METRICS_DIR).glob("*.json"):
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue  # removed or replaced meanwhile
+        else:
+            snapshots = [self.snapshot()]
+
+        totals = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot:
+                key = name, tuple(labels)
+                if isinstance(value, list):
+                    total = totals.setdefault(key, [0] * len(value))
+                    if len(total) != len(value):  # buckets changed, skip
+                        continue
+                    for index, item in enumerate(value):
+                        total[index] += item
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+registry = Registry()
+
+
+def clear():
+    """Remove the snapshots of a previous run from ``METRICS_DIR``."""
+    if settings.METRICS_DIR:
+        for path in pathlib.Path(settings.METRICS_DIR).glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    lines = []
+    for name, (kind, label_names, help_text) in METRICS.items():
+        series = sorted(
+            (labels, value)
+            for (metric, labels), value in totals.items()
+            if metric == name
+        )
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == COUNTER:
+                lines.append(
+                    f"{name}{_label_text(label_names, labels)} {_number(value)}"
+                )
+                continue
+            cumulative = 0
+            bounds = [repr(float(bound)) for bound in _buckets(name)] + ["+Inf"]
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{name}_bucket{_label_text(label_names, labels, le)} {cumulative}"
+                )
+            label_text = _label_text(label_names, labels)
+            lines.append(f"{name}_sum{label_text} {_number(value[-1])}")
+            lines.append(f"{name}_count{label_text} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render(registry.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+class DatabaseTimer:
+    """``connection.execute_wrapper`` adding up query count and time."""
+
+    __slots__ = ("queries", "duration")
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+_view_names = {}
+
+
+def request_method(request):
+    return request.method if request.method in METHODS else "other"
+
+
+def view_name(request):
+    """``<ViewSet>.<action>`` for DRF viewsets, the view class or function
+    name otherwise; never the path, to keep the number of series bounded."""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    if match.app_name == "admin":
+        return "admin"
+    func = match.func
+    method = request_method(request)
+    key = func, method
+    name = _view_names.get(key)
+    if name is None:
+        cls = getattr(func, "cls", None) or getattr(func, "view_class", None)
+        actions = getattr(func, "actions", None)
+        if cls is None:
+            name = func.__name__
+        elif actions:
+            action = actions.get(method.lower(), method.lower())
+            name = f"{cls.__name__}.{action}"
+        else:
+            name = f"{cls.__name__}.{method.lower()}"
+        _view_names[key] = name
+    return name
+
+
+class MetricsMiddleware:
+    """Records every request in ``registry``; keep it first in MIDDLEWARE
+    so the time includes the other middleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timer = DatabaseTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started, None)
+        return response
+
+    @staticmethod
+    def _record(request, response, duration, timer):
+        registry.record_request(
+            view_name(request),
+            request_method(request),
+            response.status_code,
+            duration,
+            timer,
+            None if response.streaming else len(response.content),
+        )
@@ -0,0 +1,190 @@
+"""On-demand request profiles, as flamegraph "folded" stacks.
+
+A staff user asks for a profile with the ``X-Profile: 1`` header or
+``?profile=1``. Besides, ``PROFILE_SAMPLE_RATE`` of all requests are
+profiled at random. The request thread's stack is sampled every
+``PROFILE_INTERVAL`` seconds from a helper thread, so everything the
+request runs is covered: view, serializers, renderer and ORM. The
+overhead is small enough to leave random sampling on in production,
+unlike cProfile, which slows every function call.
+
+Profiles are stored as JSON in ``PROFILE_DIR``; the newest
+``PROFILE_MAX_FILES`` are kept. The staff endpoints in views.py list them
+and serve each one as folded stacks (``frame;frame;frame count`` lines),
+which flamegraph.pl, speedscope and inferno read as they are.
+"""
+
+import json
+import pathlib
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from django_rest_lesson.metrics import view_name
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+
+
+def _short_path(filename):
+    for marker in ("site-packages/", str(settings.BASE_DIR) + "/"):
+        head, found, tail = filename.rpartition(marker)
+        if found:
+            return tail
+    return filename
+
+
+def _frame_label(code):
+    return f"{code.co_qualname} ({_short_path(code.co_filename)})"
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a helper thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def _directory():
+    return pathlib.Path(settings.PROFILE_DIR)
+
+
+def save(profile):
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{profile['id']}.json"
+    path.write_text(json.dumps(profile))
+    for old in sorted(directory.glob("*.json"), key=lambda item: item.stat().st_mtime)[
+        : -settings.PROFILE_MAX_FILES
+    ]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for path in _directory().glob("*.json"):
+        try:
+            profile = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        profile.pop("stacks")
+        profiles.append(profile)
+    return sorted(profiles, key=lambda profile: profile["started_at"], reverse=True)
+
+
+def get_profile(profile_id):
+    """The stored profile, or None; ``profile_id`` must be a UUID."""
+    try:
+        return json.loads((_directory() / f"{profile_id}.json").read_text())
+    except FileNotFoundError:
+        return None
+
+
+def folded(profile):
+    return "".join(
+        f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items())
+    )
+
+
+def _staff_user(request):
+    """The staff user making the request, by session or token, or None."""
+    if request.user.is_staff:
+        return request.user
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if authenticated is not None and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """Profiles requests asked for by staff, and sampled ones; place it
+    after AuthenticationMiddleware. Async requests are not profiled."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)  # the coroutine, unprofiled
+
+        staff_user = None
+        if PROFILE_HEADER in request.headers or PROFILE_PARAM in request.GET:
+            staff_user = _staff_user(request)
+            trigger = "requested" if staff_user else None
+        elif random.random() < settings.PROFILE_SAMPLE_RATE:
+            trigger = "sampled"
+        else:
+            trigger = None
+        if trigger is None:
+            return self.get_response(request)
+
+        started_at, started = timezone.now(), time.perf_counter()
+        with StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL) as sampler:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        profile_id = str(uuid.uuid4())
+        save(
+            {
+                "id": profile_id,
+                "trigger": trigger,
+                "view": view_name(request),
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                # the views authenticate by token after the middleware
+                "user": (staff_user or request.user).pk,
+                "started_at": started_at.isoformat(),
+                "duration": duration,
+                "samples": sum(sampler.stacks.values()),
+                "stacks": sampler.stacks,
+            }
+        )
+        if trigger == "requested":
+            response[f"{PROFILE_HEADER}-Id"] = profile_id
+        return response
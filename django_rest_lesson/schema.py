@@ -0,0 +1,144 @@
+"""Precomputed OpenAPI schema.
+
+Building the schema introspects every viewset and serializer, so it is
+done once (``manage.py generate_schema`` or the first request) and kept
+in memory and in ``SCHEMA_CACHE_DIR`` as JSON and YAML, versioned by a
+hash of the JSON. The files also record a fingerprint of the API source
+files; a stale copy is rebuilt when loaded, and with DEBUG on the
+fingerprint is checked on every request so edits show up without a
+restart.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+SCHEMA_SOURCES = ("django_rest_lesson", "station", "user")
+
+
+@dataclass(frozen=True)
+class SchemaDocument:
+    json: bytes
+    yaml: bytes
+    version: str
+    fingerprint: str
+
+
+_document = None
+_lock = threading.Lock()
+
+
+def source_fingerprint():
+    """Hash of the size and mtime of every .py file the schema is built from."""
+    digest = hashlib.sha256()
+    for app in SCHEMA_SOURCES:
+        for path in sorted((Path(settings.BASE_DIR) / app).rglob("*.py")):
+            if "migrations" in path.parts:
+                continue
+            stat = path.stat()
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_schema(fingerprint=None):
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF
+    )
+    schema = generator.get_schema(
+        request=None, public=spectacular_settings.SERVE_PUBLIC
+    )
+    schema_json = OpenApiJsonRenderer().render(schema, renderer_context={})
+    schema_yaml = OpenApiYamlRenderer().render(schema, renderer_context={})
+    return SchemaDocument(
+        json=schema_json,
+        yaml=schema_yaml,
+        version=_digest(schema_json),
+        fingerprint=fingerprint or source_fingerprint(),
+    )
+
+
+def _replace(path, data):
+    """Write ``path`` through a temporary file, so readers see either the
+    old or the new content, never a half-written file."""
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def write_schema(document, directory=None):
+    directory = Path(directory or settings.SCHEMA_CACHE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    _replace(directory / "schema.json", document.json)
+    _replace(directory / "schema.yaml", document.yaml)
+    # last, and with the digests of both files: a reader racing a write can
+    # tell the files from this meta file apart from those of another one
+    meta = {
+        "version": document.version,
+        "yaml_version": _digest(document.yaml),
+        "fingerprint": document.fingerprint,
+    }
+    _replace(directory / "schema.meta.json", json.dumps(meta).encode())
+
+
+def read_schema(directory=None):
+    """The SchemaDocument stored in ``directory``, or None if there is none
+    or its files don't belong together (read during a write)."""
+    directory = Path(directory or settings.SCHEMA_CACHE_DIR)
+    try:
+        meta = json.loads((directory / "schema.meta.json").read_text())
+        document = SchemaDocument(
+            json=(directory / "schema.json").read_bytes(),
+            yaml=(directory / "schema.yaml").read_bytes(),
+            version=meta["version"],
+            fingerprint=meta["fingerprint"],
+        )
+        if (
+            _digest(document.json) != document.version
+            or _digest(document.yaml) != meta["yaml_version"]
+        ):
+            return None
+        return document
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def get_schema():
+    """Return the current SchemaDocument, building it if needed."""
+    global _document
+
+    document = _document
+    if document is not None and not settings.DEBUG:
+        return document
+
+    fingerprint = source_fingerprint()
+    if document is not None and document.fingerprint == fingerprint:
+        return document
+
+    with _lock:
+        if _document is not None and _document.fingerprint == fingerprint:
+            return _document
+        document = read_schema()
+        if document is None or document.fingerprint != fingerprint:
+            document = build_schema(fingerprint)
+            try:
+                write_schema(document)
+            except OSError:
+                pass  # read-only deployments keep the schema in memory only
+        _document = document
+    return document
+
+
+def reset_schema():
+    global _document
+    _document = None
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "user.User"
 
 MIDDLEWARE = [
+    "django_rest_lesson.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,6 +54,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django_rest_lesson.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "django_rest_lesson.urls"
@@ -106,6 +108,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# The first hasher is used for new passwords, the rest can still verify old
+# ones. Passwords are rehashed on login when the preferred hasher changes.
+
+PASSWORD_HASHER_CHOICES = {
+    "pbkdf2_sha256": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",  # needs argon2-cffi
+    "bcrypt_sha256": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",  # needs bcrypt
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+}
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "pbkdf2_sha256")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+]
+
+# Passwords hashed at once (user/hashing.py): logins and new users wait
+# for one of PASSWORD_HASHING_WORKERS slots. The slots are lock files in
+# PASSWORD_HASHING_LOCK_DIR, shared by the processes of the host (set by
+# gunicorn.conf.py); without it every process has its own.
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1))
+)
+PASSWORD_HASHING_LOCK_DIR = os.environ.get("PASSWORD_HASHING_LOCK_DIR")
+
+AUTHENTICATION_BACKENDS = ["user.backends.HashingSlotBackend"]
+
+# Staff bulk user provisioning (/api/user/bulk/ and provision_users)
+USER_PROVISIONING_MAX_ROWS = 5000
+USER_PROVISIONING_BATCH_SIZE = 500
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -125,6 +158,17 @@ STATIC_URL = "static/"
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# How bus images are sent after the view authorized the request:
+# "x-accel-redirect" (nginx serves MEDIA_ACCEL_REDIRECT_PREFIX as an internal
+# alias of MEDIA_ROOT), "x-sendfile" (Apache/lighttpd) or "django".
+MEDIA_DELIVERY = os.environ.get("MEDIA_DELIVERY", "django")
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+BUS_IMAGE_VARIANTS = {"thumb": (320, 320), "medium": (1024, 1024)}
+# Bus images are stored once per content (station.storage); cleanup_image_blobs
+# deletes blobs unused for BUS_IMAGE_ORPHAN_GRACE seconds, a batch at a time.
+BUS_IMAGE_ORPHAN_GRACE = 60 * 60
+BUS_IMAGE_CLEANUP_BATCH_SIZE = 500
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -132,7 +176,7 @@ MEDIA_URL = "/media/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'station.pagination.EstimatedCountLimitOffsetPagination',
     'PAGE_SIZE': 2,
     "DEFAULT_PERMISSION_CLASSES": [
         "station.permissions.IsAdminOrIfAuthenticatedReadOnly"],
@@ -147,6 +191,133 @@ REST_FRAMEWORK = {
     }
 }
 
+# Set CACHE_BACKEND to a shared cache (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several workers,
+# so invalidations reach every process.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+# A local memory cache is kept per process: every worker would serve what
+# it cached itself, missing the invalidations made by the others. The
+# caches relying on invalidation are only on by default with a shared one.
+SHARED_CACHE = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+# Cached order list pages and summaries (station.order_cache) expire after
+# ORDER_CACHE_TIMEOUT seconds even if nothing invalidated them. Off by
+# default unless the cache is shared (SHARED_CACHE), ORDER_CACHE=1 forces it.
+ORDER_CACHE = os.environ.get("ORDER_CACHE", "1" if SHARED_CACHE else "0") == "1"
+ORDER_CACHE_TIMEOUT = 15 * 60
+
+# `manage.py archive_orders` moves orders older than ORDER_ARCHIVE_AFTER_DAYS
+# (and their tickets) to the archive tables, ORDER_ARCHIVE_BATCH_SIZE orders
+# per transaction with ORDER_ARCHIVE_PAUSE seconds between transactions.
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+ORDER_ARCHIVE_PAUSE = 0.1
+
+# Trip seat event streams (station.seat_events): events buffered per
+# subscriber before it is told to resync, and seconds between keep-alives.
+# Events only reach the streams of the worker process that sold the seat,
+# so every stream also resends all the sold seats each
+# SEAT_EVENTS_RESYNC_INTERVAL seconds. A worker serves at most
+# SEAT_EVENTS_MAX_STREAMS streams (503 beyond), keep it below
+# GUNICORN_THREADS so the other requests still get a thread.
+SEAT_EVENTS_BUFFER = 100
+SEAT_EVENTS_HEARTBEAT = 15
+SEAT_EVENTS_RESYNC_INTERVAL = 30
+SEAT_EVENTS_MAX_STREAMS = int(os.environ.get("SEAT_EVENTS_MAX_STREAMS", 4))
+
+# Journey planner (station.journeys). Trips have no arrival time: a leg is
+# taken to last JOURNEY_LEG_DURATION minutes and a change of bus to need
+# JOURNEY_MIN_TRANSFER minutes. The in-memory timetable is reloaded after
+# JOURNEY_TIMETABLE_MAX_AGE seconds to pick up other processes' writes.
+JOURNEY_LEG_DURATION = 120
+JOURNEY_MIN_TRANSFER = 15
+JOURNEY_MAX_LEGS = 4
+JOURNEY_TIMETABLE_MAX_AGE = 300
+
+# Trips created, updated or deleted per request by /trips/bulk/
+TRIP_BULK_MAX_ITEMS = 500
+
+# Bus ids listed per request to /buses/facilities/ (a filter has no limit)
+BUS_FACILITY_BULK_MAX_ITEMS = 10_000
+
+# Request metrics served at /metrics (django_rest_lesson/metrics.py). Worker
+# processes add up their values through snapshots in METRICS_DIR, written at
+# most every METRICS_FLUSH_INTERVAL seconds (gunicorn.conf.py sets a default).
+# With METRICS_TOKEN set, scrapes need "Authorization: Bearer <token>";
+# without it only staff signed in to the admin can read /metrics.
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+METRICS_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Request profiles (django_rest_lesson/profiling.py): staff ask for one with
+# "X-Profile: 1" or ?profile=1, PROFILE_SAMPLE_RATE of all requests are
+# profiled at random. Stacks are sampled every PROFILE_INTERVAL seconds; the
+# newest PROFILE_MAX_FILES profiles are kept in PROFILE_DIR.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = 0.001
+PROFILE_DIR = os.environ.get("PROFILE_DIR", BASE_DIR / "profiles")
+PROFILE_MAX_FILES = 200
+
+# Identical trip lists requested at the same time are computed once
+# (station/single_flight.py); the others wait up to TRIP_LIST_COALESCE_WAIT
+# seconds for the result. With TRIP_LIST_COALESCE_LOCK_DIR set, processes
+# coalesce too, through lock files there and the (shared) cache, where
+# results are kept for TRIP_LIST_COALESCE_TTL seconds.
+TRIP_LIST_COALESCE = True
+TRIP_LIST_COALESCE_WAIT = 5
+TRIP_LIST_COALESCE_LOCK_DIR = os.environ.get("TRIP_LIST_COALESCE_LOCK_DIR")
+TRIP_LIST_COALESCE_TTL = 1
+
+# Trip and bus list rows are cached as encoded JSON (station/fragments.py)
+# and pages are joined from them; rows expire after FRAGMENT_CACHE_TIMEOUT
+# seconds even if nothing invalidated them. Off by default unless the cache
+# is shared (SHARED_CACHE), set FRAGMENT_CACHE=1 to force it on.
+FRAGMENT_CACHE = os.environ.get("FRAGMENT_CACHE", "1" if SHARED_CACHE else "0") == "1"
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Queued bookings (station/booking_queue.py): with BOOKING_QUEUE on, POST
+# /orders/ answers 202 with the URL of the queued request, and
+# `manage.py process_bookings` workers book up to BOOKING_QUEUE_BATCH_SIZE
+# requests of a trip per transaction, looking for new ones every
+# BOOKING_QUEUE_POLL_INTERVAL seconds. Clients are told to poll again after
+# BOOKING_QUEUE_RETRY_AFTER seconds.
+BOOKING_QUEUE = os.environ.get("BOOKING_QUEUE", "0") == "1"
+BOOKING_QUEUE_BATCH_SIZE = 100
+BOOKING_QUEUE_POLL_INTERVAL = 0.2
+BOOKING_QUEUE_RETRY_AFTER = 1
+
+# Batch endpoint (/api/batch/)
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Paginated lists count exactly below this many rows (planner estimate) and
+# report the estimate above it; PAGINATION_COUNT_CAP limits exact counts
+# where no estimate is available (e.g. SQLite).
+PAGINATION_EXACT_COUNT_THRESHOLD = 10_000
+PAGINATION_COUNT_CAP = None
+
+# Build URL resolver, serializers and schema when the WSGI/ASGI app loads
+# (see django_rest_lesson/warmup.py)
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "1") == "1"
+
+# Precomputed OpenAPI schema (manage.py generate_schema)
+SCHEMA_CACHE_DIR = BASE_DIR / "openapi"
+SCHEMA_CACHE_MAX_AGE = 60 * 60
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Bus station API",
     "DESCRIPTION": "Order tickets for your bus trips",
@@ -14,17 +14,36 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+from django_rest_lesson.metrics import metrics_view
+from django_rest_lesson.views import (
+    BatchView,
+    CachedSpectacularAPIView,
+    ProfileDetailView,
+    ProfileListView,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/station/", include("station.urls", namespace="station")),
     path("api/user/", include("user.urls", namespace="user")),
-    path("api/doc/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/batch/", BatchView.as_view(), name="batch"),
+    path("metrics", metrics_view, name="metrics"),
+    path("api/profiles/", ProfileListView.as_view(), name="profile-list"),
+    path(
+        "api/profiles/<uuid:profile_id>/",
+        ProfileDetailView.as_view(),
+        name="profile-detail",
+    ),
+    path("api/doc/", CachedSpectacularAPIView.as_view(), name="schema"),
+    path(
+        "api/doc/v/<str:schema_version>/",
+        CachedSpectacularAPIView.as_view(),
+        name="schema-versioned",
+    ),
     path("api/doc/swagger/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/doc/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
@@ -0,0 +1,247 @@
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.urls import Resolver404, resolve, reverse
+from django.utils.cache import patch_cache_control
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework import serializers, status
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from django_rest_lesson import profiling
+from django_rest_lesson.schema import get_schema
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=("GET", "POST", "PUT", "PATCH", "DELETE"), default="GET"
+    )
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_url(self, value):
+        if not value.startswith("/api/"):
+            raise serializers.ValidationError("Only /api/ urls can be batched.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        max_requests = settings.BATCH_MAX_REQUESTS
+        if len(value) > max_requests:
+            raise serializers.ValidationError(
+                f"batch can contain at most {max_requests} requests, not {len(value)}"
+            )
+        return value
+
+
+class BatchView(APIView):
+    """Run several API calls in one round trip.
+
+    The batch request is authenticated once; every sub-request reuses that
+    user and is dispatched in-process through the URL resolver, skipping the
+    middleware stack. Read-only batches can be run concurrently with
+    ``"parallel": true``. A sub-request that fails with an exception gets
+    a 500 entry; the others are still answered.
+    """
+
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["requests"]
+
+        read_only = all(item["method"] == "GET" for item in items)
+        if serializer.validated_data["parallel"] and read_only and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) as executor:
+                responses = list(
+                    executor.map(
+                        lambda item: self._dispatch_in_thread(request, item), items
+                    )
+                )
+        else:
+            responses = [self._dispatch(request, item) for item in items]
+
+        return Response({"responses": responses}, status=status.HTTP_200_OK)
+
+    def _dispatch_in_thread(self, request, item):
+        try:
+            return self._dispatch(request, item)
+        finally:
+            # worker threads open their own connections, don't leak them
+            connections.close_all()
+
+    def _dispatch(self, request, item):
+        url = urlsplit(item["url"])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {
+                "status": status.HTTP_404_NOT_FOUND,
+                "body": {"detail": "Not found."},
+            }
+
+        if getattr(match.func, "view_class", None) is self.__class__:
+            return {
+                "status": status.HTTP_400_BAD_REQUEST,
+                "body": {"detail": "Batch requests can not be nested."},
+            }
+
+        sub_request = self._build_sub_request(request, item, url)
+        try:
+            response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception("batched %s %s failed", item["method"], item["url"])
+            return {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "body": {"detail": "A server error occurred."},
+            }
+        return {"status": response.status_code, "body": self._response_body(response)}
+
+    @staticmethod
+    def _build_sub_request(request, item, url):
+        body = b""
+        if "body" in item:
+            body = json.dumps(item["body"]).encode()
+
+        environ = {
+            key: value
+            for key, value in request.META.items()
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH", "wsgi.input")
+        }
+        environ.update(
+            {
+                "REQUEST_METHOD": item["method"],
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(body)),
+                "wsgi.input": io.BytesIO(body),
+            }
+        )
+        environ.setdefault("wsgi.url_scheme", request.scheme)
+        sub_request = WSGIRequest(environ)
+        # reuse the authentication of the batch request (see rest_framework.request.Request)
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    @staticmethod
+    def _response_body(response):
+        if hasattr(response, "data"):
+            return response.data
+        content = getattr(response, "content", b"")
+        if response.get("Content-Type", "").startswith("application/json"):
+            return json.loads(content or b"null")
+        return content.decode(response.charset or "utf-8", errors="replace")
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """Serve the precomputed schema (see django_rest_lesson.schema).
+
+    Responses carry the schema hash as ETag. The unversioned URL may be
+    cached for ``SCHEMA_CACHE_MAX_AGE`` seconds and revalidated with
+    If-None-Match; ``/api/doc/v/<hash>/`` never changes and is cached as
+    immutable.
+    """
+
+    def _get_schema_response(self, request):
+        if request.GET.get("lang") or request.GET.get("version"):
+            return super()._get_schema_response(request)
+
+        document = get_schema()
+        schema_version = self.kwargs.get("schema_version")
+        if schema_version is not None and schema_version != document.version:
+            raise Http404("Unknown schema version.")
+
+        etag = f'"{document.version}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            renderer = request.accepted_renderer
+            response = HttpResponse(
+                document.yaml if renderer.format == "yaml" else document.json,
+                content_type=request.accepted_media_type,
+            )
+            response["Content-Disposition"] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+
+        response["ETag"] = etag
+        if schema_version is not None:
+            patch_cache_control(
+                response, public=True, max_age=60 * 60 * 24 * 365, immutable=True
+            )
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.SCHEMA_CACHE_MAX_AGE
+            )
+        return response
+
+
+class ProfileSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    trigger = serializers.ChoiceField(choices=("requested", "sampled"))
+    view = serializers.CharField()
+    method = serializers.CharField()
+    path = serializers.CharField()
+    status = serializers.IntegerField()
+    user = serializers.IntegerField(allow_null=True)
+    started_at = serializers.DateTimeField()
+    duration = serializers.FloatField()
+    samples = serializers.IntegerField()
+    folded_url = serializers.SerializerMethodField()
+
+    def get_folded_url(self, profile) -> str:
+        return self.context["request"].build_absolute_uri(
+            reverse("profile-detail", args=(profile["id"],))
+        )
+
+
+class ProfileListView(APIView):
+    """Stored request profiles, newest first (see django_rest_lesson.profiling)."""
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=ProfileSerializer(many=True))
+    def get(self, request):
+        serializer = ProfileSerializer(
+            profiling.list_profiles(), many=True, context={"request": request}
+        )
+        return Response(serializer.data)
+
+
+class ProfileDetailView(APIView):
+    """One profile as folded stacks, for flamegraph.pl, speedscope or inferno."""
+
+    authentication_classes = (TokenAuthentication, SessionAuthentication)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses={(200, "text/plain"): OpenApiTypes.STR})
+    def get(self, request, profile_id):
+        profile = profiling.get_profile(profile_id)
+        if profile is None:
+            raise Http404("Unknown profile.")
+        return HttpResponse(
+            profiling.folded(profile), content_type="text/plain; charset=utf-8"
+        )
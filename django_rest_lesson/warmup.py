@@ -0,0 +1,76 @@
+"""Warm-up run once per process, before the first request.
+
+Builds what the first request would otherwise pay for: the URL resolver,
+model metadata and serializer fields for every station/user serializer,
+the OpenAPI schema and Pillow's image plugins. Called from wsgi.py and
+asgi.py; with gunicorn's ``preload_app`` it runs in the master and the
+warmed structures are shared with the forked workers. No database
+connection is opened here, as connections must not cross a fork.
+"""
+
+import gc
+import inspect
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.urls import get_resolver
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+SERIALIZER_MODULES = (
+    "station.serializers",
+    "user.serializers",
+    "user.provisioning",
+    "django_rest_lesson.views",
+)
+
+
+def _warm_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the nested resolvers too
+    for pattern in ("/api/station/trips/", "/api/station/buses/1/", "/api/user/me/"):
+        resolver.resolve(pattern)
+
+
+def _warm_serializers():
+    for module_name in SERIALIZER_MODULES:
+        module = import_module(module_name)
+        for _, serializer_class in inspect.getmembers(module, inspect.isclass):
+            if (
+                issubclass(serializer_class, BaseSerializer)
+                and serializer_class.__module__ == module_name
+            ):
+                serializer_class().fields
+
+
+def _warm_schema():
+    from django_rest_lesson.schema import get_schema
+
+    get_schema()
+
+
+def _warm_pillow():
+    from PIL import Image
+
+    Image.init()
+
+
+def warm_up():
+    if not settings.WARMUP_ON_STARTUP:
+        return
+
+    started = time.perf_counter()
+    for step in (_warm_urls, _warm_serializers, _warm_schema, _warm_pillow):
+        try:
+            step()
+        except Exception:  # a failed warm-up must never stop the worker
+            logger.exception("warm-up step %s failed", step.__name__)
+
+    # keep the warmed objects out of future collections, so the pages
+    # shared with forked workers are not dirtied by the GC
+    gc.collect()
+    gc.freeze()
+    logger.info("warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_rest_lesson.settings")
 
 application = get_wsgi_application()
+
+from django_rest_lesson.warmup import warm_up  # noqa: E402 (needs django.setup())
+
+warm_up()
@@ -0,0 +1,36 @@
+# gunicorn -c gunicorn.conf.py django_rest_lesson.wsgi
+# The app (and its warm-up, see django_rest_lesson/warmup.py) is loaded once
+# in the master process and shared with the forked workers.
+import multiprocessing
+import os
+
+bind = "0.0.0.0:8000"
+preload_app = True
+workers = multiprocessing.cpu_count() * 2 + 1
+
+# The app is WSGI and every view is sync; asgi.py is not used. Threaded
+# workers keep a request that waits (an open trip seat stream, a password
+# being hashed, see user/hashing.py) from holding a whole process: each
+# holds one of a worker's threads. Raise GUNICORN_THREADS with the number
+# of seat streams expected to be open at once.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# workers add up their request metrics through this directory, see
+# django_rest_lesson/metrics.py
+os.environ.setdefault("METRICS_DIR", "/tmp/django_rest_lesson_metrics")
+# and share PASSWORD_HASHING_WORKERS hashing slots through this one, see
+# user/hashing.py
+os.environ.setdefault("PASSWORD_HASHING_LOCK_DIR", "/tmp/django_rest_lesson_hashing")
+
+
+def on_starting(server):
+    from django_rest_lesson import metrics
+
+    metrics.clear()  # counters restart with the server
+
+
+def worker_exit(server, worker):
+    from django_rest_lesson import metrics
+
+    metrics.registry.flush()
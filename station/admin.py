@@ -1,19 +1,81 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
 from station.models import Bus, Ticket, Trip, Order, Facility
+from station.pagination import EstimatedCountPaginator
+
+
+class ScalableAdminMixin:
+    """Admin settings for tables with millions of rows.
+
+    Changelist searches use exact lookups on indexed columns (``icontains``
+    can't use an index), and the changelist counts with the planner's
+    estimate instead of ``COUNT(*)`` over the whole table. Autocomplete
+    widgets search as the user types, with the admin's ``search_fields``
+    (use ``^field`` prefixes there, with an index on ``UPPER(field)``).
+    """
+
+    exact_search_fields = ()
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is not None and resolver_match.url_name == "autocomplete":
+            return super().get_search_results(request, queryset, search_term)
+
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = Q()
+        for name in self.exact_search_fields:
+            field = self.model._meta.get_field(name)
+            try:
+                value = field.to_python(search_term)
+            except ValidationError:
+                continue
+            query |= Q(**{name: value})
+        if not query:
+            return queryset.none(), False
+        return queryset.filter(query), False
 
 
 class TicketInLine(admin.TabularInline):
     model = Ticket
     extra = 1
+    autocomplete_fields = ("trip",)  # a <select> with every trip doesn't scale
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
     inlines = (TicketInLine,)
+    list_display = ("id", "user", "created_at")
+    list_select_related = ("user",)
+    list_filter = ("created_at",)
+    raw_id_fields = ("user",)
+    exact_search_fields = search_fields = ("id", "user_id")
+
+
+@admin.register(Ticket)
+class TicketAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "seat", "trip", "order")
+    list_select_related = ("trip", "order__user")
+    raw_id_fields = ("trip", "order")
+    exact_search_fields = search_fields = ("trip_id", "order_id")
+
+
+@admin.register(Trip)
+class TripAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "source", "destination", "departure", "bus")
+    list_select_related = ("bus",)
+    raw_id_fields = ("bus",)
+    exact_search_fields = ("source", "destination")
+    # for the ticket inline, UPPER(column) LIKE indexes in migration 0012
+    search_fields = ("^source", "^destination")
 
 
 admin.site.register(Bus)
-admin.site.register(Ticket)
-admin.site.register(Trip)
 # admin.site.register(Order)
 admin.site.register(Facility)
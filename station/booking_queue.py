@@ -0,0 +1,148 @@
+"""Queued bookings: orders answered with 202 and booked by worker processes.
+
+With ``BOOKING_QUEUE`` on, ``POST /orders/`` only validates the request
+(the trips exist, the seats are numbers) and stores it as a
+BookingRequest, a row in the database; the client gets 202 and the URL of
+the request to poll until its status is "booked" (with the order) or
+"rejected" (with the errors). The seats sold also show up in the trip's
+seat event stream.
+
+``manage.py process_bookings`` drains the queue; start as many workers as
+needed, no broker is involved. A worker takes the oldest queued request
+and up to ``batch_size`` more of the same trip, locked with SKIP LOCKED so
+workers don't wait for each other, and books them in one transaction: the
+seats are checked against the sold ones in memory and the orders and
+tickets of the batch are inserted with a statement each. A trip selling
+out thus takes a transaction per batch instead of one per order, all
+fighting for the same rows. The seat constraints still have the last
+word; if one fires (a seat was sold by a synchronous order meanwhile), the
+batch is booked again one request at a time. A request failing there on
+any other constraint is rejected with a generic error and logged, it is
+not retried.
+"""
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from station import order_cache, seat_events
+from station.models import BookingRequest, Order, Ticket, Trip
+
+logger = logging.getLogger(__name__)
+
+# reported for a request that broke a constraint other than the seat ones
+BOOKING_FAILED = {"non_field_errors": ["The order could not be booked."]}
+
+
+def enqueue(user, tickets):
+    """Queue an order of ``tickets``, validated TicketSerializer data."""
+    return BookingRequest.objects.create(
+        user=user,
+        trip=tickets[0]["trip"],
+        tickets=[
+            {"seat": ticket["seat"], "trip": ticket["trip"].pk} for ticket in tickets
+        ],
+    )
+
+
+def _queued():
+    return (
+        BookingRequest.objects.select_for_update(skip_locked=True)
+        .filter(status=BookingRequest.QUEUED)
+        .order_by("created_at", "pk")
+    )
+
+
+def process_batch(batch_size):
+    """Book the next batch of queued requests, all of one trip.
+
+    Returns ``(booked, rejected)``; ``(0, 0)`` when the queue is empty.
+    """
+    with transaction.atomic():
+        head = _queued().first()
+        if head is None:
+            return 0, 0
+        batch = list(_queued().filter(trip_id=head.trip_id)[:batch_size])
+        try:
+            with transaction.atomic():
+                _book(batch)
+        except IntegrityError:
+            for request in batch:
+                try:
+                    with transaction.atomic():
+                        _book([request])
+                except IntegrityError as error:
+                    try:
+                        Ticket.raise_for_seat_violation(error, ValidationError)
+                    except ValidationError as seat_error:
+                        _finish(request, errors=seat_error.detail)
+                    else:
+                        # rejecting it keeps it from failing every batch again
+                        logger.exception("booking request %s failed", request.pk)
+                        _finish(request, errors=BOOKING_FAILED)
+                    request.save()
+    booked = sum(request.status == BookingRequest.BOOKED for request in batch)
+    return booked, len(batch) - booked
+
+
+def _finish(request, order=None, errors=None):
+    request.status = BookingRequest.BOOKED if order else BookingRequest.REJECTED
+    request.order = order
+    request.errors = errors
+    request.processed_at = timezone.now()
+
+
+def _seat_errors(request, trips, sold):
+    """The errors of ``request`` against the ``sold`` (trip id, seat) pairs,
+    as the synchronous order endpoint reports them, or None."""
+    seats = set()
+    for ticket in request.tickets:
+        trip = trips.get(ticket["trip"])
+        if trip is None:
+            return {"trip": [f"Trip {ticket['trip']} no longer exists."]}
+        try:
+            Ticket.validate_seat(ticket["seat"], trip.bus.num_seats, ValidationError)
+        except ValidationError as error:
+            return error.detail
+        seat = (trip.pk, ticket["seat"])
+        if seat in sold or seat in seats:
+            return {"seat": [f"seat {ticket['seat']} is already taken on this trip"]}
+        seats.add(seat)
+    return None
+
+
+def _book(requests):
+    trip_ids = {ticket["trip"] for request in requests for ticket in request.tickets}
+    trips = Trip.objects.select_related("bus").in_bulk(trip_ids)
+    sold = set(
+        Ticket.objects.filter(trip_id__in=trip_ids).values_list("trip_id", "seat")
+    )
+
+    accepted = []
+    for request in requests:
+        errors = _seat_errors(request, trips, sold)
+        if errors:
+            _finish(request, errors=errors)
+        else:
+            sold.update((ticket["trip"], ticket["seat"]) for ticket in request.tickets)
+            accepted.append(request)
+
+    orders = Order.objects.bulk_create(
+        Order(user_id=request.user_id) for request in accepted
+    )
+    tickets = Ticket.objects.bulk_create(
+        Ticket(order=order, trip_id=ticket["trip"], seat=ticket["seat"])
+        for request, order in zip(accepted, orders)
+        for ticket in request.tickets
+    )
+    for request, order in zip(accepted, orders):
+        _finish(request, order=order)
+    BookingRequest.objects.bulk_update(
+        requests, ["status", "order", "errors", "processed_at"]
+    )
+
+    # bulk_create sends no post_save, do what its receivers would
+    order_cache.invalidate_users(order.user_id for order in orders)
+    seat_events.publish_seats(tickets, seat_events.SOLD)
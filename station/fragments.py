@@ -0,0 +1,182 @@
+"""Cache of pre-encoded JSON rows for list endpoints.
+
+Each row of a list is cached as the JSON bytes its serializer renders to,
+keyed by the serializer variant (class, ?fields=, ?expand=) and the row
+id. It is stored with the row's version, the versions of the rows it
+shows data from (the bus of a trip) and annotated values like
+``tickets_available``; if any of them changed, the row is a miss. Rows
+and versions are read in one ``get_many``. A page is assembled by joining
+the cached rows; only the misses are serialized, and prefetches are run
+for the misses only.
+
+Versions live in the cache too, one per row. They are bumped by model
+signals (see models.py) and by writes that send none, like the trip bulk
+endpoints. As in order_cache, a version that is missing starts at the
+current time, so an evicted version can't come back at a value old rows
+were stored under.
+
+Rows are dicts, decoded from the cached JSON (much cheaper than running
+the serializer), so every renderer can use them; FragmentJSONRenderer
+writes the cached JSON as it is.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.renderers import JSONRenderer
+
+
+class Row(dict):
+    """A serialized row that also holds its encoded JSON, ``json``.
+
+    It is a dict, so ``response.data`` reads as usual; FragmentJSONRenderer
+    writes ``json`` instead of encoding the row again.
+    """
+
+    __slots__ = ("json",)
+
+    def __init__(self, encoded):
+        super().__init__(json.loads(encoded))
+        self.json = encoded
+
+    def __reduce__(self):
+        return Row, (self.json,)
+
+
+def _version_key(model, pk):
+    return f"fragments:version:{model._meta.label_lower}:{pk}"
+
+
+def _versions(keys, found):
+    versions = {key: found[key] for key in keys if key in found}
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass  # missing, it starts at a newer value
+
+
+def invalidate(model, pks):
+    """Drop the cached rows of ``model`` with these ``pks``, now and once
+    the transaction commits (a read in between may cache the old row)."""
+    keys = [_version_key(model, pk) for pk in pks]
+    if keys:
+        _bump(keys)
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def variant(serializer_class, request):
+    params = ":".join(
+        f"{name}={request.query_params.get(name)}"
+        for name in ("fields", "expand")
+        if name in request.query_params
+    )
+    return hashlib.sha1(
+        f"{serializer_class.__module__}.{serializer_class.__qualname__}:{params}".encode()
+    ).hexdigest()[:16]
+
+
+def rows(
+    serializer_class,
+    instances,
+    context,
+    *,
+    dependencies=(),
+    annotations=(),
+    prefetch=(),
+):
+    """``instances`` rendered by ``serializer_class``, as a list of Rows.
+
+    ``dependencies`` are ``(model, attname)`` pairs of rows the serializer
+    shows data from (``(Bus, "bus_id")``); ``annotations`` are attributes
+    whose values are part of the key; ``prefetch`` lookups run on misses.
+    """
+    instances = list(instances)
+    name = variant(serializer_class, context["request"])
+    row_keys = [f"fragments:{name}:{instance.pk}" for instance in instances]
+    row_version_keys = [
+        [_version_key(type(instance), instance.pk)]
+        + [
+            _version_key(model, instance.__dict__[attname])
+            for model, attname in dependencies
+            # deferred by ?fields=, so the related row isn't rendered either
+            if attname in instance.__dict__
+        ]
+        for instance in instances
+    ]
+    version_keys = {key for keys in row_version_keys for key in keys}
+    # rows and versions in one round trip
+    found = cache.get_many(row_keys + list(version_keys))
+    versions = _versions(version_keys, found)
+    stamps = [
+        tuple(versions[key] for key in keys)
+        + tuple(str(getattr(instance, attribute, "")) for attribute in annotations)
+        for instance, keys in zip(instances, row_version_keys)
+    ]
+
+    encoded, misses = [], []
+    for index, (key, stamp) in enumerate(zip(row_keys, stamps)):
+        cached = found.get(key)
+        if cached is not None and cached[0] == stamp:
+            encoded.append(cached[1])
+        else:
+            encoded.append(None)
+            misses.append(index)
+    if misses:
+        missed = [instances[index] for index in misses]
+        if prefetch:
+            prefetch_related_objects(missed, *prefetch)
+        renderer = JSONRenderer()
+        fresh = {}
+        for index, data in zip(
+            misses, serializer_class(missed, many=True, context=context).data
+        ):
+            encoded[index] = renderer.render(data)
+            fresh[row_keys[index]] = (stamps[index], encoded[index])
+        cache.set_many(fresh, settings.FRAGMENT_CACHE_TIMEOUT)
+    return [Row(row) for row in encoded]
+
+
+# stands in for the rows while the page envelope is encoded
+_PLACEHOLDER = f"fragment-rows-{uuid.uuid4().hex}"
+
+
+def _all_rows(items):
+    return all(isinstance(item, Row) for item in items)
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """JSONRenderer that joins the JSON of Rows instead of encoding them."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and data and _all_rows(data):
+            return b"[" + b",".join(row.json for row in data) + b"]"
+        if (
+            isinstance(data, dict)
+            and isinstance(data.get("results"), list)
+            and data["results"]
+            and _all_rows(data["results"])
+        ):
+            envelope = super().render(
+                {**data, "results": _PLACEHOLDER}, accepted_media_type, renderer_context
+            )
+            return envelope.replace(
+                f'"{_PLACEHOLDER}"'.encode(),
+                b"[" + b",".join(row.json for row in data["results"]) + b"]",
+                1,
+            )
+        return super().render(data, accepted_media_type, renderer_context)
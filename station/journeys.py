@@ -0,0 +1,282 @@
+"""Journey planning over the trip timetable.
+
+Every Trip is one connection, source -> destination at ``departure``.
+Trips have no arrival time, so a leg is taken to last
+``JOURNEY_LEG_DURATION`` minutes, and changing buses needs
+``JOURNEY_MIN_TRANSFER`` minutes. Times are minutes after midnight of one
+service day; journeys don't continue into the next day.
+
+The timetable is held in memory, sorted by departure. It is loaded with a
+single query on first use and then updated after commit from Trip saves
+and deletes, bus changes and seat events. Trip changes are collected and
+applied by the next query in one rebuild, however many trips changed;
+the rebuilt lists are swapped in, so a running query never sees a
+half-updated timetable.
+Writes made by other processes are picked up by reloading the timetable
+once it is older than ``JOURNEY_TIMETABLE_MAX_AGE`` seconds.
+
+earliest_arrival() is a Connection Scan: one pass over the connections
+departing after the requested time. min_transfers() repeats the scan in
+rounds, round k allowing k legs (as RAPTOR does), and stops at the first
+round that reaches the destination.
+"""
+
+import bisect
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count
+
+from station import seat_events
+
+
+@dataclass(slots=True)
+class Connection:
+    trip_id: int
+    source: str
+    destination: str
+    departure: int
+    arrival: int
+    num_seats: int
+    sold: int = 0
+
+    @property
+    def seats_available(self):
+        return self.num_seats - self.sold
+
+
+@dataclass(frozen=True)
+class Journey:
+    legs: list
+
+    @property
+    def departure(self):
+        return self.legs[0].departure
+
+    @property
+    def arrival(self):
+        return self.legs[-1].arrival
+
+    @property
+    def transfers(self):
+        return len(self.legs) - 1
+
+
+@dataclass(frozen=True)
+class _State:
+    connections: list
+    departures: list
+    by_trip: dict
+    loaded_at: float
+
+
+def minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _order(connection):
+    return connection.departure, connection.trip_id
+
+
+def make_connection(trip_id, source, destination, departure, num_seats, sold=0):
+    departure = minutes(departure)
+    return Connection(
+        trip_id,
+        source,
+        destination,
+        departure,
+        departure + settings.JOURNEY_LEG_DURATION,
+        num_seats,
+        sold,
+    )
+
+
+class Timetable:
+    def __init__(self, connections=None):
+        self._lock = threading.Lock()
+        self._state = None if connections is None else self._build(connections)
+        self._changes = {}  # trip id -> new Connection, None once deleted
+
+    @staticmethod
+    def _build(connections, loaded_at=None):
+        connections = sorted(connections, key=_order)
+        return _State(
+            connections,
+            [connection.departure for connection in connections],
+            {connection.trip_id: connection for connection in connections},
+            time.monotonic() if loaded_at is None else loaded_at,
+        )
+
+    @staticmethod
+    def _load():
+        from station.models import Trip
+
+        rows = Trip.objects.annotate(sold=Count("tickets")).values_list(
+            "id", "source", "destination", "departure", "bus__num_seats", "sold"
+        )
+        return [make_connection(*row) for row in rows.iterator(chunk_size=10_000)]
+
+    def state(self):
+        state = self._state
+        max_age = settings.JOURNEY_TIMETABLE_MAX_AGE
+        if (
+            state is not None
+            and not self._changes
+            and time.monotonic() - state.loaded_at < max_age
+        ):
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or time.monotonic() - state.loaded_at >= max_age:
+                self._changes = {}
+                state = self._state = self._build(self._load())
+            elif self._changes:
+                state = self._state = self._apply(state, self._changes)
+                self._changes = {}
+        return state
+
+    @classmethod
+    def _apply(cls, state, changes):
+        """One rebuild for all trip changes since the last query."""
+        connections = [c for c in state.connections if c.trip_id not in changes]
+        for trip_id, connection in changes.items():
+            if connection is not None:
+                old = state.by_trip.get(trip_id)
+                if old is not None:
+                    connection.sold = old.sold
+                connections.append(connection)
+        return cls._build(connections, state.loaded_at)
+
+    def invalidate(self):
+        self._state = None
+
+    def trips_saved(self, trips):
+        """Record new or changed trips; applied by the next query."""
+        from station.models import Bus, Trip
+
+        if self._state is None:
+            return
+        # one query for the buses not loaded with the trips
+        num_seats = {
+            trip.bus_id: trip.bus.num_seats
+            for trip in trips
+            if Trip.bus.is_cached(trip)
+        }
+        missing = {trip.bus_id for trip in trips} - num_seats.keys()
+        if missing:
+            num_seats.update(
+                Bus.objects.filter(pk__in=missing).values_list("pk", "num_seats")
+            )
+        connections = [
+            make_connection(
+                trip.pk,
+                trip.source,
+                trip.destination,
+                trip.departure,
+                num_seats[trip.bus_id],
+            )
+            for trip in trips
+        ]
+        with self._lock:
+            for connection in connections:
+                self._changes[connection.trip_id] = connection
+
+    def trips_deleted(self, trip_ids):
+        with self._lock:
+            for trip_id in trip_ids:
+                self._changes[trip_id] = None
+
+    def seat_changed(self, trip_id, event):
+        with self._lock:
+            state = self._state
+            connection = state and (
+                state.by_trip.get(trip_id) or self._changes.get(trip_id)
+            )
+            if connection:
+                connection.sold += 1 if event["status"] == "sold" else -1
+
+    def earliest_arrival(self, source, destination, departure, min_seats=0):
+        """The journey arriving first, leaving ``source`` at ``departure``
+        (minutes) or later, with ``min_seats`` free seats on every leg."""
+        state = self.state()
+        transfer = settings.JOURNEY_MIN_TRANSFER
+        arrival = {source: departure - transfer}  # no transfer at the start
+        via = {}
+        best = math.inf
+        for index in range(
+            bisect.bisect_left(state.departures, departure), len(state.connections)
+        ):
+            connection = state.connections[index]
+            if connection.departure >= best:
+                break
+            reached = arrival.get(connection.source)
+            if (
+                reached is None
+                or reached + transfer > connection.departure
+                or connection.seats_available < min_seats
+            ):
+                continue
+            if connection.arrival < arrival.get(connection.destination, math.inf):
+                arrival[connection.destination] = connection.arrival
+                via[connection.destination] = connection
+                if connection.destination == destination:
+                    best = connection.arrival
+
+        if destination not in via:
+            return None
+        legs, stop = [], destination
+        while stop != source:
+            legs.append(via[stop])
+            stop = via[stop].source
+        return Journey(legs[::-1])
+
+    def min_transfers(self, source, destination, departure, min_seats=0):
+        """The journey with the fewest legs (the earliest among those), at
+        most ``JOURNEY_MAX_LEGS``."""
+        state = self.state()
+        transfer = settings.JOURNEY_MIN_TRANSFER
+        start = bisect.bisect_left(state.departures, departure)
+        previous = {source: departure - transfer}
+        rounds = []  # connection reaching each stop improved in that round
+        for legs in range(1, settings.JOURNEY_MAX_LEGS + 1):
+            arrival, via = dict(previous), {}
+            for index in range(start, len(state.connections)):
+                connection = state.connections[index]
+                if connection.departure >= arrival.get(destination, math.inf):
+                    break
+                reached = previous.get(connection.source)
+                if (
+                    reached is None
+                    or reached + transfer > connection.departure
+                    or connection.seats_available < min_seats
+                ):
+                    continue
+                if connection.arrival < arrival.get(connection.destination, math.inf):
+                    arrival[connection.destination] = connection.arrival
+                    via[connection.destination] = connection
+            rounds.append(via)
+            if destination in via:
+                return Journey(self._round_legs(rounds, source, destination))
+            if not via:
+                return None
+            previous = arrival
+        return None
+
+    @staticmethod
+    def _round_legs(rounds, source, destination):
+        legs, stop, round_ = [], destination, len(rounds)
+        while stop != source:
+            # the label used came from the last round <= round_ improving it
+            while stop not in rounds[round_ - 1]:
+                round_ -= 1
+            connection = rounds[round_ - 1][stop]
+            legs.append(connection)
+            stop, round_ = connection.source, round_ - 1
+        return legs[::-1]
+
+
+timetable = Timetable()
+seat_events.broker.add_listener(timetable.seat_changed)
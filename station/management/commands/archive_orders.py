@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from station.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old orders and their tickets to the archive tables, a batch "
+        "per transaction. Safe to stop and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help="archive orders created more than this many days ago",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+            help="orders moved per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=settings.ORDER_ARCHIVE_PAUSE,
+            help="seconds to sleep between batches",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="stop after this many batches (the next run carries on)",
+        )
+
+    def handle(self, *args, **options):
+        orders, tickets = ArchivedOrder.objects.archive(
+            cutoff=timezone.now() - timedelta(days=options["older_than"]),
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {orders} orders and {tickets} tickets.")
+        )
@@ -0,0 +1,314 @@
+import datetime
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from django_rest_lesson.benchmarks import percentile
+from station.models import Bus, Trip
+
+BENCH_SOURCE = "bench-booking"
+BENCH_EMAIL = "bench-booking-{}@test.test"
+SEAT_POLICIES = ("random", "lowest", "block")
+LOCK_SAMPLE_INTERVAL = 0.01
+
+
+def group_size_range(value):
+    low, _, high = value.partition("-")
+    try:
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise ValueError(f"expected N or N-M, not {value!r}")
+    if not 1 <= low <= high:
+        raise ValueError(f"expected 1 <= N <= M, not {value!r}")
+    return low, high
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed trips and users, then POST orders from many threads against a "
+        "running server and report throughput, latency, seat conflicts and "
+        "database lock waits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--orders-path", default="/api/station/orders/")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--trips", type=int, default=20)
+        parser.add_argument(
+            "--hot-trips", type=int, default=1, help="trips most bookings go to"
+        )
+        parser.add_argument(
+            "--hot-share",
+            type=float,
+            default=0.9,
+            help="share of bookings for the hot trips",
+        )
+        parser.add_argument("--num-seats", type=int, default=500)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument(
+            "--group-size",
+            type=group_size_range,
+            default=(1, 4),
+            help="seats per order, N or N-M",
+        )
+        parser.add_argument(
+            "--seat-policy",
+            choices=SEAT_POLICIES,
+            default="random",
+            help=(
+                "random seats; the lowest seats not known to be sold (clients "
+                "racing for the same seat map); or a random block of seats"
+            ),
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not 0 <= options["hot_share"] <= 1:
+            raise CommandError("--hot-share must be between 0 and 1.")
+        if options["group_size"][1] > options["num_seats"]:
+            raise CommandError("--group-size can't exceed --num-seats.")
+
+        trip_ids = self._seed_trips(options["trips"], options["num_seats"])
+        tokens = self._seed_users(options["users"])
+        self.random = random.Random(options["seed"])
+        self.options = options
+        self.hot = trip_ids[: max(1, min(options["hot_trips"], len(trip_ids)))]
+        self.cold = trip_ids[len(self.hot) :]
+        self.sold = defaultdict(set)  # seats known to be sold, per trip
+        self.lock = threading.Lock()
+
+        url = options["base_url"] + options["orders_path"]
+        deadline = time.perf_counter() + options["duration"]
+        results = []
+        workers = [
+            threading.Thread(
+                target=self._book_loop,
+                args=(url, tokens[number % len(tokens)], deadline, results),
+            )
+            for number in range(options["threads"])
+        ]
+
+        lock_samples = []
+        stop_sampling = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample_lock_waits, args=(stop_sampling, lock_samples)
+        )
+        deadlocks_before = self._deadlocks()
+
+        started = time.perf_counter()
+        sampler.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        stop_sampling.set()
+        sampler.join()
+
+        self._report(results, elapsed, lock_samples, deadlocks_before)
+
+    def _seed_trips(self, count, num_seats):
+        bus, _ = Bus.objects.update_or_create(
+            info=BENCH_SOURCE, defaults={"num_seats": num_seats}
+        )
+        Trip.objects.filter(source=BENCH_SOURCE).delete()
+        trips = Trip.objects.bulk_create(
+            Trip(
+                source=BENCH_SOURCE,
+                destination=f"{BENCH_SOURCE}-{number}",
+                departure=datetime.time(number % 24, number % 60),
+                bus=bus,
+            )
+            for number in range(count)
+        )
+        return [trip.id for trip in trips]
+
+    def _seed_users(self, count):
+        # staff: creating orders is staff only (IsAdminOrIfAuthenticatedReadOnly)
+        user_model = get_user_model()
+        emails = [BENCH_EMAIL.format(number) for number in range(count)]
+        existing = set(
+            user_model.objects.filter(email__in=emails).values_list("email", flat=True)
+        )
+        new_users = [
+            user_model(email=email, is_staff=True)
+            for email in emails
+            if email not in existing
+        ]
+        for user in new_users:
+            user.set_unusable_password()  # token auth only, skip the hashing
+        user_model.objects.bulk_create(new_users)
+
+        users = list(user_model.objects.filter(email__in=emails))
+        user_model.objects.filter(pk__in=[user.pk for user in users]).update(
+            is_staff=True
+        )
+        with_token = set(
+            Token.objects.filter(user__in=users).values_list("user_id", flat=True)
+        )
+        Token.objects.bulk_create(
+            Token(user=user, key=Token.generate_key())
+            for user in users
+            if user.pk not in with_token
+        )
+        return list(Token.objects.filter(user__in=users).values_list("key", flat=True))
+
+    def _pick_trip(self):
+        # other threads drop sold out trips from the lists
+        with self.lock:
+            if self.cold and self.random.random() >= self.options["hot_share"]:
+                return self.random.choice(self.cold)
+            return self.random.choice(self.hot)
+
+    def _pick_seats(self, trip_id):
+        num_seats = self.options["num_seats"]
+        size = self.random.randint(*self.options["group_size"])
+        policy = self.options["seat_policy"]
+        with self.lock:
+            sold = set(self.sold[trip_id])
+        free = [seat for seat in range(1, num_seats + 1) if seat not in sold]
+        if len(free) < size:
+            return None
+        if policy == "lowest":
+            return free[:size]
+        if policy == "block":
+            start = self.random.randint(1, num_seats - size + 1)
+            return list(range(start, start + size))
+        return self.random.sample(range(1, num_seats + 1), size)
+
+    def _book_loop(self, url, token, deadline, results):
+        while time.perf_counter() < deadline:
+            trip_id = self._pick_trip()
+            seats = self._pick_seats(trip_id)
+            if seats is None:  # sold out as far as the clients know
+                with self.lock:
+                    if trip_id in self.hot and len(self.hot) > 1:
+                        self.hot.remove(trip_id)
+                    elif trip_id in self.cold:
+                        self.cold.remove(trip_id)
+                    else:
+                        return
+                continue
+
+            body = json.dumps(
+                {"tickets": [{"seat": seat, "trip": trip_id} for seat in seats]}
+            ).encode()
+            request = urllib.request.Request(
+                url,
+                data=body,
+                headers={
+                    "Authorization": f"Token {token}",
+                    "Content-Type": "application/json",
+                },
+            )
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                outcome = "ok"
+            except urllib.error.HTTPError as error:
+                outcome = self._classify(error)
+            except OSError:
+                outcome = "error"
+            latency = time.perf_counter() - started
+
+            if outcome == "ok":
+                with self.lock:
+                    self.sold[trip_id].update(seats)
+            results.append((outcome, latency, len(seats)))
+
+    @staticmethod
+    def _classify(error):
+        if error.code == 429:
+            return "throttled"
+        if error.code >= 500:
+            return "error"
+        body = error.read().decode(errors="replace")
+        return "conflict" if "already taken" in body else "rejected"
+
+    def _sample_lock_waits(self, stop, samples):
+        """Count backends waiting for a lock, every LOCK_SAMPLE_INTERVAL."""
+        if connection.vendor != "postgresql":
+            return
+        try:
+            with connection.cursor() as cursor:
+                while not stop.wait(LOCK_SAMPLE_INTERVAL):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' "
+                        "AND datname = current_database()"
+                    )
+                    samples.append(cursor.fetchone()[0])
+        finally:
+            connection.close()  # this thread's connection
+
+    @staticmethod
+    def _deadlocks():
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT deadlocks FROM pg_stat_database "
+                "WHERE datname = current_database()"
+            )
+            return cursor.fetchone()[0]
+
+    def _report(self, results, elapsed, lock_samples, deadlocks_before):
+        outcomes = Counter(outcome for outcome, _, _ in results)
+        latencies = [latency for _, latency, _ in results]
+        booked_seats = sum(seats for outcome, _, seats in results if outcome == "ok")
+        total = len(results) or 1
+        options = self.options
+
+        self.stdout.write(
+            f"workload:       {options['threads']} threads, "
+            f"{len(self.hot)} hot trip(s) with {options['hot_share']:.0%} of "
+            f"bookings, groups of {'-'.join(map(str, options['group_size']))}, "
+            f"{options['seat_policy']} seats"
+        )
+        self.stdout.write(
+            f"requests:       {len(results)} in {elapsed:.1f}s, "
+            + ", ".join(f"{count} {outcome}" for outcome, count in outcomes.items())
+        )
+        self.stdout.write(
+            f"throughput:     {outcomes['ok'] / elapsed:.1f} orders/s, "
+            f"{booked_seats / elapsed:.1f} seats/s, "
+            f"{len(results) / elapsed:.1f} requests/s"
+        )
+        self.stdout.write(
+            "latency:        p50 {:.1f}ms p95 {:.1f}ms p99 {:.1f}ms".format(
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 95) * 1000,
+                percentile(latencies, 99) * 1000,
+            )
+        )
+        self.stdout.write(
+            f"conflict rate:  {outcomes['conflict'] / total:.1%} "
+            f"(seat already taken)"
+        )
+        if lock_samples:
+            # each sample stands for LOCK_SAMPLE_INTERVAL of every waiter
+            waited = sum(lock_samples) * LOCK_SAMPLE_INTERVAL
+            self.stdout.write(
+                f"lock wait:      {waited:.2f}s in total (sampled), "
+                f"{sum(lock_samples) / len(lock_samples):.2f} waiting on average, "
+                f"{self._deadlocks() - deadlocks_before} deadlocks"
+            )
+        else:
+            self.stdout.write("lock wait:      n/a (PostgreSQL only)")
+        if outcomes["throttled"]:
+            self.stderr.write(
+                "Requests were throttled, raise DEFAULT_THROTTLE_RATES['user'] "
+                "for benchmarks."
+            )
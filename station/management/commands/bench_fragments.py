@@ -0,0 +1,98 @@
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from django_rest_lesson.benchmarks import percentile
+from station.models import Bus, Facility, Trip
+from station.views import BusViewSet, TripViewSet
+
+BENCH_SOURCE = "bench-fragments"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time trip and bus list pages rendered with and without the fragment "
+        "cache (station/fragments.py), in process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="trips seeded")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        self._seed(options["rows"])
+        user = get_user_model()(email="bench-fragments@test.test", is_staff=True)
+        factory = APIRequestFactory()
+        views = (
+            (
+                "trips",
+                TripViewSet.as_view({"get": "list"}, throttle_classes=[]),
+                {"limit": options["page_size"]},
+            ),
+            (
+                "buses",
+                BusViewSet.as_view({"get": "list"}, throttle_classes=[]),
+                {"page_size": options["page_size"]},
+            ),
+        )
+        for name, view, params in views:
+
+            def render():
+                request = factory.get("/", params, HTTP_ACCEPT="application/json")
+                force_authenticate(request, user=user)
+                view(request).render()
+
+            for label, enabled in (("no cache", False), ("cached", True)):
+                cache.clear()
+                with override_settings(
+                    FRAGMENT_CACHE=enabled,
+                    TRIP_LIST_COALESCE=False,
+                    ALLOWED_HOSTS=["testserver"],  # APIRequestFactory's host
+                ):
+                    render()  # fill the cache
+                    cpu, wall = [], []
+                    for _ in range(options["requests"]):
+                        cpu_started, started = time.process_time(), time.perf_counter()
+                        render()
+                        cpu.append(time.process_time() - cpu_started)
+                        wall.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{name + ' ' + label + ':':<18} "
+                    f"cpu {sum(cpu) / len(cpu) * 1000:.2f}ms/page, "
+                    f"wall p50 {percentile(wall, 50) * 1000:.2f}ms "
+                    f"p95 {percentile(wall, 95) * 1000:.2f}ms"
+                )
+
+    @staticmethod
+    def _seed(count):
+        existing = Trip.objects.filter(source=BENCH_SOURCE).count()
+        if existing >= count:
+            return
+        facilities = [
+            Facility.objects.get_or_create(name=f"{BENCH_SOURCE}-{number}")[0]
+            for number in range(3)
+        ]
+        buses = Bus.objects.bulk_create(
+            Bus(info=f"{BENCH_SOURCE}-{number}", num_seats=50)
+            for number in range(count - existing)
+        )
+        Bus.facility.through.objects.bulk_create(
+            Bus.facility.through(bus_id=bus.pk, facility_id=facility.pk)
+            for bus in buses
+            for facility in facilities
+        )
+        Trip.objects.bulk_create(
+            Trip(
+                source=BENCH_SOURCE,
+                destination=f"{BENCH_SOURCE}-{number % 20}",
+                departure=datetime.time(number % 24, number % 60),
+                bus=bus,
+            )
+            for number, bus in enumerate(buses)
+        )
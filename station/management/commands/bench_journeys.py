@@ -0,0 +1,85 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from django_rest_lesson.benchmarks import percentile
+from station.journeys import Timetable, make_connection, timetable
+
+
+class Command(BaseCommand):
+    help = (
+        "Time journey planning on a generated trip network (or the trips in "
+        "the database with --from-db)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trips", type=int, default=100_000)
+        parser.add_argument("--stops", type=int, default=1_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--min-seats", type=int, default=0)
+        parser.add_argument("--from-db", action="store_true")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        started = time.perf_counter()
+        if options["from_db"]:
+            network = timetable
+            state = network.state()
+        else:
+            stops = [f"stop-{number}" for number in range(options["stops"])]
+            network = Timetable(
+                make_connection(
+                    number,
+                    *rng.sample(stops, 2),
+                    datetime.time(rng.randrange(24), rng.randrange(60)),
+                    num_seats=50,
+                    sold=rng.randrange(51),
+                )
+                for number in range(options["trips"])
+            )
+            state = network.state()
+        build = time.perf_counter() - started
+
+        stops = sorted(
+            {c.source for c in state.connections}
+            | {c.destination for c in state.connections}
+        )
+        self.stdout.write(
+            f"network:        {len(state.connections)} trips, {len(stops)} stops, "
+            f"built in {build * 1000:.0f}ms"
+        )
+        if len(stops) < 2:
+            return
+
+        queries = [
+            (*rng.sample(stops, 2), rng.randrange(0, 18 * 60))
+            for _ in range(options["queries"])
+        ]
+        for label, plan in (
+            ("earliest", network.earliest_arrival),
+            ("min_transfers", network.min_transfers),
+        ):
+            samples, found, legs = [], 0, 0
+            for source, destination, departure in queries:
+                started = time.perf_counter()
+                journey = plan(source, destination, departure, options["min_seats"])
+                samples.append(time.perf_counter() - started)
+                if journey is not None:
+                    found += 1
+                    legs += len(journey.legs)
+            self.stdout.write(
+                "{:<15} p50 {:.1f}ms p95 {:.1f}ms p99 {:.1f}ms, "
+                "{} of {} found, {:.1f} legs on average".format(
+                    label + ":",
+                    percentile(samples, 50) * 1000,
+                    percentile(samples, 95) * 1000,
+                    percentile(samples, 99) * 1000,
+                    found,
+                    len(queries),
+                    legs / found if found else 0,
+                )
+            )
@@ -0,0 +1,83 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+
+from django_rest_lesson import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what MetricsMiddleware adds per request and per database "
+        "query, and how long a snapshot flush takes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20_000)
+        parser.add_argument("--queries", type=int, default=5, help="per request")
+        parser.add_argument("--path", default="/api/station/buses/")
+        parser.add_argument("--response-size", type=int, default=2_000)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get(options["path"])
+        request.resolver_match = resolve(options["path"])
+        body = b"x" * options["response_size"]
+        queries = options["queries"]
+
+        def view(request):
+            return HttpResponse(body)
+
+        def view_with_queries(request):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute("SELECT 1")
+            return HttpResponse(body)
+
+        saved_registry = metrics.registry
+        metrics.registry = metrics.Registry()
+        try:
+            with override_settings(METRICS_DIR=None):
+                per_request = self._overhead(view, request, options["requests"])
+                per_query = (
+                    self._overhead(
+                        view_with_queries, request, options["requests"] // 10
+                    )
+                    - per_request
+                ) / max(queries, 1)
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                METRICS_DIR=directory
+            ):
+                started = time.perf_counter()
+                metrics.registry.flush()
+                flush = time.perf_counter() - started
+            series = len(metrics.registry.snapshot())
+        finally:
+            metrics.registry = saved_registry
+
+        self.stdout.write(f"per request:    {per_request * 1e6:.2f}us added")
+        self.stdout.write(f"per query:      {per_query * 1e6:.2f}us added")
+        self.stdout.write(
+            f"flush:          {flush * 1000:.2f}ms for {series} series "
+            f"(at most once per METRICS_FLUSH_INTERVAL per process)"
+        )
+
+    @staticmethod
+    def _overhead(view, request, count):
+        """Seconds MetricsMiddleware adds to one call of ``view``."""
+        middleware = metrics.MetricsMiddleware(view)
+        for handler in (view, middleware):  # warm up
+            for _ in range(100):
+                handler(request)
+
+        timings = {}
+        for handler in (view, middleware, view, middleware):
+            started = time.perf_counter()
+            for _ in range(count):
+                handler(request)
+            elapsed = time.perf_counter() - started
+            timings[handler] = min(timings.get(handler, elapsed), elapsed)
+        return (timings[middleware] - timings[view]) / count
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: import the WSGI app, then time the first and
+# second request to each path and read the process RSS.
+PROBE = r"""
+import io, json, sys, time
+
+started = time.perf_counter()
+from django_rest_lesson.wsgi import application
+import_seconds = time.perf_counter() - started
+
+
+def call(path):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+    }
+    started = time.perf_counter()
+    body = application(environ, lambda status, headers: None)
+    b"".join(body)
+    return time.perf_counter() - started
+
+
+requests = {}
+for path in json.loads(sys.argv[1]):
+    requests[path] = [call(path), call(path)]
+
+with open("/proc/self/status") as status:
+    rss_kb = next(int(line.split()[1]) for line in status if line.startswith("VmRSS"))
+
+print(json.dumps({"import": import_seconds, "requests": requests, "rss_kb": rss_kb}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure import time, time to first response and RSS of a fresh "
+        "worker process, with and without the startup warm-up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="request path to time, can be repeated",
+        )
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or ["/api/station/trips/", "/api/doc/"]
+        for warmup in ("0", "1"):
+            runs = [self._run(paths, warmup) for _ in range(options["runs"])]
+            best = min(runs, key=lambda run: run["import"])
+            self.stdout.write(f"warm-up {'on' if warmup == '1' else 'off'}:")
+            self.stdout.write(f"  import + setup:  {best['import'] * 1000:8.1f} ms")
+            for path in paths:
+                first = min(run["requests"][path][0] for run in runs)
+                second = min(run["requests"][path][1] for run in runs)
+                self.stdout.write(
+                    f"  {path:<20} first {first * 1000:8.1f} ms, "
+                    f"next {second * 1000:8.1f} ms"
+                )
+            self.stdout.write(
+                f"  rss:             {max(run['rss_kb'] for run in runs) / 1024:8.1f} MB"
+            )
+
+    @staticmethod
+    def _run(paths, warmup):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE, json.dumps(paths)],
+            env={**os.environ, "WARMUP_ON_STARTUP": warmup},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
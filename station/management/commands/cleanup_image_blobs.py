@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from station.models import ImageBlob
+
+
+class Command(BaseCommand):
+    help = "Delete bus image files no longer used by any bus."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=settings.BUS_IMAGE_ORPHAN_GRACE,
+            help="seconds a blob must have been unused before it is deleted",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BUS_IMAGE_CLEANUP_BATCH_SIZE,
+            help="blobs deleted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        grace = timedelta(seconds=options["grace"])
+        deleted = ImageBlob.objects.delete_orphans(
+            grace=grace, batch_size=options["batch_size"]
+        )
+        unrecorded = ImageBlob.objects.delete_unrecorded(
+            grace=grace, batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} unused image blobs and {unrecorded} "
+                "files of rolled back uploads."
+            )
+        )
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from station.models import Bus, ImageBlob
+from station.storage import digest_from_name, get_bus_image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move bus images stored under upload/buses with per-upload names "
+        "into content-addressed blobs, so identical files are kept once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BUS_IMAGE_CLEANUP_BATCH_SIZE,
+            help="buses read from the database at a time",
+        )
+
+    def handle(self, *args, **options):
+        storage = get_bus_image_storage()
+        buses = (
+            Bus.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .only("id", "image")
+            .order_by("pk")
+            .iterator(chunk_size=options["batch_size"])
+        )
+
+        moved = freed = 0
+        for bus in buses:
+            old_name = bus.image.name
+            if digest_from_name(old_name):
+                continue
+            if not storage.exists(old_name):
+                self.stderr.write(f"bus {bus.pk}: {old_name} is missing, skipped")
+                continue
+
+            size = storage.size(old_name)
+            with storage.open(old_name, "rb") as image:
+                new_name = storage.save(old_name, image)
+            is_new_blob = not ImageBlob.objects.filter(name=new_name).exists()
+
+            with transaction.atomic():
+                updated = Bus.objects.filter(pk=bus.pk, image=old_name).update(
+                    image=new_name, image_hash=digest_from_name(new_name)
+                )
+                if not updated:  # changed meanwhile, its save counted the new image
+                    continue
+                ImageBlob.objects.acquire(new_name)
+                ImageBlob.objects.filter(name=old_name).delete()
+
+            if not Bus.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+                freed += size - (storage.size(new_name) if is_new_blob else 0)
+            moved += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Moved {moved} bus images to content-addressed blobs, "
+                f"{freed} bytes freed."
+            )
+        )
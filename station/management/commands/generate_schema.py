@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from django_rest_lesson.schema import build_schema, write_schema
+
+
+class Command(BaseCommand):
+    help = "Build the OpenAPI schema once and store it as JSON and YAML."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir", help="defaults to settings.SCHEMA_CACHE_DIR"
+        )
+
+    def handle(self, *args, **options):
+        document = build_schema()
+        write_schema(document, options["output_dir"])
+        if options["verbosity"] > 0:
+            self.stdout.write(
+                self.style.SUCCESS(f"Schema version {document.version} written.")
+            )
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from station import booking_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Book the orders waiting in the booking queue, a batch of one trip "
+        "per transaction. Run as many workers as needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BOOKING_QUEUE_BATCH_SIZE,
+            help="requests of a trip booked per transaction",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.BOOKING_QUEUE_POLL_INTERVAL,
+            help="seconds to sleep while the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="stop once the queue is empty instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        booked = rejected = 0
+        try:
+            while True:
+                close_old_connections()  # a long-running process, like a request
+                batch_booked, batch_rejected = booking_queue.process_batch(
+                    options["batch_size"]
+                )
+                booked += batch_booked
+                rejected += batch_rejected
+                if batch_booked or batch_rejected:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(f"Booked {booked} orders, rejected {rejected}.")
+        )
@@ -0,0 +1,143 @@
+"""Delivery of bus images.
+
+Image URLs contain the sha256 of the file (``Bus.image_hash``), so a
+response never changes and is sent with public, immutable cache headers
+that shared caches and CDNs can reuse. The view only authorizes the
+request; the bytes are sent by the front proxy when
+``MEDIA_DELIVERY`` is "x-accel-redirect" (nginx) or "x-sendfile"
+(Apache/lighttpd). Without a proxy ("django") whole files go through
+FileResponse, which uses the server's sendfile-capable ``wsgi.file_wrapper``,
+and Range requests are answered with 206 partial content.
+"""
+
+import io
+import json
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from rest_framework.renderers import BaseRenderer
+
+from station.storage import get_bus_image_storage
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+STREAM_CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Lets binary views accept any ``Accept`` header (image/*, etc.)."""
+
+    media_type = "*/*"
+    format = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data).encode()
+
+
+def variant_name(digest, variant):
+    return f"upload/buses/variants/{digest}-{variant}.jpg"
+
+
+def ensure_variant(bus, variant):
+    """Return the storage name of a resized variant, creating it on first use."""
+    from PIL import Image
+
+    storage = get_bus_image_storage()
+    name = variant_name(bus.image_hash, variant)
+    if storage.exists(name):
+        return name
+
+    with bus.image.open("rb") as original:
+        image = Image.open(original)
+        image.thumbnail(settings.BUS_IMAGE_VARIANTS[variant])
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def parse_range(header, size):
+    """Return (start, end) for a single "bytes=" range, None to send it all."""
+    match = RANGE_RE.fullmatch((header or "").strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if match[1]:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    else:
+        start, end = max(0, size - int(match[2])), size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _stream(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, name, etag):
+    """Send a file of the bus image storage, handing the transfer to the
+    proxy if configured."""
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    elif settings.MEDIA_DELIVERY == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + name
+        )
+    elif settings.MEDIA_DELIVERY == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = get_bus_image_storage().path(name)
+    else:
+        response = _serve_from_django(request, name, content_type)
+
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    # public: bus images are the same for every user, so shared caches and
+    # CDNs may keep them; the hash in the URL is what makes that safe
+    patch_cache_control(
+        response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+    )
+    return response
+
+
+def _serve_from_django(request, name, content_type):
+    storage = get_bus_image_storage()
+    size = storage.size(name)
+    try:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        return FileResponse(storage.open(name, "rb"), content_type=content_type)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _stream(storage.open(name, "rb"), start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
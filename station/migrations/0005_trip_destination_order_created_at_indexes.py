@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0004_bus_image_alter_facility_name_alter_order_user"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at"], name="station_ord_created_51ec24_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["destination"], name="station_tri_destina_389903_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0005_trip_destination_order_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bus",
+            name="image_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
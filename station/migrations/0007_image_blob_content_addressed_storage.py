@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:20
+
+import station.models
+import station.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0006_bus_image_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="bus",
+            name="image",
+            field=models.ImageField(
+                null=True,
+                storage=station.storage.get_bus_image_storage,
+                upload_to=station.models.create_custom_path,
+            ),
+        ),
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("released_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("ref_count", 0)),
+                        fields=["released_at"],
+                        name="station_imageblob_orphan_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+POSTGRESQL_CREATE = """
+CREATE FUNCTION station_ticket_check_seat() RETURNS trigger AS $$
+DECLARE
+    num_seats integer;
+BEGIN
+    SELECT bus.num_seats INTO num_seats
+    FROM station_trip trip JOIN station_bus bus ON bus.id = trip.bus_id
+    WHERE trip.id = NEW.trip_id;
+    IF NEW.seat < 1 OR NEW.seat > num_seats THEN
+        RAISE EXCEPTION 'seat must be in range [1 and %], not %', num_seats, NEW.seat
+            USING ERRCODE = 'check_violation',
+                  CONSTRAINT = 'ticket_seat_in_bus_range';
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ticket_seat_in_bus_range
+BEFORE INSERT OR UPDATE OF seat, trip_id ON station_ticket
+FOR EACH ROW EXECUTE FUNCTION station_ticket_check_seat();
+"""
+
+POSTGRESQL_DROP = """
+DROP TRIGGER IF EXISTS ticket_seat_in_bus_range ON station_ticket;
+DROP FUNCTION IF EXISTS station_ticket_check_seat();
+"""
+
+# SQLite can't format the message, the model maps it to the seat error
+SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER ticket_seat_in_bus_range_{name}
+    BEFORE {event} ON station_ticket
+    WHEN NEW.seat < 1 OR NEW.seat > (
+        SELECT bus.num_seats
+        FROM station_trip trip JOIN station_bus bus ON bus.id = trip.bus_id
+        WHERE trip.id = NEW.trip_id
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'ticket_seat_in_bus_range');
+    END
+    """
+    for name, event in (("insert", "INSERT"), ("update", "UPDATE OF seat, trip_id"))
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS ticket_seat_in_bus_range_insert",
+    "DROP TRIGGER IF EXISTS ticket_seat_in_bus_range_update",
+]
+
+
+def create_seat_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        # no params: the % in the RAISE format must not be taken as placeholders
+        schema_editor.execute(POSTGRESQL_CREATE, params=None)
+    elif vendor == "sqlite":
+        for statement in SQLITE_CREATE:
+            schema_editor.execute(statement)
+
+
+def drop_seat_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(POSTGRESQL_DROP, params=None)
+    elif vendor == "sqlite":
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0007_image_blob_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_seat_trigger, drop_seat_trigger),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-19 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0010_booking_request"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="bus",
+            name="facility",
+            field=models.ManyToManyField(
+                blank=True, related_name="buses", to="station.facility"
+            ),
+        ),
+    ]
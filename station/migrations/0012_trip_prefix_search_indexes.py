@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# The admin's autocomplete for trips ("^source", "^destination") runs
+# UPPER(column) LIKE 'TERM%'. Only an index on the same expression with a
+# pattern operator class serves it whatever the database collation; SQLite
+# has neither, so the indexes are PostgreSQL only.
+INDEXES = {
+    "station_trip_source_upper_idx": "source",
+    "station_trip_destination_upper_idx": "destination",
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} "
+            f"ON station_trip ((UPPER({column}::text)) varchar_pattern_ops)"
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("station", "0011_alter_bus_facility"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
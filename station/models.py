@@ -1,11 +1,22 @@
 import pathlib
+import posixpath
+import re
+import time
 import uuid
+import weakref
 
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, UniqueConstraint
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 
-from django_rest_lesson import settings
+from station import fragments, journeys, order_cache, seat_events
+from station.media import variant_name
+from station.storage import digest_from_name, get_bus_image_storage
 
 
 class Facility(models.Model):
@@ -18,22 +29,160 @@ class Facility(models.Model):
         return f"{self.name}"
 
 
+IMAGE_DIRECTORY = "upload/buses"
+
+
 def create_custom_path(instance: "Bus", filename: str) -> pathlib.Path:
     filename = (
         f"{slugify(instance.info)}-{uuid.uuid4()}" + pathlib.Path(filename).suffix
     )
-    return pathlib.Path("upload/buses") / pathlib.Path(filename)
+    return pathlib.Path(IMAGE_DIRECTORY) / pathlib.Path(filename)
+
+
+class ImageBlobManager(models.Manager):
+    def acquire(self, name):
+        """Count one more user of the blob; it must not be deleted meanwhile."""
+        with transaction.atomic():
+            # waits for a running cleanup batch holding this row
+            blob, _ = self.select_for_update().get_or_create(name=name)
+            self.filter(pk=blob.pk).update(
+                ref_count=F("ref_count") + 1, released_at=None
+            )
+
+    def release(self, name):
+        self.filter(name=name, ref_count__gt=0).update(
+            ref_count=F("ref_count") - 1, released_at=Now()
+        )
+
+    def delete_orphans(self, grace, batch_size):
+        """Delete blobs unused for longer than ``grace``, ``batch_size`` per
+        transaction. Returns the number of blobs deleted."""
+        storage = get_bus_image_storage()
+        cutoff = timezone.now() - grace
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                blobs = list(
+                    self.select_for_update(skip_locked=True)
+                    .filter(ref_count=0, released_at__lt=cutoff)
+                    .order_by("pk")[:batch_size]
+                )
+                if not blobs:
+                    return deleted
+                self.filter(pk__in=[blob.pk for blob in blobs]).delete()
+                # files go while the rows are locked, so acquire() can't
+                # pick up a blob that is being removed
+                for blob in blobs:
+                    storage.delete(blob.name)
+                    digest = digest_from_name(blob.name)
+                    for variant in settings.BUS_IMAGE_VARIANTS if digest else ():
+                        storage.delete(variant_name(digest, variant))
+            deleted += len(blobs)
+
+    def delete_unrecorded(self, grace, batch_size):
+        """Delete stored blobs without an ImageBlob row, written more than
+        ``grace`` ago: uploads of Bus saves that were rolled back. Returns
+        the number of files deleted."""
+        storage = get_bus_image_storage()
+        cutoff = timezone.now() - grace
+        if not storage.exists(IMAGE_DIRECTORY):
+            return 0
+        names = []
+        for directory in storage.listdir(IMAGE_DIRECTORY)[0]:
+            directory = posixpath.join(IMAGE_DIRECTORY, directory)
+            names.extend(
+                posixpath.join(directory, filename)
+                for filename in storage.listdir(directory)[1]
+                if digest_from_name(filename)
+            )
+        deleted = 0
+        for start in range(0, len(names), batch_size):
+            batch = names[start : start + batch_size]
+            recorded = set(self.filter(name__in=batch).values_list("name", flat=True))
+            for name in batch:
+                # the modification time is refreshed when an upload reuses it
+                if name not in recorded and storage.get_modified_time(name) < cutoff:
+                    storage.delete(name)
+                    deleted += 1
+        return deleted
+
+
+class ImageBlob(models.Model):
+    """A stored bus image file and the number of buses using it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ImageBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["released_at"],
+                condition=Q(ref_count=0),
+                name="station_imageblob_orphan_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
 
 
 class Bus(models.Model):
     info = models.CharField(max_length=255, null=True)
     num_seats = models.IntegerField()
     facility = models.ManyToManyField("Facility", related_name="buses", blank=True)
-    image = models.ImageField(null=True, upload_to=create_custom_path)
+    image = models.ImageField(
+        null=True, upload_to=create_custom_path, storage=get_bus_image_storage
+    )
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     class Meta:
         verbose_name = "buses"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        bus = super().from_db(db, field_names, values)
+        if "image" in field_names:
+            # the stored image name, save() needs no query to see a change
+            bus._stored_image = values[field_names.index("image")]
+        return bus
+
+    def _previous_image(self):
+        if self.pk is None:
+            return None
+        if hasattr(self, "_stored_image"):
+            return self._stored_image
+        return Bus.objects.filter(pk=self.pk).values_list("image", flat=True).first()
+
+    def save(self, *args, **kwargs):
+        previous = self._previous_image()
+
+        with transaction.atomic():
+            upload = None
+            if self.image and not self.image._committed:
+                # stored here already, the name gives the hash for the url;
+                # if the transaction is rolled back the file has no ImageBlob
+                # row, cleanup_image_blobs deletes it after the grace period
+                upload = self.image.file
+                self.image.save(self.image.name, upload, save=False)
+            if not self.image:
+                self.image_hash = ""
+            else:
+                self.image_hash = digest_from_name(self.image.name) or self.image_hash
+
+            super().save(*args, **kwargs)
+            if (previous or None) != (self.image.name or None):
+                if self.image:
+                    ImageBlob.objects.acquire(self.image.name)
+                    if upload and not self.image.storage.exists(self.image.name):
+                        # removed by a cleanup that ran since it was stored
+                        self.image.storage.save(self.image.name, upload)
+                if previous:
+                    ImageBlob.objects.release(previous)
+        self._stored_image = self.image.name or None
+
     @property
     def is_small(self):
         return self.num_seats <= 25
@@ -42,6 +191,12 @@ class Bus(models.Model):
         return f" Bus: {self.info} (id: {self.id})"
 
 
+@receiver(post_delete, sender=Bus)
+def release_bus_image(sender, instance, **kwargs):
+    if instance.image:
+        ImageBlob.objects.release(instance.image.name)
+
+
 class Trip(models.Model):
     source = models.CharField(max_length=63)
     destination = models.CharField(max_length=255)
@@ -51,6 +206,7 @@ class Trip(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["source", "destination"]),
+            models.Index(fields=["destination"]),
             models.Index(fields=["departure"]),
         ]
 
@@ -62,11 +218,18 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
     def __str__(self):
         return f"{self.user}, {self.created_at}"
 
 
 class Ticket(models.Model):
+    # enforced by the database, see migration 0008 and raise_for_seat_violation
+    SEAT_RANGE_CONSTRAINT = "ticket_seat_in_bus_range"
+    UNIQUE_SEAT_CONSTRAINT = "unique_ticket_seat_trip"
+
     seat = models.IntegerField()
     trip = models.ForeignKey("Trip", on_delete=models.CASCADE, related_name="tickets")
     order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="tickets")
@@ -93,10 +256,341 @@ class Ticket(models.Model):
         #         "seat": f"seat must be in range[1, {self.trip.bus.num_seats}], not {self.seat}"
         #     })
 
+    @staticmethod
+    def raise_for_seat_violation(error, error_to_raise):
+        """Raise ``error_to_raise({"seat": ...})`` if the IntegrityError
+        ``error`` comes from a seat constraint, else return.
+
+        No query is run: on PostgreSQL the transaction is aborted by now.
+        """
+        diag = getattr(error.__cause__, "diag", None)
+        if diag is not None:  # PostgreSQL names the constraint
+            constraint = diag.constraint_name or ""
+            message, detail = diag.message_primary, diag.message_detail or ""
+        else:  # SQLite only has the message
+            constraint = message = detail = str(error)
+
+        if Ticket.SEAT_RANGE_CONSTRAINT in constraint:
+            if message == Ticket.SEAT_RANGE_CONSTRAINT:  # SQLite can't format it
+                message = "seat must be in range [1 and the bus seats]"
+            raise error_to_raise({"seat": message})
+        if Ticket.UNIQUE_SEAT_CONSTRAINT in constraint or (
+            "station_ticket.seat, station_ticket.trip_id" in constraint
+        ):
+            taken = re.search(r"\(seat, trip_id\)=\((\d+),", detail)
+            seat = f"seat {taken[1]}" if taken else "seat"
+            raise error_to_raise({"seat": f"{seat} is already taken on this trip"})
+
     def save(
         self, force_insert=False, force_update=False, using=None, update_fields=None
     ):
-        self.full_clean()
-        return super(Ticket, self).save(
-            force_insert, force_update, using, update_fields
+        # no full_clean(): the seat checks are left to the database
+        try:
+            return super(Ticket, self).save(
+                force_insert, force_update, using, update_fields
+            )
+        except IntegrityError as error:
+            Ticket.raise_for_seat_violation(error, ValueError)
+            raise
+
+
+class ArchivedOrderManager(models.Manager):
+    def archive(self, cutoff, batch_size, pause=0.0, max_batches=None):
+        """Move orders created before ``cutoff``, and their tickets, to the
+        archive tables, ``batch_size`` orders per transaction with ``pause``
+        seconds between batches. Ids are kept, so a run that is stopped
+        can simply be started again. Returns ``(orders, tickets)`` moved.
+
+        The archived tickets no longer hold their seats: they are published
+        as released and can be sold again.
+        """
+        orders = tickets = batches = 0
+        while max_batches is None or batches < max_batches:
+            moved_orders, moved_tickets = self._archive_batch(cutoff, batch_size)
+            if not moved_orders:
+                break
+            orders += moved_orders
+            tickets += moved_tickets
+            batches += 1
+            if pause:
+                time.sleep(pause)
+        return orders, tickets
+
+    def _archive_batch(self, cutoff, batch_size):
+        with transaction.atomic():
+            # orders being written by a request are left for the next run
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(created_at__lt=cutoff)
+                .order_by("created_at", "pk")[:batch_size]
+            )
+            if not orders:
+                return 0, 0
+            order_ids = [order.pk for order in orders]
+            tickets = list(Ticket.objects.filter(order_id__in=order_ids))
+
+            self.bulk_create(
+                ArchivedOrder(
+                    id=order.pk, created_at=order.created_at, user_id=order.user_id
+                )
+                for order in orders
+            )
+            ArchivedTicket.objects.bulk_create(
+                ArchivedTicket(
+                    id=ticket.pk,
+                    seat=ticket.seat,
+                    trip_id=ticket.trip_id,
+                    order_id=ticket.order_id,
+                )
+                for ticket in tickets
+            )
+            # the delete receivers invalidate the users' order caches and
+            # publish the seats as released, once for the batch
+            Order.objects.filter(pk__in=order_ids).delete()
+        return len(orders), len(tickets)
+
+
+class ArchivedOrder(models.Model):
+    """An Order moved out of the live tables by ``archive_orders``."""
+
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_orders",
+    )
+
+    objects = ArchivedOrderManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-created_at"])]
+
+    def __str__(self):
+        return f"{self.user}, {self.created_at} (archived)"
+
+
+class ArchivedTicket(models.Model):
+    seat = models.IntegerField()
+    # history outlives the trip
+    trip = models.ForeignKey(
+        "Trip",
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="archived_tickets",
+    )
+    order = models.ForeignKey(
+        "ArchivedOrder", on_delete=models.CASCADE, related_name="tickets"
+    )
+
+    def __str__(self):
+        return f"{self.trip} seat: {self.seat} (archived)"
+
+
+class BookingRequest(models.Model):
+    """An order waiting in the booking queue (station.booking_queue)."""
+
+    QUEUED = "queued"
+    BOOKED = "booked"
+    REJECTED = "rejected"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (BOOKED, "Booked"), (REJECTED, "Rejected")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="booking_requests",
+    )
+    # requests are booked in batches per trip: the first trip of the tickets
+    trip = models.ForeignKey(
+        "Trip", on_delete=models.CASCADE, related_name="booking_requests"
+    )
+    tickets = models.JSONField()  # [{"seat": 1, "trip": 2}, ...]
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    order = models.OneToOneField(
+        "Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="booking_request",
+    )
+    errors = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "trip", "created_at"])]
+
+    def __str__(self):
+        return f"{self.user}, {self.trip_id}: {self.status}"
+
+
+# delete() calls seen by a receiver, see first_of_deletion
+_deletions = weakref.WeakValueDictionary()
+
+
+def first_of_deletion(receiver_name, origin):
+    """Whether ``receiver_name`` runs for the first time in the delete()
+    call of ``origin``, the instance or queryset it was called on.
+
+    delete() sends pre_delete and post_delete for every object it removes,
+    cascades included; receivers doing the work for all of them at the
+    first one skip the others.
+    """
+    key = (receiver_name, id(origin), getattr(origin, "pk", None))
+    if _deletions.get(key) is origin:
+        return False
+    _deletions[key] = origin
+    return True
+
+
+def deleted_rows(origin):
+    """``(model, pks)`` of the rows a delete() of ``origin`` was called on,
+    ``pks`` a list or a subquery; None when there's no origin."""
+    if isinstance(origin, models.QuerySet):
+        return origin.model, origin.values("pk")
+    if isinstance(origin, models.Model):
+        return type(origin), [origin.pk]
+    return None
+
+
+# how order pages reach the models whose data they show
+ORDER_USER_LOOKUPS = {
+    "station.Order": "pk",
+    "station.Ticket": "tickets",
+    "station.Trip": "tickets__trip",
+    "station.Bus": "tickets__trip__bus",
+    settings.AUTH_USER_MODEL: "user",
+}
+
+
+def order_users(model, pks):
+    """Ids of the users whose order pages show any of the ``model`` rows
+    ``pks``, as a queryset."""
+    lookup = ORDER_USER_LOOKUPS[model._meta.label]
+    return (
+        Order.objects.filter(**{f"{lookup}__in": pks})
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+
+def _ticket_user_id(ticket):
+    if Ticket.order.is_cached(ticket):
+        return ticket.order.user_id
+    return (
+        Order.objects.filter(pk=ticket.order_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def invalidate_order_cache_on_order_save(sender, instance, **kwargs):
+    order_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Ticket)
+def invalidate_order_cache_on_ticket_save(sender, instance, **kwargs):
+    user_id = _ticket_user_id(instance)
+    if user_id is not None:
+        order_cache.invalidate_user(user_id)
+
+
+@receiver(pre_delete, sender=Order)
+def invalidate_order_cache_on_order_delete(sender, instance, origin=None, **kwargs):
+    # one query for every order the delete() call removes
+    deleted = deleted_rows(origin)
+    if deleted is None or deleted[0]._meta.label not in ORDER_USER_LOOKUPS:
+        order_cache.invalidate_user(instance.user_id)
+    elif first_of_deletion("orders", origin):
+        order_cache.invalidate_users(order_users(*deleted))
+
+
+# how tickets reach the models whose deletion removes them
+TICKET_LOOKUPS = {
+    "station.Ticket": "pk",
+    "station.Order": "order",
+    "station.Trip": "trip",
+    "station.Bus": "trip__bus",
+    settings.AUTH_USER_MODEL: "order__user",
+}
+
+
+@receiver(pre_delete, sender=Ticket)
+def release_deleted_tickets(sender, instance, origin=None, **kwargs):
+    """Invalidate the order caches of the tickets' users and publish their
+    seats as released, once for all the tickets the delete() call removes
+    directly or along with their order, trip, bus or user."""
+    deleted = deleted_rows(origin)
+    lookup = deleted and TICKET_LOOKUPS.get(deleted[0]._meta.label)
+    if isinstance(origin, Ticket) or lookup is None:
+        user_id = _ticket_user_id(instance)
+        if user_id is not None:
+            order_cache.invalidate_user(user_id)
+        seat_events.publish_seats([instance], seat_events.RELEASED)
+    elif first_of_deletion("tickets", origin):
+        tickets = list(
+            Ticket.objects.filter(**{f"{lookup}__in": deleted[1]})
+            .select_related("order")
+            .only("trip_id", "seat", "order__user_id")
         )
+        order_cache.invalidate_users(ticket.order.user_id for ticket in tickets)
+        seat_events.publish_seats(tickets, seat_events.RELEASED)
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_save, sender=Bus)
+def invalidate_order_cache_on_trip_change(sender, instance, created, **kwargs):
+    # their deletion removes the tickets, see invalidate_order_cache_on_delete
+    if not created:
+        order_cache.invalidate_users(order_users(sender, [instance.pk]))
+
+
+@receiver(post_save, sender=Ticket)
+def publish_seat_sold(sender, instance, created, **kwargs):
+    if created:
+        seat_events.publish_seats([instance], seat_events.SOLD)
+
+
+@receiver(post_save, sender=Trip)
+def update_timetable_on_trip_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: journeys.timetable.trips_saved([instance]))
+
+
+@receiver(post_delete, sender=Trip)
+def update_timetable_on_trip_delete(sender, instance, **kwargs):
+    trip_id = instance.pk
+    transaction.on_commit(lambda: journeys.timetable.trips_deleted([trip_id]))
+
+
+@receiver([post_save, post_delete], sender=Bus)
+def reload_timetable_on_bus_change(sender, **kwargs):
+    transaction.on_commit(journeys.timetable.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Trip)
+@receiver([post_save, post_delete], sender=Bus)
+def invalidate_fragments_on_row_change(sender, instance, **kwargs):
+    fragments.invalidate(sender, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Bus.facility.through)
+def invalidate_fragments_on_bus_facility_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action == "pre_clear" and reverse:
+        # the facility's buses can't be told after the clear
+        fragments.invalidate(Bus, instance.buses.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            fragments.invalidate(Bus, [instance.pk])
+        elif pk_set:
+            fragments.invalidate(Bus, pk_set)
+
+
+@receiver(post_save, sender=Facility)
+@receiver(pre_delete, sender=Facility)
+def invalidate_fragments_on_facility_change(sender, instance, **kwargs):
+    # bus rows show facility names
+    fragments.invalidate(Bus, instance.buses.values_list("pk", flat=True))
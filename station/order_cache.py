@@ -0,0 +1,101 @@
+"""Per-user cache of order list pages and the order summary.
+
+Entries are keyed by a per-user generation number, so invalidating all of
+a user's pages is dropping a single key instead of deleting every page
+key; stale entries simply expire. Generations start at the current time
+rather than 1, so a dropped (or evicted) generation key comes back at a
+value newer than the one older pages were stored under. Changes to a
+trip or bus nested in the pages invalidate the users with tickets on it.
+
+The cache is on with ``ORDER_CACHE``; it needs a cache shared by the
+worker processes, or a process would keep serving pages another one
+invalidated.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _generation_key(user_id):
+    return f"orders:{user_id}:generation"
+
+
+def _generation(user_id):
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _key(user_id, generation, name):
+    return f"orders:{user_id}:{generation}:{name}"
+
+
+def _page_name(path):
+    return "page:" + hashlib.sha1(path.encode()).hexdigest()
+
+
+def generation(user_id):
+    """The user's current generation, None with the cache off.
+
+    Read it once, before computing the data to store: an invalidation
+    committed meanwhile then leaves the data under a dropped generation
+    instead of the new one.
+    """
+    if not settings.ORDER_CACHE:
+        return None
+    return _generation(user_id)
+
+
+def get_page(user_id, generation, path):
+    if generation is None:
+        return None
+    return cache.get(_key(user_id, generation, _page_name(path)))
+
+
+def set_page(user_id, generation, path, data):
+    if generation is not None:
+        cache.set(
+            _key(user_id, generation, _page_name(path)),
+            data,
+            settings.ORDER_CACHE_TIMEOUT,
+        )
+
+
+def get_summary(user_id, generation):
+    if generation is None:
+        return None
+    return cache.get(_key(user_id, generation, "summary"))
+
+
+def set_summary(user_id, generation, summary):
+    if generation is not None:
+        cache.set(
+            _key(user_id, generation, "summary"),
+            summary,
+            settings.ORDER_CACHE_TIMEOUT,
+        )
+
+
+def invalidate_users(user_ids):
+    """Drop the cached order pages and summaries of ``user_ids``."""
+    if not settings.ORDER_CACHE:
+        return
+    keys = [_generation_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # again after commit: a request running meanwhile may have cached the
+    # data from before the change under the new generation
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_user(user_id):
+    """Drop the user's cached order pages and summary."""
+    invalidate_users([user_id])
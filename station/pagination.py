@@ -0,0 +1,180 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate for ``queryset``, or None.
+
+    Unfiltered querysets use ``pg_class.reltuples``, filtered ones the row
+    estimate of ``EXPLAIN``. Only PostgreSQL is supported; other backends
+    return None so callers fall back to an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 for tables that were never analyzed
+            if row and row[0] >= 0:
+                return int(row[0])
+            return None
+
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:  # e.g. queryset.none()
+            return 0
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(queryset, exact_count_threshold=None, count_cap=None):
+    """Count ``queryset`` without scanning a huge table if possible.
+
+    Returns ``(count, is_estimated)``. Small results (planner estimate below
+    ``exact_count_threshold``) are counted exactly. Above it the estimate is
+    returned. Without an estimate (other backends) the count stops at
+    ``count_cap`` rows when a cap is set.
+    """
+    if exact_count_threshold is None:
+        exact_count_threshold = settings.PAGINATION_EXACT_COUNT_THRESHOLD
+    if count_cap is None:
+        count_cap = settings.PAGINATION_COUNT_CAP
+
+    if not hasattr(queryset, "query"):
+        return len(queryset), False
+
+    estimate = estimate_count(queryset)
+    if estimate is not None and estimate >= exact_count_threshold:
+        return estimate, True
+
+    if count_cap:
+        count = queryset[: count_cap + 1].count()
+        if count > count_cap:
+            return count_cap, True
+        return count, False
+
+    return queryset.count(), False
+
+
+class EstimatedCountPage(Page):
+    def has_next(self):
+        if self.paginator.count_is_estimated:
+            return len(self.object_list) == self.paginator.per_page
+        return super().has_next()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator counting with count_rows(); sets ``count_is_estimated``.
+
+    An estimated (or capped) count may be below the real one, so it doesn't
+    limit the pages that can be asked for: a page is past the end when it
+    has no rows, and has a next page when it is full.
+    """
+
+    count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.count_is_estimated = count_rows(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        if not self.count_is_estimated:
+            return super().validate_number(number)
+        # the checks of Paginator.validate_number but the one against num_pages
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)  # raises PageNotAnInteger
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        self.count  # sets count_is_estimated
+        if not self.count_is_estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return self._get_page(rows, number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedCountPage(*args, **kwargs)
+
+
+def _add_estimated_flag(schema):
+    schema["properties"]["count_is_estimated"] = {
+        "type": "boolean",
+        "example": False,
+        "description": "count is a planner estimate or capped, not exact",
+    }
+    return schema
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimated"] = self.page.paginator.count_is_estimated
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        return _add_estimated_flag(super().get_paginated_response_schema(schema))
+
+
+class EstimatedCountLimitOffsetPagination(LimitOffsetPagination):
+    """As EstimatedCountPaginator, an estimated count doesn't limit the
+    offsets that can be asked for, and a full page has a next one."""
+
+    count_is_estimated = False
+
+    def get_count(self, queryset):
+        count, self.count_is_estimated = count_rows(queryset)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        rows = super().paginate_queryset(queryset, request, view)
+        if self.count_is_estimated and self.offset > self.count:
+            rows = list(queryset[self.offset : self.offset + self.limit])
+        self.rows_on_page = None if rows is None else len(rows)
+        return rows
+
+    def get_next_link(self):
+        if not self.count_is_estimated or self.rows_on_page < self.limit:
+            return super().get_next_link()
+        url = replace_query_param(
+            self.request.build_absolute_uri(), self.limit_query_param, self.limit
+        )
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimated"] = self.count_is_estimated
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        return _add_estimated_flag(super().get_paginated_response_schema(schema))
@@ -0,0 +1,58 @@
+"""Columnar JSON for list endpoints.
+
+Asked for with ``Accept: application/vnd.station.columnar+json`` or
+``?format=columnar``. Instead of a list of objects repeating every key,
+the rows become::
+
+    {"columns": ["id", "source", ...],
+     "length": 3,
+     "values": [[1, 2, 3], {"dictionary": ["Kyiv", "Lviv"], "codes": [0, 1, 0]}, ...]}
+
+one array per column, in the order of ``columns``. String columns with
+repeated values (route names, bus info) are dictionary encoded: the
+distinct strings once, and each row's index into them. Paginated
+responses keep ``count``, ``next`` and ``previous``; only ``results`` is
+converted. See ``decode_columnar`` in tests_columnar.py for a client.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+
+def _encode_column(values):
+    strings = [value for value in values if value is not None]
+    if not strings or not all(isinstance(value, str) for value in strings):
+        return values
+    dictionary = {}
+    for value in values:
+        dictionary.setdefault(value, len(dictionary))
+    if len(dictionary) * 2 > len(values):  # mostly distinct, plain is smaller
+        return values
+    return {
+        "dictionary": list(dictionary),
+        "codes": [dictionary[value] for value in values],
+    }
+
+
+def to_columns(rows):
+    columns = {}
+    for row in rows:
+        for name in row:
+            columns.setdefault(name, None)
+    return {
+        "columns": list(columns),
+        "length": len(rows),
+        "values": [_encode_column([row.get(name) for row in rows]) for name in columns],
+    }
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = "application/vnd.station.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = {**data, "results": to_columns(data["results"])}
+        # anything else, an error for example, is rendered as is
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,132 @@
+"""In-process publish/subscribe of seat changes, for the trip seat stream.
+
+Ticket writes publish ``{"trip", "seat", "status"}`` events once their
+transaction commits ("sold" on insert, "released" on delete). Every open
+stream of the trip gets its own bounded queue; a subscriber that falls
+more than ``SEAT_EVENTS_BUFFER`` events behind is marked as lagged instead
+of slowing down publishers or growing without limit, and its stream tells
+the client to reload the seats.
+
+Events only reach subscribers in the same process as the write. The
+streams make up for it by resending the whole seat map now and then
+(``SEAT_EVENTS_RESYNC_INTERVAL``), so a sale in another worker shows up
+late rather than never. For live events across several worker processes
+each one must publish to a cross-process broker instead (Redis pub/sub,
+PostgreSQL LISTEN/NOTIFY); ``broker`` is the single point to swap for that.
+"""
+
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+SOLD = "sold"
+RELEASED = "released"
+
+
+class SubscriberLagged(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, broker, trip_id, maxsize):
+        self.broker = broker
+        self.trip_id = trip_id
+        self.lagged = False
+        self.queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+
+    def deliver(self, event):
+        """Queue ``event``; safe to call from any thread."""
+        with self._lock:
+            if self.lagged:
+                return
+            if self.queue.full():
+                self.lagged = True
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                event = None  # tells the consumer it fell behind
+            self.queue.put_nowait(event)
+
+    def get(self, timeout=None):
+        """Return the next event, None on timeout.
+
+        Raises SubscriberLagged once events were dropped for this subscriber.
+        """
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event is None:
+            raise SubscriberLagged
+        return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    def __init__(self, buffer_size=None):
+        self.buffer_size = buffer_size
+        self._subscriptions = defaultdict(set)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Call ``callback(trip_id, event)`` for every event of every trip,
+        in the publishing thread; for in-process caches of seat counts."""
+        self._listeners.append(callback)
+
+    def subscribe(self, trip_id):
+        """Subscribe to a trip's events; ``close()`` the subscription when done."""
+        subscription = Subscription(
+            self, trip_id, self.buffer_size or settings.SEAT_EVENTS_BUFFER
+        )
+        with self._lock:
+            self._subscriptions[trip_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.trip_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.trip_id]
+
+    def subscriber_count(self, trip_id=None):
+        """Subscribers of ``trip_id``, of all the trips without one."""
+        with self._lock:
+            if trip_id is None:
+                return sum(map(len, self._subscriptions.values()))
+            return len(self._subscriptions.get(trip_id, ()))
+
+    def publish(self, trip_id, event):
+        for listener in self._listeners:
+            listener(trip_id, event)
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(trip_id, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+
+broker = InMemoryBroker()
+
+
+def publish_seats(tickets, status):
+    """Publish ``status`` for ``tickets`` once the transaction commits."""
+    events = [
+        (
+            ticket.trip_id,
+            {"trip": ticket.trip_id, "seat": ticket.seat, "status": status},
+        )
+        for ticket in tickets
+    ]
+
+    def publish():
+        for trip_id, event in events:
+            broker.publish(trip_id, event)
+
+    transaction.on_commit(publish)
@@ -1,42 +1,144 @@
-from django.db import transaction
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.urls import reverse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.validators import UniqueTogetherValidator
 
-from station.models import Bus, Order, Trip, Facility, Ticket
+from station import seat_events
+from station.models import (
+    ArchivedOrder,
+    ArchivedTicket,
+    BookingRequest,
+    Bus,
+    Order,
+    Trip,
+    Facility,
+    Ticket,
+)
+
+
+def query_param_set(request, name):
+    """Parse a comma separated query param (?fields=id,source) into a set.
+
+    Returns None when the param is absent, so "not asked" and "asked for
+    nothing" can be told apart.
+    """
+    if request is None or name not in request.query_params:
+        return None
+    return {
+        item.strip() for item in request.query_params[name].split(",") if item.strip()
+    }
+
+
+class SparseFieldsetMixin:
+    """Support ?fields= and ?expand= on read requests.
+
+    ``fields`` keeps only the listed top-level fields. When ``expand`` is
+    given, nested serializers that are not listed in it are collapsed to
+    primary keys. Only the root serializer is affected.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if (
+            request is None
+            or request.method not in SAFE_METHODS
+            or not self._is_root_serializer()
+        ):
+            return fields
+
+        requested = query_param_set(request, "fields")
+        if requested is not None:
+            for name in set(fields) - requested:
+                fields.pop(name)
 
+        expanded = query_param_set(request, "expand")
+        if expanded is not None:
+            for name, field in fields.items():
+                if (
+                    isinstance(field, serializers.BaseSerializer)
+                    and name not in expanded
+                ):
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=isinstance(field, serializers.ListSerializer),
+                        read_only=True,
+                        source=field.source,
+                    )
+        return fields
 
-class TicketSerializer(serializers.ModelSerializer):
+    def _is_root_serializer(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+
+class TicketSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("id", "seat", "trip")
-
-    def validate(self, attrs):
-        Ticket.validate_seat(
-            attrs["seat"], attrs["trip"].trip.bus.num_seats, serializers.ValidationError
-        )
+        # seat range and uniqueness are checked by the database on insert,
+        # see Ticket.raise_for_seat_violation
+        validators = []
 
 
-class FacilitySerializer(serializers.ModelSerializer):
+class FacilitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Facility
         fields = "__all__"
 
 
-class BusSerializer(serializers.ModelSerializer):
+class BusSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Bus
         fields = ("id", "info", "num_seats", "facility")
         read_only_fields = ("id",)
 
 
-class BusRetrieveSerializer(BusSerializer):
+class BusImageUrlMixin(serializers.Serializer):
+    image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+
+    @staticmethod
+    def _image_url(bus, **kwargs):
+        return reverse(
+            "station:bus-image",
+            kwargs={"pk": bus.pk, "digest": bus.image_hash, **kwargs},
+        )
+
+    def get_image_url(self, bus) -> str | None:
+        if not bus.image_hash:
+            return None
+        return self._image_url(bus)
+
+    def get_image_variants(self, bus) -> dict[str, str]:
+        if not bus.image_hash:
+            return {}
+        return {
+            variant: self._image_url(bus, variant=variant)
+            for variant in settings.BUS_IMAGE_VARIANTS
+        }
+
+
+class BusRetrieveSerializer(BusImageUrlMixin, BusSerializer):
     facility = FacilitySerializer(many=True)  # детальное отображение автобуса
 
+    class Meta(BusSerializer.Meta):
+        fields = BusSerializer.Meta.fields + ("image_url", "image_variants")
+
 
-class BusImageSerializer(serializers.ModelSerializer):
+class BusImageSerializer(
+    BusImageUrlMixin, SparseFieldsetMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Bus
-        fields = ("id", "image")
+        fields = ("id", "image", "image_url", "image_variants")
 
 
 class BusListSerializer(BusSerializer):
@@ -45,13 +147,101 @@ class BusListSerializer(BusSerializer):
     )  # отображение поля facility
 
 
-class TripSerializer(serializers.ModelSerializer):
+class TripSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Trip
         fields = "__all__"
 
 
-class TripListSerializer(serializers.ModelSerializer):
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks primary keys up in ``context[context_key]``, a dict from
+    ``in_bulk()`` loaded once for a batch, instead of a query per value."""
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        objects = self.context.get(self.context_key)
+        if objects is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return objects[int(data)]
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
+
+class TripBulkSerializer(TripSerializer):
+    bus = PrefetchedPrimaryKeyRelatedField("buses", queryset=Bus.objects.all())
+
+
+class BusSelectionSerializer(serializers.Serializer):
+    """Selects buses; every bus when empty."""
+
+    info = serializers.CharField(required=False, help_text="info contains this")
+    min_seats = serializers.IntegerField(required=False, min_value=0)
+    max_seats = serializers.IntegerField(required=False, min_value=0)
+    facility = serializers.IntegerField(
+        required=False, help_text="buses that have this facility"
+    )
+
+    @staticmethod
+    def select(queryset, data):
+        """``queryset`` filtered by the validated ``data``."""
+        if "info" in data:
+            queryset = queryset.filter(info__icontains=data["info"])
+        if "min_seats" in data:
+            queryset = queryset.filter(num_seats__gte=data["min_seats"])
+        if "max_seats" in data:
+            queryset = queryset.filter(num_seats__lte=data["max_seats"])
+        if "facility" in data:
+            queryset = queryset.filter(facility=data["facility"])
+        return queryset
+
+
+class BusFacilityBulkSerializer(serializers.Serializer):
+    buses = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=settings.BUS_FACILITY_BULK_MAX_ITEMS,
+        help_text="bus ids, or give filter",
+    )
+    filter = BusSelectionSerializer(required=False)
+    add = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+    def validate(self, attrs):
+        if ("buses" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Give either buses or filter.")
+        add, remove = set(attrs["add"]), set(attrs["remove"])
+        if not add and not remove:
+            raise serializers.ValidationError("Nothing to add or remove.")
+        if add & remove:
+            raise serializers.ValidationError(
+                {"remove": [f"Also in add: {sorted(add & remove)}."]}
+            )
+        known = set(
+            Facility.objects.filter(pk__in=add | remove).values_list("pk", flat=True)
+        )
+        for name, ids in (("add", add), ("remove", remove)):
+            if ids - known:
+                raise serializers.ValidationError(
+                    {name: [f"Unknown facility ids: {sorted(ids - known)}."]}
+                )
+        attrs["add"], attrs["remove"] = add, remove
+        return attrs
+
+
+class TripListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     bus_info = serializers.CharField(source="bus.info", read_only=True)
     bus_num_seats = serializers.IntegerField(source="bus.num_seats", read_only=True)
     tickets_available = serializers.IntegerField(read_only=True)
@@ -80,7 +270,7 @@ class TripRetrieveSerializer(TripSerializer):
         fields = ("id", "source", "destination", "departure", "bus", "ticket")
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
 
     class Meta:
@@ -91,8 +281,15 @@ class OrderSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             tickets_data = validated_data.pop("tickets")
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            try:
+                tickets = Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket_data) for ticket_data in tickets_data
+                )
+            except IntegrityError as error:
+                Ticket.raise_for_seat_violation(error, serializers.ValidationError)
+                raise
+            # bulk_create sends no post_save, publish the seats here
+            seat_events.publish_seats(tickets, seat_events.SOLD)
             return order
 
 
@@ -102,3 +299,81 @@ class TicketListSerializer(TicketSerializer):
 
 class OrderListSerializer(OrderSerializer):
     tickets = TicketListSerializer(read_only=True, many=True)
+
+
+class ArchivedTicketSerializer(serializers.ModelSerializer):
+    trip = TripListSerializer(read_only=True, allow_null=True)
+
+    class Meta:
+        model = ArchivedTicket
+        fields = ("id", "seat", "trip")
+
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    tickets = ArchivedTicketSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ("id", "created_at", "archived_at", "tickets")
+
+
+class BookingTicketSerializer(serializers.Serializer):
+    seat = serializers.IntegerField()
+    trip = serializers.IntegerField()
+
+
+class BookingRequestSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(
+        view_name="station:bookingrequest-detail"
+    )
+    tickets = BookingTicketSerializer(many=True, read_only=True)
+    order = OrderSerializer(read_only=True, allow_null=True)
+
+    class Meta:
+        model = BookingRequest
+        fields = (
+            "id",
+            "url",
+            "status",
+            "tickets",
+            "order",
+            "errors",
+            "created_at",
+            "processed_at",
+        )
+        read_only_fields = fields
+
+
+class JourneyQuerySerializer(serializers.Serializer):
+    source = serializers.CharField()
+    destination = serializers.CharField()
+    departure = serializers.TimeField(default=datetime.time(0, 0))
+    mode = serializers.ChoiceField(
+        choices=("earliest", "min_transfers"), default="earliest"
+    )
+    min_seats = serializers.IntegerField(min_value=0, default=0)
+
+
+@extend_schema_field(OpenApiTypes.STR)
+class MinutesField(serializers.Field):
+    """Minutes after midnight as "HH:MM"; past midnight the hours go on
+    counting ("25:10"), as in GTFS timetables."""
+
+    def to_representation(self, value):
+        return f"{value // 60:02d}:{value % 60:02d}"
+
+
+class JourneyLegSerializer(serializers.Serializer):
+    trip = serializers.IntegerField(source="trip_id")
+    source = serializers.CharField()
+    destination = serializers.CharField()
+    departure = MinutesField()
+    arrival = MinutesField()
+    seats_available = serializers.IntegerField()
+
+
+class JourneySerializer(serializers.Serializer):
+    departure = MinutesField()
+    arrival = MinutesField()
+    transfers = serializers.IntegerField()
+    legs = JourneyLegSerializer(many=True)
@@ -0,0 +1,114 @@
+"""Single-flight coalescing of identical concurrent requests.
+
+When many identical requests arrive together (a burst on a popular
+route), one of them, the leader, computes the result and the others wait
+for it and reuse it instead of running the same queries. Nothing is kept
+once the leader is done: this only merges requests that overlap in time.
+
+Waiting is bounded: a request waits at most ``wait`` seconds for the
+leader, then computes the result itself. If the leader fails, the waiting
+requests compute their own result as well.
+
+With ``lock_dir`` set, requests are also coalesced across processes. The
+leader of each process takes an exclusive ``flock`` on a file in
+``lock_dir`` named after the key (waiting at most ``wait`` seconds as
+well) and stores its result in the cache for ``ttl`` seconds. A leader
+that got the lock after another process first looks in the cache. This
+needs a cache shared by the processes (see ``CACHE_BACKEND``).
+"""
+
+import fcntl
+import hashlib
+import pathlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+LOCK_POLL_INTERVAL = 0.01
+
+
+class _Call:
+    __slots__ = ("done", "result", "failed")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call of the running leader
+
+    def do(self, key, compute, wait, lock_dir=None, ttl=1):
+        """``compute()``, or the result of an identical call running now."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(wait) and not call.failed:
+                return call.result
+            return compute()
+
+        try:
+            if lock_dir:
+                call.result = self._do_across_processes(
+                    key, compute, wait, lock_dir, ttl
+                )
+            else:
+                call.result = compute()
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    @staticmethod
+    def _do_across_processes(key, compute, wait, lock_dir, ttl):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        cache_key = f"single-flight:{digest}"
+        directory = pathlib.Path(lock_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with open(directory / f"{digest}.lock", "a") as lock_file:
+            deadline = time.monotonic() + wait
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        return compute()  # waited long enough
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                result = cache.get(cache_key)
+                if result is None:
+                    result = compute()
+                    cache.set(cache_key, result, ttl)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def request_key(request, name, ignore=("profile",)):
+    """``name`` and the request's URL with the query params sorted, so
+    ``?a=1&b=2`` and ``?b=2&a=1`` are the same request."""
+    params = sorted(
+        (param, value)
+        for param, values in request.query_params.lists()
+        if param not in ignore
+        for value in values
+    )
+    return f"{name}:{request.build_absolute_uri(request.path)}?{urlencode(params)}"
+
+
+trip_lists = SingleFlight()
@@ -0,0 +1,87 @@
+"""Content-addressed storage for bus images.
+
+A file is stored once under the sha256 of its bytes
+(``upload/buses/ab/ab12...ef.jpg``) whatever name it was uploaded with, so
+the same photo used for many buses is one file and one image URL for the
+browser/CDN cache. The digest is computed while the upload is streamed to
+a temporary file, which is then renamed into place, or dropped when the
+blob already exists. Which buses use a blob is counted in ``ImageBlob``;
+unused blobs are removed by ``manage.py cleanup_image_blobs``.
+
+Files derived from a blob are named after it (``<digest>-thumb.jpg``) and
+stored under the name given, e.g. the resized variants of station.media.
+"""
+
+import hashlib
+import os
+import pathlib
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+DERIVED_RE = re.compile(r"[0-9a-f]{64}-\w+")
+
+
+def blob_name(directory, digest, suffix):
+    return posixpath.join(directory, digest[:2], digest + suffix.lower())
+
+
+def digest_from_name(name):
+    """Return the digest of a content-addressed name, None for other names."""
+    stem = pathlib.PurePosixPath(name or "").stem
+    return stem if DIGEST_RE.fullmatch(stem) else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        return name  # the name is the content, an existing file is the same file
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        derived = DERIVED_RE.fullmatch(pathlib.PurePosixPath(filename).stem)
+        if digest_from_name(filename):  # already addressed (e.g. a copied blob)
+            directory = posixpath.dirname(directory)
+        os.makedirs(self.path(directory), exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.path(directory), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            if not derived:
+                name = blob_name(
+                    directory,
+                    digest.hexdigest(),
+                    pathlib.PurePosixPath(filename).suffix,
+                )
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.unlink(tmp_path)
+                # reused: not to be taken for the upload of a rolled back
+                # save by ImageBlob.objects.delete_unrecorded
+                os.utime(full_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(tmp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+
+bus_image_storage = ContentAddressedStorage()
+
+
+def get_bus_image_storage():
+    return bus_image_storage
@@ -0,0 +1,101 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from station.models import Bus, Order, Ticket, Trip
+
+
+class AdminScalabilityTests(TestCase):
+    """The number of queries of every admin page must not grow with the data."""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@test.test", password="testpassword"
+        )
+        self.client.force_login(self.admin)
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.order = Order.objects.create(user=self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            trip = Trip.objects.create(
+                source="Kyiv",
+                destination="Lviv",
+                departure=datetime.time(10, 30),
+                bus=self.bus,
+            )
+            order = Order.objects.create(user=self.admin)
+            Ticket.objects.create(seat=1, trip=trip, order=order)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx)
+
+    def assert_constant_queries(self, url):
+        self.add_rows(1)
+        self.client.get(url)  # warm up per-process caches (content types etc.)
+        few = self.count_queries(url)
+        self.add_rows(10)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_order_changelist(self):
+        self.assert_constant_queries(reverse("admin:station_order_changelist"))
+
+    def test_ticket_changelist(self):
+        self.assert_constant_queries(reverse("admin:station_ticket_changelist"))
+
+    def test_trip_changelist(self):
+        self.assert_constant_queries(reverse("admin:station_trip_changelist"))
+
+    def test_order_change_page_does_not_list_all_trips(self):
+        url = reverse("admin:station_order_change", args=(self.order.id,))
+        self.assert_constant_queries(url)
+
+        res = self.client.get(url)
+        self.assertNotContains(res, "Kyiv, Lviv")
+
+    def test_ticket_change_page(self):
+        self.add_rows(1)
+        ticket = Ticket.objects.first()
+        self.assert_constant_queries(
+            reverse("admin:station_ticket_change", args=(ticket.id,))
+        )
+
+    def test_trip_search_is_exact(self):
+        self.add_rows(1)
+        Trip.objects.create(
+            source="Kyivska",
+            destination="Odesa",
+            departure=datetime.time(11),
+            bus=self.bus,
+        )
+        url = reverse("admin:station_trip_changelist")
+
+        res = self.client.get(url, {"q": "Kyiv"})
+
+        self.assertEqual(res.context["cl"].result_count, 1)
+
+    def test_trip_autocomplete_matches_prefixes(self):
+        self.add_rows(1)
+        url = reverse("admin:autocomplete")
+        params = {
+            "app_label": "station",
+            "model_name": "ticket",
+            "field_name": "trip",
+        }
+
+        res = self.client.get(url, {**params, "term": "Kyi"})
+        self.assertEqual(len(res.json()["results"]), 1)
+        res = self.client.get(url, {**params, "term": "yiv"})
+        self.assertEqual(res.json()["results"], [])
+
+    def test_ticket_search_ignores_non_numeric_terms(self):
+        self.add_rows(1)
+        res = self.client.get(reverse("admin:station_ticket_changelist"), {"q": "abc"})
+        self.assertEqual(res.context["cl"].result_count, 0)
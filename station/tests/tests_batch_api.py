@@ -0,0 +1,154 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django_rest_lesson.views import BatchView
+from station.models import Bus, Facility
+from station.views import FacilityViewSet
+
+BATCH_URL = reverse("batch")
+
+
+class UnauthenticatedBatchApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.post(
+            BATCH_URL, {"requests": [{"url": "/api/station/buses/"}]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AuthenticatedBatchApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_batch_returns_response_per_item(self):
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        Facility.objects.create(name="WiFi")
+        payload = {
+            "requests": [
+                {"url": f"/api/station/buses/{bus.id}/"},
+                {"url": "/api/station/facilities/"},
+                {"url": "/api/station/buses/", "method": "POST", "body": {}},
+                {"url": "/api/station/unknown/"},
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.data["responses"]
+        self.assertEqual(
+            [item["status"] for item in responses],
+            [
+                status.HTTP_200_OK,
+                status.HTTP_200_OK,
+                status.HTTP_403_FORBIDDEN,
+                status.HTTP_404_NOT_FOUND,
+            ],
+        )
+        self.assertEqual(responses[0]["body"]["info"], "AA 8889 OO")
+        self.assertEqual(responses[1]["body"]["results"][0]["name"], "WiFi")
+
+    def test_failing_sub_request_gets_500(self):
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        payload = {
+            "requests": [
+                {"url": f"/api/station/buses/{bus.id}/"},
+                {"url": "/api/station/facilities/"},
+            ]
+        }
+
+        with mock.patch.object(
+            FacilityViewSet, "list", side_effect=RuntimeError("boom")
+        ):
+            with self.assertLogs("django_rest_lesson.views", "ERROR"):
+                res = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.data["responses"]
+        self.assertEqual(
+            [item["status"] for item in responses],
+            [status.HTTP_200_OK, status.HTTP_500_INTERNAL_SERVER_ERROR],
+        )
+        self.assertEqual(responses[0]["body"]["info"], "AA 8889 OO")
+
+    def test_query_string_is_forwarded(self):
+        res = self.client.post(
+            BATCH_URL,
+            {"requests": [{"url": "/api/station/buses/?page_size=5"}]},
+            format="json",
+        )
+        self.assertEqual(res.data["responses"][0]["status"], status.HTTP_200_OK)
+
+    def test_nested_batch_rejected(self):
+        res = self.client.post(
+            BATCH_URL,
+            {"requests": [{"url": "/api/batch/", "method": "POST"}]},
+            format="json",
+        )
+        self.assertEqual(
+            res.data["responses"][0]["status"], status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_non_api_url_rejected(self):
+        res = self.client.post(
+            BATCH_URL, {"requests": [{"url": "/admin/"}]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_capped(self):
+        payload = {"requests": [{"url": "/api/station/buses/"}] * 3}
+        res = self.client.post(BATCH_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+# sub-requests run in threads with their own connections, which only see
+# committed rows
+class ParallelBatchApiTests(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_read_only_batch_runs_in_threads(self):
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        Facility.objects.create(name="WiFi")
+        payload = {
+            "parallel": True,
+            "requests": [
+                {"url": f"/api/station/buses/{bus.id}/"},
+                {"url": "/api/station/facilities/"},
+                {"url": "/api/station/unknown/"},
+            ],
+        }
+
+        with mock.patch.object(
+            BatchView,
+            "_dispatch_in_thread",
+            autospec=True,
+            side_effect=BatchView._dispatch_in_thread,
+        ) as dispatch_in_thread:
+            res = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(dispatch_in_thread.call_count, 3)
+        responses = res.data["responses"]
+        self.assertEqual(
+            [item["status"] for item in responses],
+            [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_404_NOT_FOUND],
+        )
+        self.assertEqual(responses[0]["body"]["info"], "AA 8889 OO")
+        self.assertEqual(responses[1]["body"]["results"][0]["name"], "WiFi")
@@ -0,0 +1,197 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station import booking_queue
+from station.models import BookingRequest, Bus, Order, Ticket, Trip
+
+ORDER_URL = reverse("station:order-list")
+BOOKING_URL = reverse("station:bookingrequest-list")
+
+
+@override_settings(BOOKING_QUEUE=True)
+class BookingQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=10)
+        self.trip = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(8), bus=bus
+        )
+        self.other_trip = Trip.objects.create(
+            source="Lviv", destination="Kyiv", departure=datetime.time(9), bus=bus
+        )
+
+    def book(self, *seats, trip=None):
+        trip = trip or self.trip
+        return self.client.post(
+            ORDER_URL,
+            {"tickets": [{"seat": seat, "trip": trip.pk} for seat in seats]},
+            format="json",
+        )
+
+    def process(self):
+        out = StringIO()
+        # it would close the connection holding the test's transaction
+        with mock.patch(
+            "station.management.commands.process_bookings.close_old_connections"
+        ):
+            call_command("process_bookings", "--once", stdout=out)
+        return out.getvalue()
+
+    @staticmethod
+    def bookings():
+        return {str(booking.pk): booking for booking in BookingRequest.objects.all()}
+
+    def test_order_is_queued_with_202(self):
+        res = self.book(1, 2)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["status"], BookingRequest.QUEUED)
+        self.assertEqual(res["Location"], res.data["url"])
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertFalse(Order.objects.exists())
+        booking = BookingRequest.objects.get()
+        self.assertEqual(booking.trip, self.trip)
+        self.assertEqual(
+            booking.tickets,
+            [{"seat": 1, "trip": self.trip.pk}, {"seat": 2, "trip": self.trip.pk}],
+        )
+
+    def test_invalid_order_is_rejected_synchronously(self):
+        res = self.client.post(
+            ORDER_URL, {"tickets": [{"seat": 1, "trip": 999}]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BookingRequest.objects.exists())
+
+    def test_worker_books_the_order(self):
+        url = self.book(1, 2).data["url"]
+
+        output = self.process()
+
+        self.assertIn("Booked 1 orders, rejected 0", output)
+        res = self.client.get(url)
+        self.assertEqual(res.data["status"], BookingRequest.BOOKED)
+        self.assertNotIn("Retry-After", res)
+        order = Order.objects.get()
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(res.data["order"]["id"], order.pk)
+        self.assertEqual(
+            sorted(order.tickets.values_list("seat", "trip")),
+            [(1, self.trip.pk), (2, self.trip.pk)],
+        )
+
+    def test_taken_and_out_of_range_seats_are_rejected(self):
+        sold = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=5, trip=self.trip, order=sold)
+        first = self.book(1, 2).data["id"]
+        same_seat = self.book(2, 3).data["id"]
+        already_sold = self.book(5).data["id"]
+        out_of_range = self.book(11).data["id"]
+
+        self.process()
+
+        bookings = self.bookings()
+        self.assertEqual(bookings[first].status, BookingRequest.BOOKED)
+        for pk in (same_seat, already_sold, out_of_range):
+            self.assertEqual(bookings[pk].status, BookingRequest.REJECTED)
+            self.assertIsNone(bookings[pk].order)
+        self.assertEqual(
+            bookings[same_seat].errors,
+            {"seat": ["seat 2 is already taken on this trip"]},
+        )
+        self.assertIn("seat", bookings[out_of_range].errors)
+        self.assertEqual(Ticket.objects.filter(trip=self.trip).count(), 3)
+
+    def test_batch_holds_requests_of_one_trip(self):
+        for seat in (1, 2, 3):
+            self.book(seat)
+        self.book(1, trip=self.other_trip)
+
+        # as many queries for any number of requests
+        with self.assertNumQueries(11):
+            self.assertEqual(booking_queue.process_batch(100), (3, 0))
+
+        self.assertEqual(
+            BookingRequest.objects.get(trip=self.other_trip).status,
+            BookingRequest.QUEUED,
+        )
+        self.assertEqual(booking_queue.process_batch(100), (1, 0))
+        self.assertEqual(booking_queue.process_batch(100), (0, 0))
+
+    def test_constraint_violation_falls_back_to_one_request_at_a_time(self):
+        first = self.book(1).data["id"]
+        taken = self.book(1, 2).data["id"]
+        last = self.book(3).data["id"]
+
+        # as if seat 1 was sold between the check and the insert
+        with mock.patch.object(booking_queue, "_seat_errors", return_value=None):
+            self.assertEqual(booking_queue.process_batch(100), (2, 1))
+
+        bookings = self.bookings()
+        self.assertEqual(bookings[first].status, BookingRequest.BOOKED)
+        self.assertEqual(bookings[last].status, BookingRequest.BOOKED)
+        self.assertEqual(bookings[taken].status, BookingRequest.REJECTED)
+        self.assertIn("seat", bookings[taken].errors)
+        self.assertEqual(sorted(Ticket.objects.values_list("seat", flat=True)), [1, 3])
+
+    def test_other_constraint_violation_rejects_the_request(self):
+        first = self.book(1).data["id"]
+        broken = self.book(2).data["id"]
+        book = booking_queue._book
+
+        def fail_broken(requests):
+            if str(requests[-1].pk) == broken:
+                raise IntegrityError("NOT NULL constraint failed: some_column")
+            book(requests)
+
+        with mock.patch.object(booking_queue, "_book", side_effect=fail_broken):
+            with self.assertLogs("station.booking_queue", "ERROR"):
+                self.assertEqual(booking_queue.process_batch(100), (1, 1))
+
+        bookings = self.bookings()
+        self.assertEqual(bookings[first].status, BookingRequest.BOOKED)
+        self.assertEqual(bookings[broken].status, BookingRequest.REJECTED)
+        self.assertEqual(bookings[broken].errors, booking_queue.BOOKING_FAILED)
+        self.assertEqual(booking_queue.process_batch(100), (0, 0))
+
+    def test_queued_status_asks_to_retry(self):
+        url = self.book(1).data["url"]
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.data["status"], BookingRequest.QUEUED)
+        self.assertEqual(res["Retry-After"], "1")
+
+    def test_other_users_requests_are_hidden(self):
+        url = self.book(1).data["url"]
+        other = get_user_model().objects.create_user(
+            email="other@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(BOOKING_URL).data["results"], [])
+
+    @override_settings(BOOKING_QUEUE=False)
+    def test_orders_are_created_directly_when_the_queue_is_off(self):
+        res = self.book(1)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Order.objects.exists())
+        self.assertFalse(BookingRequest.objects.exists())
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Bus, Facility
+
+BUS_URL = reverse("station:bus-list")
+BULK_URL = reverse("station:bus-bulk-facilities")
+
+
+class BusFacilityBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.wifi = Facility.objects.create(name="WiFi")
+        self.tv = Facility.objects.create(name="TV")
+        self.small = Bus.objects.create(info="AA 0001 OO", num_seats=20)
+        self.large = Bus.objects.create(info="AA 0002 OO", num_seats=60)
+        self.other = Bus.objects.create(info="BB 0003 OO", num_seats=50)
+        self.large.facility.add(self.wifi, self.tv)
+
+    def post(self, payload):
+        return self.client.post(BULK_URL, payload, format="json")
+
+    def facilities(self, bus):
+        return set(bus.facility.values_list("name", flat=True))
+
+    def test_add_to_listed_buses(self):
+        res = self.post(
+            {"buses": [self.small.pk, self.large.pk], "add": [self.wifi.pk]}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the large bus had WiFi already
+        self.assertEqual(res.data, {"buses": 2, "added": 1, "removed": 0})
+        self.assertEqual(self.facilities(self.small), {"WiFi"})
+        self.assertEqual(self.facilities(self.large), {"WiFi", "TV"})
+        self.assertEqual(self.facilities(self.other), set())
+
+    def test_add_and_remove_by_filter(self):
+        res = self.post(
+            {
+                "filter": {"min_seats": 50},
+                "add": [self.wifi.pk],
+                "remove": [self.tv.pk],
+            }
+        )
+
+        self.assertEqual(res.data, {"buses": 2, "added": 1, "removed": 1})
+        self.assertEqual(self.facilities(self.large), {"WiFi"})
+        self.assertEqual(self.facilities(self.other), {"WiFi"})
+        self.assertEqual(self.facilities(self.small), set())
+
+    def test_filter_by_info_and_facility(self):
+        res = self.post(
+            {"filter": {"info": "aa", "facility": self.tv.pk}, "remove": [self.tv.pk]}
+        )
+
+        self.assertEqual(res.data, {"buses": 1, "added": 0, "removed": 1})
+        self.assertEqual(self.facilities(self.large), {"WiFi"})
+
+    def test_empty_filter_selects_the_fleet(self):
+        res = self.post({"filter": {}, "add": [self.tv.pk]})
+
+        self.assertEqual(res.data, {"buses": 3, "added": 2, "removed": 0})
+        for bus in (self.small, self.large, self.other):
+            self.assertIn("TV", self.facilities(bus))
+
+    def test_queries_do_not_grow_with_buses(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                res = self.post({"filter": {}, "add": [self.wifi.pk]})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            Bus.facility.through.objects.all().delete()
+            return len(queries)
+
+        few = count_queries()
+        Bus.objects.bulk_create(
+            Bus(info=f"CC {number:04d} OO", num_seats=40) for number in range(50)
+        )
+        self.assertEqual(count_queries(), few)
+
+    @override_settings(FRAGMENT_CACHE=True)
+    def test_bus_list_shows_the_change(self):
+        self.client.get(BUS_URL)  # rows are cached
+
+        self.post({"buses": [self.small.pk], "add": [self.tv.pk]})
+
+        rows = {row["id"]: row for row in self.client.get(BUS_URL).data["results"]}
+        self.assertEqual(rows[self.small.pk]["facility"], ["TV"])
+
+    def test_invalid_requests(self):
+        for payload in (
+            {"add": [self.wifi.pk]},
+            {"buses": [self.small.pk], "filter": {}, "add": [self.wifi.pk]},
+            {"buses": [self.small.pk]},
+            {"buses": [self.small.pk], "add": [999]},
+            {"buses": [self.small.pk], "add": [self.wifi.pk], "remove": [self.wifi.pk]},
+            {"buses": [], "add": [self.wifi.pk]},
+        ):
+            with self.subTest(payload):
+                res = self.post(payload)
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.facilities(self.small), set())
+
+    def test_staff_only(self):
+        user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.post({"buses": [self.small.pk], "add": [self.wifi.pk]})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
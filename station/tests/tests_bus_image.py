@@ -0,0 +1,211 @@
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station import media
+from station.models import Bus, ImageBlob
+from station.storage import get_bus_image_storage
+
+
+def image_upload_url(bus_id):
+    return reverse("station:bus-upload-image", args=(bus_id,))
+
+
+def make_image(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (600, 400), color).save(buffer, format="PNG")
+    buffer.seek(0)
+    buffer.name = "bus.png"
+    return buffer
+
+
+class BusImageDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        res = self.client.post(
+            image_upload_url(self.bus.id), {"image": make_image()}, format="multipart"
+        )
+        self.image_url = res.data["image_url"]
+        self.bus.refresh_from_db()
+
+    def test_image_url_contains_content_hash(self):
+        self.assertEqual(len(self.bus.image_hash), 64)
+        self.assertIn(self.bus.image_hash, self.image_url)
+
+    def test_image_served_as_immutable(self):
+        res = self.client.get(self.image_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "image/png")
+        self.assertEqual(
+            set(res["Cache-Control"].split(", ")),
+            {"public", f"max-age={media.IMMUTABLE_MAX_AGE}", "immutable"},
+        )
+        body = b"".join(res.streaming_content)
+        with self.bus.image.open("rb") as image:
+            self.assertEqual(body, image.read())
+
+    def test_not_modified(self):
+        etag = self.client.get(self.image_url)["ETag"]
+        res = self.client.get(self.image_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_request(self):
+        res = self.client.get(self.image_url, HTTP_RANGE="bytes=0-9")
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(res.streaming_content), b"\x89PNG\r\n\x1a\n\x00\x00")
+        self.assertEqual(res["Content-Range"], f"bytes 0-9/{self.bus.image.size}")
+
+    def test_range_not_satisfiable(self):
+        res = self.client.get(self.image_url, HTTP_RANGE="bytes=99999999-")
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    @override_settings(MEDIA_DELIVERY="x-accel-redirect")
+    def test_accel_redirect_hands_off_to_proxy(self):
+        res = self.client.get(self.image_url)
+
+        self.assertEqual(res.content, b"")
+        self.assertEqual(
+            res["X-Accel-Redirect"], f"/protected-media/{self.bus.image.name}"
+        )
+
+    def test_variant(self):
+        res = self.client.get(self.image_url + "thumb/")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        thumb = Image.open(io.BytesIO(b"".join(res.streaming_content)))
+        self.assertEqual(thumb.size, (320, 213))
+
+    def test_old_hash_redirects_to_current_image(self):
+        old_url = self.image_url
+        res = self.client.post(
+            image_upload_url(self.bus.id),
+            {"image": make_image("blue")},
+            format="multipart",
+        )
+
+        redirect = self.client.get(old_url)
+
+        self.assertEqual(redirect.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(redirect["Location"], res.data["image_url"])
+
+    def test_authentication_required(self):
+        self.client.force_authenticate(None)
+        res = self.client.get(self.image_url)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root.name
+
+    def create_bus(self, color="red"):
+        bus = Bus(info="AA 8889 OO", num_seats=50)
+        bus.image = ContentFile(make_image(color).read(), name="bus.png")
+        bus.save()
+        return bus
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root)
+            for name in names
+        )
+
+    def test_identical_images_stored_once(self):
+        first, second = self.create_bus(), self.create_bus()
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.stored_files(), [first.image.name])
+        self.assertIn(first.image_hash, first.image.name)
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).ref_count, 2)
+
+    def test_orphaned_blob_deleted_by_cleanup(self):
+        first, second = self.create_bus(), self.create_bus()
+        name = first.image.name
+
+        first.delete()
+        second.image = ContentFile(make_image("blue").read(), name="bus.png")
+        second.save()
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 0)
+
+        call_command("cleanup_image_blobs", grace=0, stdout=io.StringIO())
+
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertEqual(self.stored_files(), [second.image.name])
+
+    def test_rolled_back_upload_deleted_by_cleanup(self):
+        kept = self.create_bus("blue")
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.create_bus()
+            raise RuntimeError
+        self.assertEqual(len(self.stored_files()), 2)
+
+        call_command("cleanup_image_blobs", stdout=io.StringIO())
+        self.assertEqual(len(self.stored_files()), 2)  # within the grace period
+        call_command("cleanup_image_blobs", grace=0, stdout=io.StringIO())
+
+        self.assertEqual(self.stored_files(), [kept.image.name])
+
+    def test_save_without_image_change_runs_no_image_queries(self):
+        bus = Bus.objects.get(pk=self.create_bus().pk)
+        bus.info = "BB 8889 OO"
+
+        with self.assertNumQueries(3):  # savepoint, update, release
+            bus.save()
+
+    def test_cleanup_keeps_blobs_within_grace_period(self):
+        bus = self.create_bus()
+        name = bus.image.name
+        bus.delete()
+
+        call_command("cleanup_image_blobs", stdout=io.StringIO())
+
+        self.assertTrue(get_bus_image_storage().exists(name))
+
+    def test_dedupe_existing_uploads(self):
+        storage = get_bus_image_storage()
+        content = make_image().read()
+        for legacy_name in ("upload/buses/aa-1.png", "upload/buses/aa-2.png"):
+            path = storage.path(legacy_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as legacy_file:
+                legacy_file.write(content)
+            bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+            Bus.objects.filter(pk=bus.pk).update(image=legacy_name)
+
+        call_command("dedupe_bus_images", stdout=io.StringIO())
+
+        names = set(Bus.objects.values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(self.stored_files(), list(names))
+        self.assertEqual(ImageBlob.objects.get(name=names.pop()).ref_count, 2)
@@ -0,0 +1,77 @@
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from station.models import Bus, Trip
+from station.renderers import to_columns
+
+TRIP_URL = reverse("station:trip-list")
+COLUMNAR = "application/vnd.station.columnar+json"
+
+
+def decode_columnar(block):
+    """Reference client decoder: columnar ``results`` back to row objects."""
+    columns = []
+    for values in block["values"]:
+        if isinstance(values, dict):
+            values = [values["dictionary"][code] for code in values["codes"]]
+        columns.append(values)
+    return [dict(zip(block["columns"], row)) for row in zip(*columns)]
+
+
+class ColumnarFormatTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.test", password="testpassword"
+            )
+        )
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        for hour in range(12):
+            Trip.objects.create(
+                source="Kyiv",
+                destination=("Lviv", "Odesa")[hour % 2],
+                departure=datetime.time(hour),
+                bus=bus,
+            )
+
+    def test_columnar_matches_json(self):
+        params = {"limit": 20}
+        rows = self.client.get(TRIP_URL, params).json()
+
+        res = self.client.get(TRIP_URL, params, HTTP_ACCEPT=COLUMNAR)
+
+        self.assertEqual(res["Content-Type"], COLUMNAR)
+        columnar = json.loads(res.content)
+        self.assertEqual(columnar["count"], rows["count"])
+        self.assertEqual(decode_columnar(columnar["results"]), rows["results"])
+        self.assertLess(len(res.content), len(json.dumps(rows)))
+
+    def test_format_param(self):
+        res = self.client.get(TRIP_URL, {"format": "columnar", "limit": 20})
+
+        results = json.loads(res.content)["results"]
+        source = results["values"][results["columns"].index("source")]
+        self.assertEqual(source, {"dictionary": ["Kyiv"], "codes": [0] * 12})
+
+    def test_only_offered_on_lists(self):
+        trip = Trip.objects.first()
+
+        res = self.client.get(
+            reverse("station:trip-detail", args=(trip.id,)), {"format": "columnar"}
+        )
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_mostly_distinct_strings_stay_plain(self):
+        block = to_columns([{"name": "a"}, {"name": "b"}, {"name": "a"}])
+        self.assertEqual(block["values"], [["a", "b", "a"]])
+
+    def test_empty_page(self):
+        block = to_columns([])
+        self.assertEqual(decode_columnar(block), [])
@@ -0,0 +1,120 @@
+import datetime
+import pickle
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from station.fragments import Row
+from station.models import Bus, Facility, Order, Ticket, Trip
+
+BUS_URL = reverse("station:bus-list")
+TRIP_URL = reverse("station:trip-list")
+TRIP_BULK_URL = reverse("station:trip-bulk")
+
+
+@override_settings(FRAGMENT_CACHE=True)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.wifi = Facility.objects.create(name="WiFi")
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.bus.facility.add(self.wifi)
+        self.trip = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(8), bus=self.bus
+        )
+
+    def bus_row(self):
+        return self.client.get(BUS_URL).data["results"][0]
+
+    def trip_row(self, **params):
+        return self.client.get(TRIP_URL, params).data["results"][0]
+
+    def test_cached_rows_skip_serializer_and_prefetch(self):
+        with CaptureQueriesContext(connection) as uncached:
+            first = self.client.get(BUS_URL)
+
+        # count and page only, no facility prefetch
+        with CaptureQueriesContext(connection) as cached:
+            second = self.client.get(BUS_URL)
+
+        self.assertEqual(len(cached), len(uncached) - 1)
+        self.assertFalse(
+            any(Facility._meta.db_table in query["sql"] for query in cached)
+        )
+
+        self.assertEqual(second.content, first.content)
+        self.assertIsInstance(second.data["results"][0], Row)
+
+    def test_same_bytes_as_without_cache(self):
+        cached = self.client.get(TRIP_URL).content
+        cached_again = self.client.get(TRIP_URL).content
+
+        with override_settings(FRAGMENT_CACHE=False):
+            plain = self.client.get(TRIP_URL).content
+
+        self.assertEqual(cached, plain)
+        self.assertEqual(cached_again, plain)
+
+    def test_bus_save_invalidates_bus_and_trip_rows(self):
+        self.bus_row(), self.trip_row()
+
+        self.bus.info = "BB 1111 BB"
+        self.bus.save()
+
+        self.assertEqual(self.bus_row()["info"], "BB 1111 BB")
+        self.assertEqual(self.trip_row()["bus_info"], "BB 1111 BB")
+
+    def test_facility_changes_invalidate_bus_rows(self):
+        self.bus_row()
+
+        tv = Facility.objects.create(name="TV")
+        self.bus.facility.add(tv)
+        self.assertEqual(sorted(self.bus_row()["facility"]), ["TV", "WiFi"])
+
+        self.wifi.name = "Wi-Fi"
+        self.wifi.save()
+        self.assertEqual(sorted(self.bus_row()["facility"]), ["TV", "Wi-Fi"])
+
+        tv.buses.clear()
+        self.assertEqual(self.bus_row()["facility"], ["Wi-Fi"])
+
+    def test_tickets_available_is_part_of_the_key(self):
+        self.assertEqual(self.trip_row()["tickets_available"], 50)
+
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=1, trip=self.trip, order=order)
+
+        self.assertEqual(self.trip_row()["tickets_available"], 49)
+
+    def test_bulk_update_invalidates_trip_rows(self):
+        self.trip_row()
+
+        self.client.patch(
+            TRIP_BULK_URL,
+            {"trips": [{"id": self.trip.id, "destination": "Odesa"}]},
+            format="json",
+        )
+
+        self.assertEqual(self.trip_row()["destination"], "Odesa")
+
+    def test_sparse_fieldsets_cached_separately(self):
+        self.trip_row()
+
+        self.assertEqual(
+            self.trip_row(fields="id,destination"),
+            {"id": self.trip.id, "destination": "Lviv"},
+        )
+
+    def test_row_pickles(self):
+        row = Row(b'{"id":1}')
+        self.assertEqual(pickle.loads(pickle.dumps(row)).json, b'{"id":1}')
@@ -0,0 +1,132 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from station import journeys
+from station.models import Bus, Order, Ticket, Trip
+
+JOURNEY_URL = reverse("station:journey-list")
+
+
+class JourneyPlannerTests(TestCase):
+    def setUp(self):
+        journeys.timetable.invalidate()
+        self.addCleanup(journeys.timetable.invalidate)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=2)
+
+        # Kyiv -> Lviv only through Zhytomyr (two legs) or Rivne (three legs,
+        # arriving earlier)
+        self.to_zhytomyr = self.trip("Kyiv", "Zhytomyr", 8)
+        self.zhytomyr_lviv = self.trip("Zhytomyr", "Lviv", 13)
+        self.to_rivne = self.trip("Kyiv", "Rivne", 6)
+        self.rivne_lutsk = self.trip("Rivne", "Lutsk", 8, 30)
+        self.lutsk_lviv = self.trip("Lutsk", "Lviv", 10, 45)
+
+    def trip(self, source, destination, hour, minute=0):
+        return Trip.objects.create(
+            source=source,
+            destination=destination,
+            departure=datetime.time(hour, minute),
+            bus=self.bus,
+        )
+
+    def plan(self, **params):
+        return self.client.get(
+            JOURNEY_URL, {"source": "Kyiv", "destination": "Lviv", **params}
+        )
+
+    def leg_trips(self, res):
+        return [leg["trip"] for leg in res.data["legs"]]
+
+    def test_earliest_arrival(self):
+        res = self.plan()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.leg_trips(res),
+            [self.to_rivne.id, self.rivne_lutsk.id, self.lutsk_lviv.id],
+        )
+        self.assertEqual(res.data["arrival"], "12:45")
+        self.assertEqual(res.data["transfers"], 2)
+
+    def test_min_transfers(self):
+        res = self.plan(mode="min_transfers")
+
+        self.assertEqual(
+            self.leg_trips(res), [self.to_zhytomyr.id, self.zhytomyr_lviv.id]
+        )
+        self.assertEqual(res.data["arrival"], "15:00")
+
+    def test_departure_after_first_trip(self):
+        res = self.plan(departure="07:00")
+        self.assertEqual(self.leg_trips(res)[0], self.to_zhytomyr.id)
+
+    def test_min_seats_skips_full_trips(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=1, trip=self.rivne_lutsk, order=order)
+
+        res = self.plan(min_seats=2)
+
+        self.assertEqual(
+            self.leg_trips(res), [self.to_zhytomyr.id, self.zhytomyr_lviv.id]
+        )
+
+    def test_no_journey(self):
+        res = self.plan(departure="20:00")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_token_authentication(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        res = client.get(JOURNEY_URL, {"source": "Kyiv", "destination": "Lviv"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_saved_trips_load_their_buses_at_once(self):
+        self.plan()
+        other_bus = Bus.objects.create(info="BB 0001 OO", num_seats=40)
+        Trip.objects.filter(pk=self.to_rivne.pk).update(bus=other_bus)
+        trips = list(Trip.objects.all())  # buses not loaded
+
+        with self.assertNumQueries(1):
+            journeys.timetable.trips_saved(trips)
+
+        self.assertEqual(
+            journeys.timetable.state().by_trip[self.to_rivne.pk].num_seats, 40
+        )
+
+    def test_timetable_updated_on_trip_changes(self):
+        self.plan()
+        with self.captureOnCommitCallbacks(execute=True):
+            direct = self.trip("Kyiv", "Lviv", 9)
+
+        with self.assertNumQueries(0):  # no reload, the trip was added
+            res = self.plan(departure="07:00")
+        self.assertEqual(self.leg_trips(res), [direct.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            direct.delete()
+        res = self.plan(departure="07:00")
+        self.assertEqual(self.leg_trips(res)[0], self.to_zhytomyr.id)
+
+    def test_seat_events_update_availability(self):
+        self.plan()
+        order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(seat=1, trip=self.rivne_lutsk, order=order)
+
+        res = self.plan(min_seats=2)
+
+        self.assertEqual(self.leg_trips(res)[0], self.to_zhytomyr.id)
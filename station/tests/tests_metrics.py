@@ -0,0 +1,140 @@
+import json
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from django_rest_lesson import metrics
+from station.models import Bus
+
+METRICS_URL = reverse("metrics")
+BUS_URL = reverse("station:bus-list")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(metrics, "registry", metrics.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.staff = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        Bus.objects.create(info="AA 8889 OO", num_seats=50)
+
+    def scrape(self):
+        self.client.force_login(self.staff)
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 200)
+        return res.content.decode()
+
+    def test_requests_labelled_by_viewset_action(self):
+        self.client.get(BUS_URL)
+        self.client.get(BUS_URL)
+        self.client.get(reverse("station:bus-detail", args=(1000,)))
+
+        text = self.scrape()
+
+        self.assertIn(
+            'http_requests_total{view="BusViewSet.list",method="GET",status="200"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_requests_total{view="BusViewSet.retrieve",method="GET",status="404"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="BusViewSet.list",method="GET"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="BusViewSet.list",'
+            'method="GET",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{view="BusViewSet.list",method="GET"} 2',
+            text,
+        )
+
+    def test_database_queries_counted(self):
+        self.client.get(BUS_URL)
+
+        text = self.scrape()
+
+        line = next(
+            line
+            for line in text.splitlines()
+            if line.startswith('http_request_db_queries_total{view="BusViewSet.list"')
+        )
+        self.assertGreater(int(line.split()[-1]), 0)
+
+    def test_unmatched_paths_share_one_label(self):
+        self.client.get("/no/such/path/")
+        self.client.get("/another/missing/path/")
+
+        self.assertIn(
+            'http_requests_total{view="unmatched",method="GET",status="404"} 2',
+            self.scrape(),
+        )
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic("PROPFIND", BUS_URL)
+        self.client.generic("FOO", BUS_URL)
+
+        text = self.scrape()
+
+        self.assertIn(
+            'http_request_duration_seconds_count{view="BusViewSet.other",'
+            'method="other"} 2',
+            text,
+        )
+        self.assertNotIn("PROPFIND", text)
+
+    def test_staff_only_without_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_set(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_processes_added_up_through_directory(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        other_worker = [
+            ["http_requests_total", ["BusViewSet.list", "GET", "200"], 5],
+            [
+                "http_request_duration_seconds",
+                ["BusViewSet.list", "GET"],
+                [1] + [0] * 11 + [0.002],
+            ],
+        ]
+        with open(f"{directory.name}/1.json", "w") as snapshot:
+            json.dump(other_worker, snapshot)
+
+        with self.settings(METRICS_DIR=directory.name):
+            self.client.get(BUS_URL)
+            text = self.scrape()
+
+        self.assertIn(
+            'http_requests_total{view="BusViewSet.list",method="GET",status="200"} 6',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="BusViewSet.list",method="GET"} 2',
+            text,
+        )
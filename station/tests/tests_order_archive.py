@@ -0,0 +1,125 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from station import seat_events
+from station.models import ArchivedOrder, ArchivedTicket, Bus, Order, Ticket, Trip
+
+ORDER_URL = reverse("station:order-list")
+ARCHIVED_ORDER_URL = reverse("station:order-archived")
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.trip = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(8), bus=bus
+        )
+
+    def order(self, days_ago, *seats):
+        order = Order.objects.create(user=self.user)
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=days_ago)
+        )
+        for seat in seats:
+            Ticket.objects.create(seat=seat, trip=self.trip, order=order)
+        return order
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command("archive_orders", "--pause=0", stdout=out, **options)
+        return out.getvalue()
+
+    def test_old_orders_and_tickets_are_moved(self):
+        old = self.order(400, 1, 2)
+        recent = self.order(10, 3)
+
+        output = self.archive()
+
+        self.assertIn("Archived 1 orders and 2 tickets", output)
+        self.assertEqual(list(Order.objects.all()), [recent])
+        self.assertEqual(list(Ticket.objects.values_list("seat", flat=True)), [3])
+        archived = ArchivedOrder.objects.get()
+        self.assertEqual(archived.id, old.id)
+        self.assertEqual(
+            sorted(archived.tickets.values_list("seat", "trip")),
+            [(1, self.trip.id), (2, self.trip.id)],
+        )
+
+    def test_batches_can_be_stopped_and_resumed(self):
+        for days_ago in range(400, 405):
+            self.order(days_ago, days_ago - 399)
+
+        self.archive(batch_size=2, max_batches=1)
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(Order.objects.count(), 3)
+
+        self.archive(batch_size=2)
+        self.assertEqual(ArchivedOrder.objects.count(), 5)
+        self.assertEqual(ArchivedTicket.objects.count(), 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_archived_seats_are_released(self):
+        self.order(400, 1, 2)
+
+        with mock.patch.object(seat_events.broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.archive()
+
+        self.assertEqual(len(callbacks), 1)  # one for the batch
+        self.assertEqual(
+            sorted(
+                (call.args for call in publish.call_args_list),
+                key=lambda args: args[1]["seat"],
+            ),
+            [
+                (
+                    self.trip.id,
+                    {"trip": self.trip.id, "seat": seat, "status": "released"},
+                )
+                for seat in (1, 2)
+            ],
+        )
+        Ticket.objects.create(
+            seat=1, trip=self.trip, order=Order.objects.create(user=self.user)
+        )
+
+    @override_settings(ORDER_CACHE=True)
+    def test_archived_orders_endpoint(self):
+        self.order(400, 1)
+        self.client.get(ORDER_URL)  # cached before archiving
+
+        self.archive()
+
+        self.assertEqual(self.client.get(ORDER_URL).data["results"], [])
+        res = self.client.get(ARCHIVED_ORDER_URL)
+        self.assertEqual(res.data["count"], 1)
+        (order,) = res.data["results"]
+        self.assertEqual(order["tickets"][0]["seat"], 1)
+        self.assertEqual(order["tickets"][0]["trip"]["destination"], "Lviv")
+
+    def test_archived_orders_are_per_user(self):
+        self.order(400, 1)
+        self.archive()
+        other = get_user_model().objects.create_user(
+            email="other@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(ARCHIVED_ORDER_URL)
+
+        self.assertEqual(res.data["count"], 0)
@@ -0,0 +1,163 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import mixins
+from rest_framework.test import APIClient
+
+from station.models import Bus, Order, Ticket, Trip
+
+ORDER_URL = reverse("station:order-list")
+SUMMARY_URL = reverse("station:order-summary")
+
+
+@override_settings(ORDER_CACHE=True)
+class OrderCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.morning = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(8), bus=self.bus
+        )
+        self.evening = Trip.objects.create(
+            source="Lviv", destination="Kyiv", departure=datetime.time(20), bus=self.bus
+        )
+        self.order = Order.objects.create(user=self.user)
+        self.ticket = Ticket.objects.create(seat=1, trip=self.morning, order=self.order)
+
+    def test_repeated_page_served_from_cache(self):
+        first = self.client.get(ORDER_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(ORDER_URL)
+        self.assertEqual(second.data, first.data)
+
+    def test_pages_are_per_user(self):
+        self.client.get(ORDER_URL)
+        other = get_user_model().objects.create_user(
+            email="other@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual(res.data["count"], 0)
+
+    def test_new_order_invalidates(self):
+        self.client.get(ORDER_URL)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=2, trip=self.evening, order=order)
+
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual(res.data["count"], 2)
+
+    def test_ticket_delete_invalidates(self):
+        self.client.get(ORDER_URL)
+        self.ticket.delete()
+
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual(res.data["results"][0]["tickets"], [])
+
+    def test_trip_change_invalidates(self):
+        self.client.get(ORDER_URL)
+        self.morning.destination = "Odesa"
+        self.morning.save()
+
+        res = self.client.get(ORDER_URL)
+
+        trip = res.data["results"][0]["tickets"][0]["trip"]
+        self.assertEqual(trip["destination"], "Odesa")
+
+    def test_trip_change_keeps_pages_of_other_users(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.test", password="testpassword"
+        )
+        Ticket.objects.create(
+            seat=1, trip=self.evening, order=Order.objects.create(user=other)
+        )
+        self.client.force_authenticate(other)
+        self.client.get(ORDER_URL)
+
+        self.morning.destination = "Odesa"
+        self.morning.save()
+
+        with self.assertNumQueries(0):
+            self.client.get(ORDER_URL)
+
+    def test_cascaded_ticket_deletes_take_one_lookup(self):
+        def delete_trip(tickets):
+            trip = Trip.objects.create(
+                source="Kyiv",
+                destination="Odesa",
+                departure=datetime.time(9),
+                bus=self.bus,
+            )
+            for seat in range(1, tickets + 1):
+                order = Order.objects.create(user=self.user)
+                Ticket.objects.create(seat=seat, trip=trip, order=order)
+            with CaptureQueriesContext(connection) as queries:
+                trip.delete()
+            return len(queries)
+
+        self.assertEqual(delete_trip(10), delete_trip(1))
+        res = self.client.get(ORDER_URL)
+        self.assertEqual(res.data["count"], 12)  # the orders are left empty
+
+    def test_disabled_without_a_shared_cache(self):
+        with override_settings(ORDER_CACHE=False):
+            with CaptureQueriesContext(connection) as first:
+                self.client.get(ORDER_URL)
+            with CaptureQueriesContext(connection) as second:
+                self.client.get(ORDER_URL)
+
+        self.assertGreater(len(second), 0)
+        self.assertEqual(len(second), len(first))
+
+    def test_invalidation_while_computing_is_not_cached_over(self):
+        compute_page = mixins.ListModelMixin.list
+
+        def compute_then_order(view, request, *args, **kwargs):
+            response = compute_page(view, request, *args, **kwargs)
+            # an order saved while the page was being computed
+            Order.objects.create(user=self.user)
+            return response
+
+        with mock.patch.object(
+            mixins.ListModelMixin,
+            "list",
+            autospec=True,
+            side_effect=compute_then_order,
+        ):
+            stale = self.client.get(ORDER_URL)
+
+        res = self.client.get(ORDER_URL)
+
+        self.assertEqual(res.data["count"], stale.data["count"] + 1)
+
+    @mock.patch("station.views.timezone.localtime")
+    def test_summary(self, localtime):
+        localtime.return_value = datetime.datetime(2024, 5, 1, 12, 0)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=2, trip=self.evening, order=order)
+        Ticket.objects.create(seat=3, trip=self.evening, order=order)
+
+        res = self.client.get(SUMMARY_URL)
+        with self.assertNumQueries(0):
+            cached = self.client.get(SUMMARY_URL)
+
+        expected = {"orders": 2, "tickets": 3, "upcoming_trips": 1}
+        self.assertEqual(res.data, expected)
+        self.assertEqual(cached.data, expected)
@@ -0,0 +1,89 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from station.models import Bus, Trip
+
+BUS_URL = reverse("station:bus-list")
+TRIP_URL = reverse("station:trip-list")
+
+
+class EstimatedCountPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        for num in range(5):
+            bus = Bus.objects.create(info=f"AA 888{num} OO", num_seats=50)
+            Trip.objects.create(
+                source="Kyiv",
+                destination="Lviv",
+                departure=datetime.time(10, num),
+                bus=bus,
+            )
+
+    def test_small_tables_are_counted_exactly(self):
+        res = self.client.get(BUS_URL)
+
+        self.assertEqual(res.data["count"], 5)
+        self.assertFalse(res.data["count_is_estimated"])
+
+    @mock.patch("station.pagination.estimate_count", return_value=2_000_000)
+    def test_large_tables_use_estimate(self, estimate_count):
+        for url in (BUS_URL, TRIP_URL):
+            res = self.client.get(url)
+
+            self.assertEqual(res.data["count"], 2_000_000)
+            self.assertTrue(res.data["count_is_estimated"])
+            self.assertIsNotNone(res.data["next"])
+
+    @mock.patch("station.pagination.estimate_count", return_value=100)
+    def test_low_estimate_counts_exactly(self, estimate_count):
+        res = self.client.get(TRIP_URL)
+
+        self.assertEqual(res.data["count"], 5)
+        self.assertFalse(res.data["count_is_estimated"])
+
+    @override_settings(PAGINATION_COUNT_CAP=3)
+    def test_count_cap(self):
+        res = self.client.get(TRIP_URL)
+
+        self.assertEqual(res.data["count"], 3)
+        self.assertTrue(res.data["count_is_estimated"])
+        self.assertEqual(len(res.data["results"]), 2)
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=1)
+    @mock.patch("station.pagination.estimate_count", return_value=3)
+    def test_low_estimate_does_not_hide_pages(self, estimate_count):
+        res = self.client.get(BUS_URL, {"page": 3})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["count"], 3)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIsNone(res.data["next"])
+        self.assertEqual(self.client.get(BUS_URL, {"page": 4}).status_code, 404)
+
+        res = self.client.get(TRIP_URL, {"offset": 2})
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
+
+        res = self.client.get(TRIP_URL, {"offset": 4})
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIsNone(res.data["next"])
+
+    @override_settings(PAGINATION_COUNT_CAP=3)
+    def test_count_cap_does_not_hide_pages(self):
+        res = self.client.get(BUS_URL, {"page": 2})
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIn("page=3", res.data["next"])
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIsNone(res.data["next"])
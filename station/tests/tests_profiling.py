@@ -0,0 +1,112 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django_rest_lesson import profiling
+
+ORDER_URL = reverse("station:order-list")
+TRIP_URL = reverse("station:trip-list")
+PROFILE_LIST_URL = reverse("profile-list")
+
+
+def profile_detail_url(profile_id):
+    return reverse("profile-detail", args=(profile_id,))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            PROFILE_DIR=directory.name, PROFILE_INTERVAL=0.0001
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+        return client
+
+    def test_staff_request_profiled(self):
+        client = self.token_client(self.admin)
+
+        res = client.get(ORDER_URL, {"profile": "1"})
+
+        profile_id = res["X-Profile-Id"]
+        (profile,) = client.get(PROFILE_LIST_URL).data
+        self.assertEqual(profile["id"], profile_id)
+        self.assertEqual(profile["trigger"], "requested")
+        self.assertEqual(profile["view"], "OrderViewSet.list")
+        self.assertEqual(profile["user"], self.admin.id)
+
+        folded = client.get(profile_detail_url(profile_id))
+        self.assertEqual(folded["Content-Type"], "text/plain; charset=utf-8")
+        for line in folded.content.decode().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertIn(";", stack)
+
+    def test_header_trigger_with_session(self):
+        self.client.force_login(self.admin)
+
+        res = self.client.get(TRIP_URL, HTTP_X_PROFILE="1")
+
+        self.assertIn("X-Profile-Id", res)
+        (profile,) = profiling.list_profiles()
+        self.assertEqual(profile["view"], "TripViewSet.list")
+
+    def test_not_profiled_for_other_users(self):
+        res = self.token_client(self.user).get(ORDER_URL, {"profile": "1"})
+
+        self.assertNotIn("X-Profile-Id", res)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_requests(self):
+        self.token_client(self.user).get(ORDER_URL)
+
+        (profile,) = profiling.list_profiles()
+        self.assertEqual(profile["trigger"], "sampled")
+
+    @override_settings(PROFILE_MAX_FILES=2)
+    def test_only_newest_profiles_kept(self):
+        client = self.token_client(self.admin)
+        ids = [
+            client.get(ORDER_URL, {"profile": "1"})["X-Profile-Id"] for _ in range(3)
+        ]
+
+        self.assertEqual(
+            {profile["id"] for profile in profiling.list_profiles()}, set(ids[1:])
+        )
+
+    def test_endpoints_staff_only(self):
+        client = self.token_client(self.user)
+
+        self.assertEqual(client.get(PROFILE_LIST_URL).status_code, 403)
+        self.assertEqual(
+            client.get(
+                profile_detail_url("00000000-0000-0000-0000-000000000000")
+            ).status_code,
+            403,
+        )
+
+    def test_unknown_profile(self):
+        res = self.token_client(self.admin).get(
+            profile_detail_url("00000000-0000-0000-0000-000000000000")
+        )
+        self.assertEqual(res.status_code, 404)
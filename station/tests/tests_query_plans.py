@@ -0,0 +1,294 @@
+"""Query plan regression tests (PostgreSQL only).
+
+A dataset of realistic size is seeded and ANALYZEd, then every query run
+by representative requests to the bus, trip, order and facility endpoints
+(plus the admin's trip search and autocomplete and the next trips by
+departure) is EXPLAINed. The plans are checked for what the indexes are
+there for: no sequential scan on tickets, the trip indexes used by trip
+search and autocomplete and the departure index used to find the next
+trips.
+
+The plans, reduced to their nodes (no costs or row estimates), are also
+compared with the snapshot in query_plans.json, and any change is
+reported as a diff, as is a case missing from the snapshot. Run with
+UPDATE_QUERY_PLANS=1 to record the current plans after an intended change
+or a new case, and commit the file. Plans depend on the PostgreSQL
+version, the snapshot is for the one in docker-compose.yaml.
+"""
+
+import datetime
+import difflib
+import json
+import os
+import pathlib
+import unittest
+from types import SimpleNamespace
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from station.models import (
+    ArchivedOrder,
+    ArchivedTicket,
+    Bus,
+    Facility,
+    Order,
+    Ticket,
+    Trip,
+)
+
+SNAPSHOT = pathlib.Path(__file__).with_name("query_plans.json")
+CITIES = [f"City {number}" for number in range(50)]
+
+BUSES = 500
+TRIPS = 20_000
+ORDERS = 20_000
+TICKETS_PER_ORDER = 5
+USERS = 200
+ARCHIVED_ORDERS = 5_000
+
+
+def plan_lines(node, depth=0):
+    """The nodes of an EXPLAIN (FORMAT JSON) plan, one indented line each."""
+    line = node["Node Type"]
+    if "Join Type" in node and node["Join Type"] != "Inner":
+        line += f" ({node['Join Type']})"
+    if "Strategy" in node:
+        line += f" ({node['Strategy']})"
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+    yield "  " * depth + line
+    for child in node.get("Plans", ()):
+        yield from plan_lines(child, depth + 1)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(plan_lines(plan[0]["Plan"]))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs PostgreSQL")
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        users = user_model.objects.bulk_create(
+            user_model(email=f"plans-{number}@test.test") for number in range(USERS)
+        )
+        cls.user = users[0]
+        cls.user.is_staff = True
+        cls.user.save(update_fields=["is_staff"])
+
+        facilities = Facility.objects.bulk_create(
+            Facility(name=f"Facility {number}") for number in range(20)
+        )
+        buses = Bus.objects.bulk_create(
+            Bus(info=f"AA {number:04d} OO", num_seats=50) for number in range(BUSES)
+        )
+        Bus.facility.through.objects.bulk_create(
+            Bus.facility.through(
+                bus_id=bus.pk, facility_id=facilities[(number + offset) % 20].pk
+            )
+            for number, bus in enumerate(buses)
+            for offset in range(3)
+        )
+        trips = Trip.objects.bulk_create(
+            (
+                Trip(
+                    source=CITIES[number % len(CITIES)],
+                    destination=CITIES[(number // len(CITIES) + 1) % len(CITIES)],
+                    departure=datetime.time(number % 24, number % 60),
+                    bus=buses[number % BUSES],
+                )
+                for number in range(TRIPS)
+            ),
+            batch_size=5_000,
+        )
+        orders = Order.objects.bulk_create(
+            (Order(user=users[number % USERS]) for number in range(ORDERS)),
+            batch_size=5_000,
+        )
+        # every seat of a trip once: ticket n sits in trip n // 50
+        Ticket.objects.bulk_create(
+            (
+                Ticket(
+                    order=order,
+                    trip=trips[ticket // 50],
+                    seat=ticket % 50 + 1,
+                )
+                for number, order in enumerate(orders)
+                for ticket in range(
+                    number * TICKETS_PER_ORDER, (number + 1) * TICKETS_PER_ORDER
+                )
+            ),
+            batch_size=5_000,
+        )
+        archived = ArchivedOrder.objects.bulk_create(
+            (
+                ArchivedOrder(
+                    user=users[number % USERS],
+                    created_at=timezone.now() - datetime.timedelta(days=400),
+                )
+                for number in range(ARCHIVED_ORDERS)
+            ),
+            batch_size=5_000,
+        )
+        ArchivedTicket.objects.bulk_create(
+            (
+                ArchivedTicket(order=order, trip=trips[number], seat=1)
+                for number, order in enumerate(archived)
+            ),
+            batch_size=5_000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.bus, cls.trip, cls.facility = buses[0], trips[0], facilities[0]
+        cls.order = Order.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cases(self):
+        """Name -> URL of the requests whose queries are explained."""
+        return {
+            "bus list": reverse("station:bus-list"),
+            "bus list, sparse": reverse("station:bus-list") + "?fields=id,info",
+            "bus detail": reverse("station:bus-detail", args=[self.bus.pk]),
+            "trip list": reverse("station:trip-list"),
+            "trip list, sparse": reverse("station:trip-list") + "?fields=id,source",
+            "trip detail": reverse("station:trip-detail", args=[self.trip.pk]),
+            "order list": reverse("station:order-list"),
+            "order detail": reverse("station:order-detail", args=[self.order.pk]),
+            "order summary": reverse("station:order-summary"),
+            "archived orders": reverse("station:order-archived"),
+            "facility list": reverse("station:facility-list"),
+            "facility detail": reverse(
+                "station:facility-detail", args=[self.facility.pk]
+            ),
+        }
+
+    def request_plans(self, url):
+        """Plans of the SELECTs run to answer ``url``, in order."""
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith("SELECT"):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        cache.clear()  # order and fragment caches would skip queries
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [explain(sql, params) for sql, params in statements]
+
+    def trip_search_plan(self):
+        queryset, _ = admin.site._registry[Trip].get_search_results(
+            None, Trip.objects.all(), CITIES[1]
+        )
+        return explain(*queryset.query.sql_with_params())
+
+    @staticmethod
+    def trip_autocomplete_plan():
+        request = SimpleNamespace(
+            resolver_match=SimpleNamespace(url_name="autocomplete")
+        )
+        queryset, _ = admin.site._registry[Trip].get_search_results(
+            request, Trip.objects.all(), "city 1"
+        )
+        return explain(*queryset.query.sql_with_params())
+
+    @staticmethod
+    def next_trips_plan():
+        queryset = Trip.objects.filter(departure__gte=datetime.time(12)).order_by(
+            "departure"
+        )[:20]
+        return explain(*queryset.query.sql_with_params())
+
+    def all_plans(self):
+        plans = {name: self.request_plans(url) for name, url in self.cases().items()}
+        plans["admin trip search"] = [self.trip_search_plan()]
+        plans["admin trip autocomplete"] = [self.trip_autocomplete_plan()]
+        plans["next trips by departure"] = [self.next_trips_plan()]
+        return plans
+
+    def test_no_sequential_scan_on_tickets(self):
+        seq_scan = f"Seq Scan on {Ticket._meta.db_table}"
+        for name, plans in self.all_plans().items():
+            for plan in plans:
+                with self.subTest(name):
+                    self.assertFalse(
+                        any(line.strip() == seq_scan for line in plan),
+                        "\n".join(plan),
+                    )
+
+    def test_trip_search_uses_trip_indexes(self):
+        plan = "\n".join(self.trip_search_plan())
+        source_index, destination_index = (
+            index.name
+            for index in Trip._meta.indexes
+            if index.fields in (["source", "destination"], ["destination"])
+        )
+        # source = x OR destination = x: one index for each side
+        self.assertIn(f"using {source_index}", plan)
+        self.assertIn(f"using {destination_index}", plan)
+        self.assertNotIn(f"Seq Scan on {Trip._meta.db_table}", plan)
+
+    def test_trip_autocomplete_uses_prefix_indexes(self):
+        plan = "\n".join(self.trip_autocomplete_plan())
+        # ^source OR ^destination: UPPER(column) LIKE 'CITY 1%' on each side
+        self.assertIn("using station_trip_source_upper_idx", plan)
+        self.assertIn("using station_trip_destination_upper_idx", plan)
+        self.assertNotIn(f"Seq Scan on {Trip._meta.db_table}", plan)
+
+    def test_next_trips_use_departure_index(self):
+        plan = "\n".join(self.next_trips_plan())
+        (departure_index,) = (
+            index.name for index in Trip._meta.indexes if index.fields == ["departure"]
+        )
+        self.assertIn(f"using {departure_index}", plan)
+        self.assertNotIn(f"Seq Scan on {Trip._meta.db_table}", plan)
+
+    def test_plans_match_snapshot(self):
+        plans = self.all_plans()
+        update = os.environ.get("UPDATE_QUERY_PLANS") == "1"
+        snapshot = json.loads(SNAPSHOT.read_text()) if SNAPSHOT.exists() else {}
+
+        diffs, recorded = [], False
+        for name, current in plans.items():
+            if update and snapshot.get(name) != current:
+                snapshot[name] = current
+                recorded = True
+                continue
+            expected = snapshot.get(name, [])
+            if expected != current:
+                diffs.extend(
+                    difflib.unified_diff(
+                        [line for plan in expected for line in plan + ["--"]],
+                        [line for plan in current for line in plan + ["--"]],
+                        fromfile=f"{name} (snapshot)",
+                        tofile=f"{name} (now)",
+                        lineterm="",
+                    )
+                )
+        if recorded:
+            SNAPSHOT.write_text(json.dumps(snapshot, indent=2, sort_keys=True) + "\n")
+        if diffs:
+            self.fail(
+                "Query plans changed (UPDATE_QUERY_PLANS=1 records them):\n"
+                + "\n".join(diffs)
+            )
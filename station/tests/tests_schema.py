@@ -0,0 +1,87 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from django_rest_lesson.schema import (
+    get_schema,
+    read_schema,
+    reset_schema,
+    write_schema,
+)
+
+SCHEMA_URL = reverse("schema")
+
+
+def versioned_url(version):
+    return reverse("schema-versioned", args=(version,))
+
+
+class CachedSchemaTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        settings_override = override_settings(SCHEMA_CACHE_DIR=self.cache_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_schema()
+        self.addCleanup(reset_schema)
+
+    def test_schema_served_with_etag(self):
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        schema = json.loads(res.content)
+        self.assertIn("/api/station/trips/", schema["paths"])
+        self.assertEqual(res["ETag"], f'"{get_schema().version}"')
+        self.assertIn("max-age", res["Cache-Control"])
+
+    def test_yaml_is_default(self):
+        res = self.client.get(SCHEMA_URL)
+        self.assertTrue(res.content.startswith(b"openapi:"))
+
+    def test_not_modified(self):
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_versioned_url_is_immutable(self):
+        version = get_schema().version
+
+        res = self.client.get(versioned_url(version))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(
+            self.client.get(versioned_url("0" * 16)).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_schema_built_once_and_stored(self):
+        self.client.get(SCHEMA_URL)
+
+        files = {path.name for path in Path(self.cache_dir.name).iterdir()}
+        self.assertEqual(files, {"schema.json", "schema.yaml", "schema.meta.json"})
+        self.assertIs(get_schema(), get_schema())
+
+    def test_stale_schema_is_rebuilt(self):
+        call_command("generate_schema", verbosity=0)
+        meta_path = Path(self.cache_dir.name) / "schema.meta.json"
+        meta = json.loads(meta_path.read_text())
+        meta_path.write_text(json.dumps({**meta, "fingerprint": "stale"}))
+
+        self.assertNotEqual(get_schema().fingerprint, "stale")
+
+    def test_files_of_different_writes_are_not_mixed(self):
+        document = get_schema()
+        write_schema(document)
+        self.assertEqual(read_schema(), document)
+
+        # as if read while another write had replaced schema.json only
+        (Path(self.cache_dir.name) / "schema.json").write_bytes(b"{}")
+
+        self.assertIsNone(read_schema())
@@ -0,0 +1,167 @@
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from station import seat_events
+from station.models import Bus, Order, Ticket, Trip
+from station.seat_events import InMemoryBroker, SubscriberLagged
+
+
+def seat_events_url(trip_id):
+    return reverse("station:trip-seat-events", args=(trip_id,))
+
+
+def close(response):
+    # closing sends request_finished, whose close_old_connections would
+    # close the connection of the test case's transaction
+    with mock.patch.object(connection, "close_if_unusable_or_obsolete"):
+        response.close()
+
+
+def parse_event(chunk):
+    lines = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    return lines["event"], json.loads(lines["data"])
+
+
+class InMemoryBrokerTests(SimpleTestCase):
+    def test_event_fans_out_to_trip_subscribers(self):
+        broker = InMemoryBroker(buffer_size=10)
+        first, second = broker.subscribe(1), broker.subscribe(1)
+        other_trip = broker.subscribe(2)
+
+        broker.publish(1, {"seat": 5})
+
+        self.assertEqual(first.get(1), {"seat": 5})
+        self.assertEqual(second.get(1), {"seat": 5})
+        self.assertIsNone(other_trip.get(0.01))
+
+    def test_slow_subscriber_is_marked_lagged(self):
+        broker = InMemoryBroker(buffer_size=2)
+        subscription = broker.subscribe(1)
+
+        for seat in range(3):
+            broker.publish(1, {"seat": seat})
+
+        with self.assertRaises(SubscriberLagged):
+            subscription.get(1)
+
+    def test_close_unsubscribes(self):
+        broker = InMemoryBroker(buffer_size=2)
+        broker.subscribe(1).close()
+        self.assertEqual(broker.subscriber_count(1), 0)
+
+
+class TripSeatEventsViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.token = Token.objects.create(user=self.user)
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.trip = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(10), bus=bus
+        )
+        self.order = Order.objects.create(user=self.user)
+        self.ticket = Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+
+    def get(self, trip_id, **params):
+        return self.client.get(
+            seat_events_url(trip_id),
+            params,
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+
+    def sell_seat(self, seat):
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(seat=seat, trip=self.trip, order=self.order)
+
+    def release_seat(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.delete()
+
+    def subscribers(self):
+        return seat_events.broker.subscriber_count(self.trip.id)
+
+    def test_snapshot_then_seat_changes(self):
+        response = self.get(self.trip.id)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = iter(response.streaming_content)
+
+        self.assertEqual(
+            parse_event(next(stream)),
+            ("seats", {"trip": self.trip.id, "num_seats": 50, "sold": [1]}),
+        )
+        self.sell_seat(2)
+        self.assertEqual(
+            parse_event(next(stream)),
+            ("seat", {"trip": self.trip.id, "seat": 2, "status": "sold"}),
+        )
+        self.release_seat()
+        self.assertEqual(
+            parse_event(next(stream)),
+            ("seat", {"trip": self.trip.id, "seat": 1, "status": "released"}),
+        )
+        close(response)
+        self.assertEqual(self.subscribers(), 0)
+
+    @override_settings(SEAT_EVENTS_HEARTBEAT=0.01)
+    def test_heartbeat_while_idle(self):
+        response = self.get(self.trip.id)
+        stream = iter(response.streaming_content)
+        next(stream)
+
+        self.assertEqual(next(stream), b": keep-alive\n\n")
+        close(response)
+
+    @override_settings(SEAT_EVENTS_RESYNC_INTERVAL=0.01)
+    def test_seats_are_resent(self):
+        response = self.get(self.trip.id)
+        stream = iter(response.streaming_content)
+        next(stream)
+
+        # sold by another worker process: no event here
+        Ticket.objects.create(seat=2, trip=self.trip, order=self.order)
+
+        self.assertEqual(
+            parse_event(next(stream)),
+            ("seats", {"trip": self.trip.id, "num_seats": 50, "sold": [1, 2]}),
+        )
+        close(response)
+
+    @override_settings(SEAT_EVENTS_MAX_STREAMS=1)
+    def test_streams_per_process_are_limited(self):
+        response = self.get(self.trip.id)
+        next(iter(response.streaming_content))
+
+        refused = self.get(self.trip.id)
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn("Retry-After", refused)
+
+        close(response)
+        response = self.get(self.trip.id)
+        self.assertEqual(response.status_code, 200)
+        close(response)
+
+    def test_unsent_stream_leaves_no_subscription(self):
+        close(self.get(self.trip.id))
+        self.assertEqual(self.subscribers(), 0)
+
+    def test_authentication_required(self):
+        response = self.client.get(seat_events_url(self.trip.id))
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_in_query_string_is_ignored(self):
+        response = self.client.get(
+            seat_events_url(self.trip.id), {"token": self.token.key}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_trip(self):
+        response = self.get(self.trip.id + 1)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,126 @@
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from station import single_flight
+from station.single_flight import SingleFlight
+
+TRIP_URL = reverse("station:trip-list")
+
+
+class SingleFlightTests(SimpleTestCase):
+    def run_concurrently(self, flight, compute, count, **options):
+        results = [None] * count
+
+        def request(number):
+            results[number] = flight.do("key", compute, **options)
+
+        threads = [
+            threading.Thread(target=request, args=(number,)) for number in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def slow_compute(self, release, started=None):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if started:
+                started.set()
+            release.wait(5)
+            return "result"
+
+        return compute, calls
+
+    def test_concurrent_calls_computed_once(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        compute, calls = self.slow_compute(release)
+        threading.Timer(0.2, release.set).start()
+
+        results = self.run_concurrently(flight, compute, 10, wait=5)
+
+        self.assertEqual(results, ["result"] * 10)
+        self.assertEqual(len(calls), 1)
+
+    def test_waiting_is_bounded(self):
+        flight = SingleFlight()
+        release, started = threading.Event(), threading.Event()
+        compute, _ = self.slow_compute(release, started)
+        leader = threading.Thread(target=flight.do, args=("key", compute, 5))
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+        # the follower gives up waiting and computes the result itself
+        self.assertEqual(flight.do("key", lambda: "own", wait=0.05), "own")
+
+    def test_leader_failure_not_shared(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            flight.do("key", fail, wait=1)
+        self.assertEqual(flight.do("key", lambda: "result", wait=1), "result")
+
+    def test_across_processes_through_lock_dir(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "result"
+
+        # one SingleFlight per process
+        for _ in range(3):
+            self.assertEqual(
+                SingleFlight().do(
+                    "key", compute, wait=1, lock_dir=directory.name, ttl=60
+                ),
+                "result",
+            )
+        self.assertEqual(len(calls), 1)
+
+
+class TripListCoalescingTests(TestCase):
+    def test_request_key_normalized(self):
+        factory = APIRequestFactory()
+        first = Request(factory.get(TRIP_URL, {"b": "2", "a": "1"}))
+        second = Request(factory.get(TRIP_URL + "?a=1&b=2&profile=1"))
+
+        self.assertEqual(
+            single_flight.request_key(first, "trips:list"),
+            single_flight.request_key(second, "trips:list"),
+        )
+
+    def test_list_goes_through_single_flight(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="test@test.test", password="testpassword"
+            )
+        )
+
+        with mock.patch.object(
+            single_flight.trip_lists, "do", wraps=single_flight.trip_lists.do
+        ) as do:
+            res = client.get(TRIP_URL, {"source": "Kyiv"})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(do.call_args.args[0].startswith("trips:list:"))
@@ -0,0 +1,104 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Bus, Facility, Order, Ticket, Trip
+
+TRIP_URL = reverse("station:trip-list")
+ORDER_URL = reverse("station:order-list")
+
+
+def trip_detail_url(trip_id):
+    return reverse("station:trip-detail", args=(trip_id,))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.bus.facility.add(Facility.objects.create(name="WiFi"))
+        self.trip = Trip.objects.create(
+            source="Kyiv",
+            destination="Lviv",
+            departure=datetime.time(10, 30),
+            bus=self.bus,
+        )
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+
+    def test_default_representation_unchanged(self):
+        res = self.client.get(trip_detail_url(self.trip.id))
+        self.assertEqual(res.data["bus"]["facility"][0]["name"], "WiFi")
+        self.assertEqual(res.data["ticket"], [1])
+
+    def test_fields_prunes_output(self):
+        res = self.client.get(TRIP_URL, {"fields": "id,departure"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["results"], [{"id": self.trip.id, "departure": "10:30:00"}]
+        )
+
+    def test_fields_skips_joins_and_annotations(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(TRIP_URL, {"fields": "id,departure"})
+
+        page_query = ctx.captured_queries[-1]["sql"]
+        self.assertNotIn("station_bus", page_query)
+        self.assertNotIn("COUNT", page_query)
+        self.assertNotIn('"station_trip"."source"', page_query)
+
+    def test_dotted_source_selects_only_needed_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(TRIP_URL, {"fields": "id,bus_info"})
+
+        self.assertEqual(res.data["results"][0]["bus_info"], "AA 8889 OO")
+        page_query = ctx.captured_queries[-1]["sql"]
+        self.assertIn('"station_bus"."info"', page_query)
+        self.assertNotIn('"station_bus"."image"', page_query)
+
+    def test_collapsed_relation_skips_prefetch(self):
+        with CaptureQueriesContext(connection) as expanded:
+            self.client.get(trip_detail_url(self.trip.id))
+        with CaptureQueriesContext(connection) as collapsed:
+            res = self.client.get(
+                trip_detail_url(self.trip.id), {"fields": "id,bus", "expand": ""}
+            )
+
+        self.assertEqual(res.data, {"id": self.trip.id, "bus": self.bus.id})
+        self.assertLess(len(collapsed), len(expanded))
+
+    def test_expand_keeps_nested_relation(self):
+        res = self.client.get(ORDER_URL, {"fields": "id,tickets", "expand": "tickets"})
+
+        ticket = res.data["results"][0]["tickets"][0]
+        self.assertEqual(ticket["trip"]["source"], "Kyiv")
+
+    def test_fields_ignored_on_write(self):
+        staff = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(staff)
+        res = self.client.post(
+            f"{TRIP_URL}?fields=id",
+            {
+                "source": "Kyiv",
+                "destination": "Odesa",
+                "departure": "12:00",
+                "bus": self.bus.id,
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["destination"], "Odesa")
@@ -0,0 +1,69 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Bus, Order, Ticket, Trip
+
+ORDER_URL = reverse("station:order-list")
+
+
+class TicketSeatConstraintTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        bus = Bus.objects.create(info="AA 8889 OO", num_seats=10)
+        self.trip = Trip.objects.create(
+            source="Kyiv", destination="Lviv", departure=datetime.time(10), bus=bus
+        )
+        self.order = Order.objects.create(user=self.user)
+
+    def create_order(self, *seats):
+        tickets = [{"seat": seat, "trip": self.trip.id} for seat in seats]
+        return self.client.post(ORDER_URL, {"tickets": tickets}, format="json")
+
+    def test_ticket_insert_is_one_statement(self):
+        with self.assertNumQueries(1):
+            Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+
+    def test_seat_out_of_range_rejected_by_database(self):
+        for seat in (0, 11):
+            # the failed insert breaks the transaction, hence the savepoint
+            with self.assertRaises(ValueError) as error, transaction.atomic():
+                Ticket.objects.create(seat=seat, trip=self.trip, order=self.order)
+            self.assertIn("seat", error.exception.args[0])
+
+    def test_taken_seat_rejected_by_database(self):
+        Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+        with self.assertRaises(ValueError) as error:
+            Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+        self.assertIn("already taken", error.exception.args[0]["seat"])
+
+    def test_create_order(self):
+        res = self.create_order(1, 2)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(Ticket.objects.values_list("seat", flat=True)), [1, 2])
+
+    def test_create_order_seat_out_of_range(self):
+        res = self.create_order(1, 11)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_create_order_seat_taken(self):
+        Ticket.objects.create(seat=1, trip=self.trip, order=self.order)
+
+        res = self.create_order(1)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("already taken", res.data["seat"])
+        self.assertEqual(Order.objects.count(), 1)
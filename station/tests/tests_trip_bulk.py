@@ -0,0 +1,203 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station import journeys, seat_events
+from station.models import Bus, Order, Ticket, Trip
+
+TRIP_BULK_URL = reverse("station:trip-bulk")
+
+
+class TripBulkTests(TestCase):
+    def setUp(self):
+        journeys.timetable.invalidate()
+        self.addCleanup(journeys.timetable.invalidate)
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        self.bus = Bus.objects.create(info="AA 8889 OO", num_seats=50)
+        self.other_bus = Bus.objects.create(info="BB 8889 OO", num_seats=30)
+
+    def trip_payload(self, number, bus=None):
+        return {
+            "source": "Kyiv",
+            "destination": f"Stop {number}",
+            "departure": f"{number % 24:02}:00",
+            "bus": (bus or self.bus).id,
+        }
+
+    def create_trips(self, count):
+        return Trip.objects.bulk_create(
+            Trip(
+                source="Kyiv",
+                destination=f"Stop {number}",
+                departure=datetime.time(number % 24),
+                bus=self.bus,
+            )
+            for number in range(count)
+        )
+
+    def test_bulk_create(self):
+        payload = {
+            "trips": [
+                self.trip_payload(number, bus=(self.bus, self.other_bus)[number % 2])
+                for number in range(20)
+            ]
+        }
+
+        # bus lookup, insert (+ savepoint and release)
+        with self.assertNumQueries(4):
+            res = self.client.post(TRIP_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Trip.objects.count(), 20)
+        self.assertEqual(
+            [trip["destination"] for trip in res.data["trips"]],
+            [f"Stop {number}" for number in range(20)],
+        )
+        self.assertTrue(all(trip["id"] for trip in res.data["trips"]))
+
+    def test_bulk_create_reports_errors_per_item(self):
+        payload = {
+            "trips": [
+                self.trip_payload(0),
+                {**self.trip_payload(1), "bus": self.other_bus.id + 100},
+                {**self.trip_payload(2), "departure": "noon"},
+            ]
+        }
+
+        res = self.client.post(TRIP_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data["trips"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("bus", errors[1])
+        self.assertIn("departure", errors[2])
+        self.assertFalse(Trip.objects.exists())
+
+    @override_settings(TRIP_BULK_MAX_ITEMS=2)
+    def test_bulk_create_limit(self):
+        payload = {"trips": [self.trip_payload(number) for number in range(3)]}
+
+        res = self.client.post(TRIP_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_bulk_partial_update(self):
+        trips = self.create_trips(10)
+        payload = {
+            "trips": [
+                {"id": trip.id, "destination": f"Lviv {trip.id}"} for trip in trips
+            ]
+            + [{"id": trips[0].id, "bus": self.other_bus.id}]
+        }
+
+        # trips, buses, update (+ savepoint and release)
+        with self.assertNumQueries(5):
+            res = self.client.patch(TRIP_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for trip in trips:
+            trip.refresh_from_db()
+            self.assertEqual(trip.destination, f"Lviv {trip.id}")
+        self.assertEqual(trips[0].bus, self.other_bus)
+        self.assertEqual(trips[1].bus, self.bus)
+
+    def test_bulk_partial_update_unknown_id(self):
+        trip = self.create_trips(1)[0]
+        payload = {
+            "trips": [
+                {"id": trip.id, "destination": "Lviv"},
+                {"id": trip.id + 1, "destination": "Lviv"},
+            ]
+        }
+
+        res = self.client.patch(TRIP_BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["trips"][0], {})
+        self.assertIn("id", res.data["trips"][1])
+        trip.refresh_from_db()
+        self.assertEqual(trip.destination, "Stop 0")
+
+    def test_bulk_delete(self):
+        trips = self.create_trips(5)
+
+        res = self.client.delete(
+            TRIP_BULK_URL, {"ids": [trip.id for trip in trips[:3]]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Trip.objects.values_list("id", flat=True).order_by("id")),
+            [trip.id for trip in trips[3:]],
+        )
+
+    @override_settings(ORDER_CACHE=True)
+    def test_bulk_delete_handles_the_tickets_once(self):
+        def delete_trips(tickets):
+            trips = self.create_trips(2)
+            for number in range(tickets):
+                Ticket.objects.create(
+                    seat=number + 1,
+                    trip=trips[number % 2],
+                    order=Order.objects.create(user=self.admin),
+                )
+            with mock.patch.object(seat_events, "publish_seats") as publish:
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.delete(
+                        TRIP_BULK_URL,
+                        {"ids": [trip.id for trip in trips]},
+                        format="json",
+                    )
+            publish.assert_called_once()
+            self.assertEqual(len(publish.call_args.args[0]), tickets)
+            return len(queries)
+
+        self.assertEqual(delete_trips(10), delete_trips(2))
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_bulk_delete_unknown_id(self):
+        trip = self.create_trips(1)[0]
+
+        res = self.client.delete(
+            TRIP_BULK_URL, {"ids": [trip.id, trip.id + 1]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["ids"][0], "")
+        self.assertTrue(Trip.objects.filter(id=trip.id).exists())
+
+    def test_timetable_updated_after_bulk_create(self):
+        journeys.timetable.state()
+        payload = {"trips": [self.trip_payload(number) for number in range(3)]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(TRIP_BULK_URL, payload, format="json")
+
+        state = journeys.timetable.state()
+        self.assertEqual(
+            sorted(state.by_trip), sorted(trip["id"] for trip in res.data["trips"])
+        )
+
+    def test_bulk_requires_staff(self):
+        user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.post(
+            TRIP_BULK_URL, {"trips": [self.trip_payload(0)]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
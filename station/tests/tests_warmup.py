@@ -0,0 +1,30 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from django_rest_lesson import warmup
+from django_rest_lesson.schema import reset_schema
+
+
+class WarmUpTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(SCHEMA_CACHE_DIR=cache_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(reset_schema)
+
+    @override_settings(WARMUP_ON_STARTUP=True)
+    @mock.patch("django_rest_lesson.warmup.gc.freeze")
+    def test_all_steps_succeed(self, freeze):
+        with self.assertNoLogs("django_rest_lesson.warmup", level="ERROR"):
+            warmup.warm_up()
+        freeze.assert_called_once()
+
+    @override_settings(WARMUP_ON_STARTUP=False)
+    @mock.patch("django_rest_lesson.warmup._warm_urls")
+    def test_disabled(self, warm_urls):
+        warmup.warm_up()
+        warm_urls.assert_not_called()
@@ -1,14 +1,31 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from station.views import BusViewSet, TripViewSet, FacilityViewSet, OrderViewSet
+from station.views import (
+    BookingRequestViewSet,
+    BusViewSet,
+    TripViewSet,
+    FacilityViewSet,
+    OrderViewSet,
+    JourneyViewSet,
+    TripSeatEventsView,
+)
 
 router = routers.DefaultRouter()
 router.register("buses", BusViewSet)
 router.register("trips", TripViewSet)
 router.register("facilities", FacilityViewSet)
 router.register("orders", OrderViewSet)
+router.register("bookings", BookingRequestViewSet)
+router.register("journeys", JourneyViewSet, basename="journey")
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path(
+        "trips/<int:pk>/seats/events/",
+        TripSeatEventsView.as_view(),
+        name="trip-seat-events",
+    ),
+    path("", include(router.urls)),
+]
 
 app_name = "station"
@@ -1,12 +1,44 @@
-from django.db.models import Count, F
-from drf_spectacular.utils import OpenApiParameter, extend_schema
-from rest_framework import viewsets, status
+import json
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, inline_serializer
+from rest_framework import generics, mixins, serializers, viewsets, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from station.models import Bus, Trip, Facility, Order
+from station import (
+    booking_queue,
+    fragments,
+    journeys,
+    order_cache,
+    seat_events,
+    single_flight,
+)
+from station.fragments import FragmentJSONRenderer
+from station.media import PassthroughRenderer, ensure_variant, serve_file
+from station.models import (
+    ArchivedOrder,
+    BookingRequest,
+    Bus,
+    Trip,
+    Facility,
+    Order,
+    Ticket,
+    order_users,
+)
+from station.pagination import EstimatedCountPageNumberPagination
+from station.renderers import ColumnarJSONRenderer
 from station.serializers import (
     BusSerializer,
     TripSerializer,
@@ -18,22 +50,181 @@ from station.serializers import (
     OrderSerializer,
     OrderListSerializer,
     BusImageSerializer,
+    JourneyQuerySerializer,
+    JourneySerializer,
+    TripBulkSerializer,
+    ArchivedOrderSerializer,
+    BookingRequestSerializer,
+    BusFacilityBulkSerializer,
+    BusSelectionSerializer,
+    query_param_set,
 )
 
 
-class FacilityViewSet(viewsets.ModelViewSet):
+def _select_related_paths(tree, prefix=""):
+    for name, subtree in tree.items():
+        yield prefix + name
+        yield from _select_related_paths(subtree, prefix + name + "__")
+
+
+class SparseFieldsetViewMixin:
+    """Shrink the queryset to what ?fields= / ?expand= will render.
+
+    Columns that are not serialized are deferred with ``only()``, and the
+    ``select_related``/``prefetch_related`` lookups declared by the viewset
+    are kept only for relations that are rendered (collapsed relations keep
+    just the first level of a prefetch).
+    """
+
+    sparse_actions = ("list", "retrieve")
+
+    def wants_field(self, name):
+        requested = query_param_set(self.request, "fields")
+        return requested is None or name in requested
+
+    def sparse_queryset(self, queryset):
+        if self.action not in self.sparse_actions or (
+            query_param_set(self.request, "fields") is None
+            and query_param_set(self.request, "expand") is None
+        ):
+            return queryset
+
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        related_columns = set()
+        expanded, collapsed, fully_loaded = set(), set(), set()
+        for field in self.get_serializer().fields.values():
+            if field.source == "*":
+                continue
+            root = field.source_attrs[0]
+            try:
+                model_field = opts.get_field(root)
+            except FieldDoesNotExist:
+                continue  # property or annotation
+            if model_field.concrete:
+                columns.add(root)
+            if not model_field.is_relation:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                expanded.add(root)
+                fully_loaded.add(root)
+            elif len(field.source_attrs) > 1:
+                expanded.add(root)
+                related_columns.add("__".join(field.source_attrs))
+            else:
+                collapsed.add(root)
+
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            paths = [
+                path
+                for path in _select_related_paths(select_related)
+                if path.split("__")[0] in expanded
+            ]
+            queryset = queryset.select_related(None)
+            if paths:  # select_related() without args would follow every FK
+                queryset = queryset.select_related(*paths)
+
+        prefetch = []
+        for lookup in queryset._prefetch_related_lookups:
+            path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            root = path.split("__")[0]
+            if root in expanded:
+                prefetch.append(lookup)
+            elif root in collapsed and not opts.get_field(root).concrete:
+                prefetch.append(root)
+        queryset = queryset.prefetch_related(None).prefetch_related(
+            *dict.fromkeys(prefetch)
+        )
+
+        selected = queryset.query.select_related
+        if not isinstance(selected, dict):
+            selected = {}
+        columns.update(
+            column
+            for column in related_columns
+            if column.split("__")[0] in selected
+            and column.split("__")[0] not in fully_loaded
+        )
+        return queryset.only(*columns)
+
+
+class FacilityViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Facility.objects.all()
     serializer_class = FacilitySerializer
     authentication_classes = [TokenAuthentication]
 
+    def get_queryset(self):
+        return self.sparse_queryset(self.queryset)
+
 
-class BusSetPagination(PageNumberPagination):
+class BusSetPagination(EstimatedCountPageNumberPagination):
     page_size = 2
     page_size_query_param = "page_size"
     max_page_size = 20
 
 
-class BusViewSet(viewsets.ModelViewSet):
+class FragmentCacheListMixin:
+    """Serve the list action from the fragment cache when rendering JSON.
+
+    ``fragment_dependencies`` and ``fragment_annotations`` are passed to
+    ``fragments.rows()``; the queryset's prefetches run for the cache
+    misses only.
+    """
+
+    fragment_dependencies = ()
+    fragment_annotations = ()
+
+    def get_renderers(self):
+        return [
+            FragmentJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in super().get_renderers()
+        ]
+
+    def list(self, request, *args, **kwargs):
+        if (
+            not settings.FRAGMENT_CACHE
+            or not isinstance(request.accepted_renderer, FragmentJSONRenderer)
+            or "indent" in request.accepted_media_type
+        ):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        prefetch = queryset._prefetch_related_lookups
+        queryset = queryset.prefetch_related(None)
+        page = self.paginate_queryset(queryset)
+        data = fragments.rows(
+            self.get_serializer_class(),
+            queryset if page is None else page,
+            self.get_serializer_context(),
+            dependencies=self.fragment_dependencies,
+            annotations=self.fragment_annotations,
+            prefetch=prefetch,
+        )
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+
+# Offers the columnar format (station.renderers) on the list action; left
+# out of the OpenAPI schema, which can't describe its shape. (A comment, as
+# drf-spectacular would take a docstring for the viewsets' description.)
+class ColumnarListMixin:
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if getattr(self, "action", None) == "list" and not getattr(
+            self, "swagger_fake_view", False
+        ):
+            renderers.append(ColumnarJSONRenderer())
+        return renderers
+
+
+class BusViewSet(
+    FragmentCacheListMixin,
+    ColumnarListMixin,
+    SparseFieldsetViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Bus.objects.all()
     serializer_class = BusListSerializer
     pagination_class = BusSetPagination
@@ -68,7 +259,8 @@ class BusViewSet(viewsets.ModelViewSet):
             facilities = self._params_to_ins(facilities)
             queryset = queryset.filter(facilities__id__in=facilities)
         if self.action in ("list", "retrieve"):
-            return queryset.prefetch_related("facility")  # оптимизация кверисетов
+            queryset = queryset.prefetch_related("facility")  # оптимизация кверисетов
+            return self.sparse_queryset(queryset)
 
         return queryset.distinct()
 
@@ -85,6 +277,92 @@ class BusViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses={(200, "image/*"): OpenApiTypes.BINARY})
+    @action(
+        detail=True,
+        methods=["GET"],
+        url_path=r"image/(?P<digest>[0-9a-f]+)(?:/(?P<variant>\w+))?",
+        url_name="image",
+        renderer_classes=[JSONRenderer, PassthroughRenderer],
+    )
+    def image(self, request, pk=None, digest=None, variant=None):
+        """Serve the bus image (or a resized variant) by content hash."""
+        bus = self.get_object()
+        if not bus.image_hash:
+            raise Http404("Bus has no image.")
+        if variant is not None and variant not in settings.BUS_IMAGE_VARIANTS:
+            raise Http404("Unknown image variant.")
+        if digest != bus.image_hash:
+            # an old url, point to the current image
+            kwargs = {"pk": bus.pk, "digest": bus.image_hash}
+            if variant is not None:
+                kwargs["variant"] = variant
+            return redirect("station:bus-image", **kwargs)
+
+        name = bus.image.name if variant is None else ensure_variant(bus, variant)
+        return serve_file(request, name, etag=f'"{bus.image_hash}-{variant or ""}"')
+
+    @extend_schema(
+        request=BusFacilityBulkSerializer,
+        responses=inline_serializer(
+            "BusFacilityBulkResult",
+            {
+                "buses": serializers.IntegerField(),
+                "added": serializers.IntegerField(),
+                "removed": serializers.IntegerField(),
+            },
+        ),
+    )
+    @action(detail=False, methods=["POST"], url_path="facilities")
+    def bulk_facilities(self, request):
+        """Add and remove facilities for the buses listed in ``buses`` or
+        matched by ``filter`` (every bus when empty); reports how many
+        buses were selected and facility links added and removed."""
+        serializer = BusFacilityBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if "buses" in data:
+            buses = Bus.objects.filter(pk__in=data["buses"])
+        else:
+            buses = BusSelectionSerializer.select(Bus.objects.all(), data["filter"])
+        selected = buses.values("pk")
+        through = Bus.facility.through
+
+        # plain statements on the through table: the per-bus m2m_changed
+        # signals are replaced by a single invalidation below
+        with transaction.atomic():
+            # the bus rows are locked so that links added by other requests
+            # meanwhile can't make the counts below wrong
+            bus_ids = list(
+                Bus.objects.select_for_update()
+                .filter(pk__in=selected)
+                .values_list("pk", flat=True)
+            )
+            unlinked = through.objects.filter(
+                bus_id__in=selected, facility_id__in=data["remove"]
+            )
+            changed = set(unlinked.values_list("bus_id", flat=True))
+            removed = unlinked.delete()[0] if changed else 0
+
+            linked = set(
+                through.objects.filter(
+                    bus_id__in=selected, facility_id__in=data["add"]
+                ).values_list("bus_id", "facility_id")
+            )
+            added = [
+                through(bus_id=bus_id, facility_id=facility_id)
+                for bus_id in bus_ids
+                for facility_id in data["add"]
+                if (bus_id, facility_id) not in linked
+            ]
+            through.objects.bulk_create(added, batch_size=5_000)
+            changed.update(link.bus_id for link in added)
+
+            fragments.invalidate(Bus, changed)
+        return Response(
+            {"buses": len(bus_ids), "added": len(added), "removed": removed}
+        )
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -96,16 +374,26 @@ class BusViewSet(viewsets.ModelViewSet):
             OpenApiParameter(
                 "facilities",
                 type={"type": "list", "items": {"type": "number"}},
-                description="Filter by facility id"
-            )
+                description="Filter by facility id",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
 
-class TripViewSet(viewsets.ModelViewSet):
+TRIP_BULK_RESPONSE = inline_serializer("TripBulk", {"trips": TripSerializer(many=True)})
+
+
+class TripViewSet(
+    FragmentCacheListMixin,
+    ColumnarListMixin,
+    SparseFieldsetViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Trip.objects.select_related("bus")
+    fragment_dependencies = ((Bus, "bus_id"),)
+    fragment_annotations = ("tickets_available",)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -116,26 +404,218 @@ class TripViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = self.queryset
-        if self.action in "list":
-            return queryset.select_related("bus").annotate(
-                tickets_available=F("bus__num_seats")
-                - Count("tickets")
-                # функция оптимизации и подсчета оставшихся билетов
-            )
+        if self.action == "list":
+            if self.wants_field("tickets_available"):
+                queryset = queryset.annotate(
+                    tickets_available=F("bus__num_seats")
+                    - Count("tickets")
+                    # функция оптимизации и подсчета оставшихся билетов
+                )
+            return self.sparse_queryset(queryset)
 
-        elif self.action in "retrieve":
-            queryset.select_related("bus")
+        elif self.action == "retrieve":
+            return self.sparse_queryset(
+                queryset.prefetch_related("bus__facility", "tickets")
+            )
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """Identical lists requested at the same time are computed once,
+        see station.single_flight."""
+        if not settings.TRIP_LIST_COALESCE:
+            return super().list(request, *args, **kwargs)
+
+        def compute():
+            return super(TripViewSet, self).list(request, *args, **kwargs).data
+
+        data = single_flight.trip_lists.do(
+            single_flight.request_key(request, "trips:list"),
+            compute,
+            wait=settings.TRIP_LIST_COALESCE_WAIT,
+            lock_dir=settings.TRIP_LIST_COALESCE_LOCK_DIR,
+            ttl=settings.TRIP_LIST_COALESCE_TTL,
+        )
+        return Response(data)
+
+    @staticmethod
+    def _bulk_items(data, key):
+        items = data.get(key) if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError({key: ["Expected a non-empty list."]})
+        if len(items) > settings.TRIP_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                {
+                    key: [
+                        f"At most {settings.TRIP_BULK_MAX_ITEMS} items per "
+                        f"request, not {len(items)}."
+                    ]
+                }
+            )
+        return items
+
+    def _bulk_context(self, items):
+        """Serializer context with every bus the items refer to, one query."""
+        bus_ids = set()
+        for item in items:
+            try:
+                bus_ids.add(int(item["bus"]))
+            except (TypeError, KeyError, ValueError):
+                pass  # reported by the serializer
+        return {**self.get_serializer_context(), "buses": Bus.objects.in_bulk(bus_ids)}
 
-class OrderSetPagination(PageNumberPagination):
+    @staticmethod
+    def _bulk_saved(trips, created=False):
+        # bulk_create/bulk_update send no post_save
+        transaction.on_commit(lambda: journeys.timetable.trips_saved(trips))
+        trip_ids = [trip.pk for trip in trips]
+        if not created:  # new trips are in nobody's orders yet
+            order_cache.invalidate_users(order_users(Trip, trip_ids))
+        fragments.invalidate(Trip, trip_ids)
+
+    @extend_schema(
+        request=inline_serializer(
+            "TripBulkCreate", {"trips": TripSerializer(many=True)}
+        ),
+        responses={201: TRIP_BULK_RESPONSE},
+    )
+    @action(detail=False, methods=["POST"], url_path="bulk")
+    def bulk(self, request):
+        """Create trips from ``{"trips": [...]}``, all or none; errors are
+        listed per item, in payload order."""
+        items = self._bulk_items(request.data, "trips")
+        serializer = TripBulkSerializer(
+            data=items, many=True, context=self._bulk_context(items)
+        )
+        if not serializer.is_valid():
+            return Response(
+                {"trips": serializer.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            trips = Trip.objects.bulk_create(
+                Trip(**attrs) for attrs in serializer.validated_data
+            )
+            self._bulk_saved(trips, created=True)
+        return Response(
+            {"trips": TripSerializer(trips, many=True).data},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        request=inline_serializer(
+            "TripBulkUpdate", {"trips": TripSerializer(many=True, partial=True)}
+        ),
+        responses=TRIP_BULK_RESPONSE,
+    )
+    @bulk.mapping.patch
+    def bulk_partial_update(self, request):
+        """Update trips from ``{"trips": [{"id": ..., <fields>}, ...]}``."""
+        items = self._bulk_items(request.data, "trips")
+        ids = set()
+        for item in items:
+            try:
+                ids.add(int(item["id"]))
+            except (TypeError, KeyError, ValueError):
+                pass
+        trips = Trip.objects.select_related("bus").in_bulk(ids)
+        context = self._bulk_context(items)
+
+        errors, updated, fields = [], [], set()
+        for item in items:
+            try:
+                trip = trips[int(item["id"])]
+            except (TypeError, KeyError, ValueError):
+                errors.append({"id": ["Expected the id of an existing trip."]})
+                continue
+            serializer = TripBulkSerializer(
+                trip, data=item, partial=True, context=context
+            )
+            if not serializer.is_valid():
+                errors.append(serializer.errors)
+                continue
+            errors.append({})
+            for field, value in serializer.validated_data.items():
+                setattr(trip, field, value)
+                fields.add(field)
+            updated.append(trip)
+        if any(errors):
+            return Response({"trips": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if fields:
+                Trip.objects.bulk_update(updated, fields)
+            self._bulk_saved(updated)
+        return Response({"trips": TripSerializer(updated, many=True).data})
+
+    @extend_schema(
+        request=inline_serializer(
+            "TripBulkDelete",
+            {"ids": serializers.ListField(child=serializers.IntegerField())},
+        ),
+        responses={204: None},
+    )
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete trips (and their tickets) from ``{"ids": [...]}``."""
+        ids = self._bulk_items(request.data, "ids")
+        valid_ids = {
+            pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)
+        }
+        existing = set(
+            Trip.objects.filter(pk__in=valid_ids).values_list("pk", flat=True)
+        )
+        errors = ["" if pk in existing else "Unknown trip id." for pk in ids]
+        if any(errors):
+            return Response({"ids": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # the cascaded tickets invalidate their users' order caches and are
+        # published as released once for the call, see release_deleted_tickets
+        with transaction.atomic():
+            Trip.objects.filter(pk__in=existing).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class JourneyViewSet(viewsets.ViewSet):
+    """Plan a journey from ``source`` to ``destination``, changing buses
+    where no trip connects them directly (see station.journeys)."""
+
+    authentication_classes = [TokenAuthentication]
+
+    @extend_schema(
+        parameters=[JourneyQuerySerializer],
+        responses={200: JourneySerializer, 404: None},
+    )
+    def list(self, request):
+        query = JourneyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        plan = (
+            journeys.timetable.earliest_arrival
+            if params["mode"] == "earliest"
+            else journeys.timetable.min_transfers
+        )
+        journey = plan(
+            params["source"],
+            params["destination"],
+            journeys.minutes(params["departure"]),
+            params["min_seats"],
+        )
+        if journey is None:
+            return Response(
+                {"detail": "No journey found."}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(JourneySerializer(journey).data)
+
+
+class OrderSetPagination(EstimatedCountPageNumberPagination):
     page_size = 3
     page_size_query_param = "page_size"
     max_page_size = 20
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     pagination_class = OrderSetPagination
@@ -143,15 +623,213 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = self.queryset.filter(user=self.request.user)
-        if self.action in "list":
+        if self.action == "list":
             queryset = queryset.prefetch_related("tickets__trip__bus")
-        return queryset
+        return self.sparse_queryset(queryset)
+
+    @extend_schema(responses={201: OrderSerializer, 202: BookingRequestSerializer})
+    def create(self, request, *args, **kwargs):
+        """Create an order; with the booking queue on, queue it and answer
+        202 with the booking request to poll (``Location``)."""
+        if not settings.BOOKING_QUEUE:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking = booking_queue.enqueue(
+            request.user, serializer.validated_data["tickets"]
+        )
+        data = BookingRequestSerializer(
+            booking, context=self.get_serializer_context()
+        ).data
+        return Response(
+            data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": data["url"],
+                "Retry-After": str(settings.BOOKING_QUEUE_RETRY_AFTER),
+            },
+        )
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user)  # the save invalidates order_cache
 
     def get_serializer_class(self):
         serializer = self.serializer_class
         if self.action == "list":
             serializer = OrderListSerializer
         return serializer
+
+    def list(self, request, *args, **kwargs):
+        # the full url: pagination links in the data are absolute
+        path = request.build_absolute_uri()
+        generation = order_cache.generation(request.user.pk)
+        data = order_cache.get_page(request.user.pk, generation, path)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        order_cache.set_page(request.user.pk, generation, path, response.data)
+        return response
+
+    @extend_schema(responses=ArchivedOrderSerializer(many=True))
+    @action(detail=False, methods=["GET"])
+    def archived(self, request):
+        """Orders moved to the archive by ``archive_orders``, newest first."""
+        queryset = (
+            ArchivedOrder.objects.filter(user=request.user)
+            .order_by("-created_at", "-pk")
+            .prefetch_related("tickets__trip__bus")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = ArchivedOrderSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        responses=inline_serializer(
+            "OrderSummary",
+            {
+                "orders": serializers.IntegerField(),
+                "tickets": serializers.IntegerField(),
+                "upcoming_trips": serializers.IntegerField(),
+            },
+        )
+    )
+    @action(detail=False, methods=["GET"])
+    def summary(self, request):
+        """Order and ticket totals and the number of trips still to depart today."""
+        generation = order_cache.generation(request.user.pk)
+        summary = order_cache.get_summary(request.user.pk, generation)
+        if summary is None:
+            tickets = Ticket.objects.filter(order__user=request.user)
+            summary = {
+                "orders": Order.objects.filter(user=request.user).count(),
+                "tickets": tickets.count(),
+                # kept sorted, so upcoming trips are counted without a query
+                "departures": sorted(
+                    departure
+                    for _, departure in Trip.objects.filter(
+                        tickets__order__user=request.user
+                    )
+                    .values_list("id", "departure")
+                    .distinct()
+                ),
+            }
+            order_cache.set_summary(request.user.pk, generation, summary)
+
+        departures = summary["departures"]
+        now = timezone.localtime().time()
+        return Response(
+            {
+                "orders": summary["orders"],
+                "tickets": summary["tickets"],
+                "upcoming_trips": len(departures) - bisect_right(departures, now),
+            }
+        )
+
+
+class BookingRequestViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """Orders queued by ``POST /orders/`` while the booking queue is on
+    (station/booking_queue.py), newest first."""
+
+    queryset = BookingRequest.objects.all()
+    serializer_class = BookingRequestSerializer
+    pagination_class = OrderSetPagination
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        return (
+            self.queryset.filter(user=self.request.user)
+            .select_related("order")
+            .prefetch_related("order__tickets")
+            .order_by("-created_at", "pk")
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.data["status"] == BookingRequest.QUEUED:
+            response["Retry-After"] = str(settings.BOOKING_QUEUE_RETRY_AFTER)
+        return response
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class TripSeatEventsView(generics.GenericAPIView):
+    """Server-Sent Events stream of a trip's seats.
+
+    Sends the sold seats ("seats"), then a "seat" event for every seat
+    sold or released, a comment every ``SEAT_EVENTS_HEARTBEAT`` seconds
+    while nothing happens, and "resync" (then closes) if the client fell
+    too far behind. "seats" is sent again every
+    ``SEAT_EVENTS_RESYNC_INTERVAL`` seconds: "seat" events only come from
+    this worker process (station.seat_events). The token goes in the
+    Authorization header as for the other endpoints, so browsers need a
+    fetch based EventSource.
+
+    An open stream holds a worker thread (gunicorn.conf.py); the heartbeat
+    is what finds out a client went away, the write fails and the server
+    closes the stream, which unsubscribes it. Past
+    ``SEAT_EVENTS_MAX_STREAMS`` open streams in the process the answer is
+    503, with Retry-After.
+    """
+
+    queryset = Trip.objects.select_related("bus")
+    authentication_classes = [TokenAuthentication]
+    renderer_classes = [JSONRenderer, PassthroughRenderer]
+
+    @extend_schema(responses={(200, "text/event-stream"): OpenApiTypes.STR})
+    def get(self, request, pk):
+        trip = self.get_object()
+        # streams subscribe once sent, so the count can be short by the
+        # ones opening at the same time
+        if seat_events.broker.subscriber_count() >= settings.SEAT_EVENTS_MAX_STREAMS:
+            # a closed client's stream is found out by the next heartbeat
+            return Response(
+                {"detail": "Too many seat streams are open, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.SEAT_EVENTS_HEARTBEAT)},
+            )
+        response = StreamingHttpResponse(
+            self.stream(trip), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx must not buffer the stream
+        return response
+
+    @staticmethod
+    def stream(trip):
+        # subscribed on the first read, so a response that is never sent
+        # leaves nothing behind; subscribed before the snapshot is read, so
+        # nothing is missed in between (an event may repeat the snapshot,
+        # which is harmless)
+        subscription = seat_events.broker.subscribe(trip.pk)
+        try:
+            while True:
+                sold = list(
+                    Ticket.objects.filter(trip=trip)
+                    .order_by("seat")
+                    .values_list("seat", flat=True)
+                )
+                yield _sse(
+                    "seats",
+                    {"trip": trip.pk, "num_seats": trip.bus.num_seats, "sold": sold},
+                )
+                resync_at = time.monotonic() + settings.SEAT_EVENTS_RESYNC_INTERVAL
+                while (wait := resync_at - time.monotonic()) > 0:
+                    try:
+                        event = subscription.get(
+                            min(wait, settings.SEAT_EVENTS_HEARTBEAT)
+                        )
+                    except seat_events.SubscriberLagged:
+                        yield _sse("resync", {"trip": trip.pk})
+                        return
+                    if event is not None:
+                        yield _sse("seat", event)
+                    elif resync_at > time.monotonic():
+                        yield ": keep-alive\n\n"
+        finally:
+            subscription.close()
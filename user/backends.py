@@ -0,0 +1,15 @@
+from django.contrib.auth.backends import ModelBackend
+
+from user.hashing import hashing_slot
+
+
+class HashingSlotBackend(ModelBackend):
+    """ModelBackend checking the password in one of the host's hashing
+    slots (user/hashing.py); a password stored with an outdated hasher or
+    work factor is rehashed and saved by ``check_password`` as usual."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        with hashing_slot():
+            return super().authenticate(
+                request, username=username, password=password, **kwargs
+            )
@@ -0,0 +1,72 @@
+"""Password hashing bounded per host.
+
+PBKDF2 and friends are deliberately slow. Logins (HashingSlotBackend) and
+new users (UserManager) hash in the request's thread, gunicorn.conf.py
+runs threaded workers and the hashers release the GIL while they work,
+but first take one of ``PASSWORD_HASHING_WORKERS`` slots. With
+``PASSWORD_HASHING_LOCK_DIR`` set the slots are ``flock``-ed files there,
+shared by all the worker processes of the host, so a login storm keeps
+at most that many cores busy whatever the number of workers and the
+other endpoints keep the rest; requests beyond that wait for a slot.
+Without it the limit is per process.
+"""
+
+import contextlib
+import fcntl
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password as django_make_password
+
+LOCK_POLL_INTERVAL = 0.01
+
+_semaphores = {}  # number of slots -> semaphore of this process
+_semaphores_lock = threading.Lock()
+
+
+def _process_slots(count):
+    with _semaphores_lock:
+        if count not in _semaphores:
+            _semaphores[count] = threading.BoundedSemaphore(count)
+        return _semaphores[count]
+
+
+@contextlib.contextmanager
+def hashing_slot():
+    """Hold one of the host's hashing slots, waiting for one if needed."""
+    count = settings.PASSWORD_HASHING_WORKERS
+    with _process_slots(count):
+        lock_dir = settings.PASSWORD_HASHING_LOCK_DIR
+        if not lock_dir:
+            yield
+            return
+
+        directory = pathlib.Path(lock_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            for slot in range(count):
+                with open(directory / f"slot-{slot}.lock", "a") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # another process hashes in this one
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    return
+            time.sleep(LOCK_POLL_INTERVAL)
+
+
+def make_password(password):
+    with hashing_slot():
+        return django_make_password(password)
+
+
+def make_passwords(passwords):
+    """Hash many passwords at once, in as many threads as there are slots."""
+    with ThreadPoolExecutor(settings.PASSWORD_HASHING_WORKERS) as executor:
+        return list(executor.map(make_password, passwords))
@@ -0,0 +1,126 @@
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from django_rest_lesson.benchmarks import percentile
+
+BENCH_EMAIL = "bench-login@test.test"
+BENCH_PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a login storm against a running server and report login "
+        "throughput per core and the latency of another endpoint meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--login-path", default="/api/user/login/")
+        parser.add_argument("--probe-path", default="/api/station/facilities/")
+        parser.add_argument("--login-threads", type=int, default=16)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument(
+            "--cores",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="cores available to the server, used for per-core numbers",
+        )
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(email=BENCH_EMAIL)
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+        token, _ = Token.objects.get_or_create(user=user)
+
+        probe_url = options["base_url"] + options["probe_path"]
+        login_url = options["base_url"] + options["login_path"]
+        duration = options["duration"]
+
+        idle = self._probe(probe_url, token.key, duration)
+
+        stop = threading.Event()
+        logins, errors = [], []
+        storm = [
+            threading.Thread(
+                target=self._login_loop, args=(login_url, stop, logins, errors)
+            )
+            for _ in range(options["login_threads"])
+        ]
+        started = time.perf_counter()
+        for thread in storm:
+            thread.start()
+        busy = self._probe(probe_url, token.key, duration)
+        stop.set()
+        for thread in storm:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        rate = len(logins) / elapsed
+        self.stdout.write(f"login path:          {options['login_path']}")
+        self.stdout.write(
+            f"logins:              {len(logins)} ok, {len(errors)} failed "
+            f"in {elapsed:.1f}s"
+        )
+        self.stdout.write(
+            f"login throughput:    {rate:.1f}/s, {rate / options['cores']:.1f}/s per core"
+        )
+        if logins:
+            self.stdout.write(
+                "login latency:       p50 {:.1f}ms p99 {:.1f}ms".format(
+                    percentile(logins, 50) * 1000, percentile(logins, 99) * 1000
+                )
+            )
+        for label, samples in (("idle", idle), ("during storm", busy)):
+            self.stdout.write(
+                "{:<20} p50 {:.1f}ms p95 {:.1f}ms p99 {:.1f}ms (mean {:.1f}ms, n={})".format(
+                    f"probe {label}:",
+                    percentile(samples, 50) * 1000,
+                    percentile(samples, 95) * 1000,
+                    percentile(samples, 99) * 1000,
+                    statistics.fmean(samples) * 1000 if samples else 0.0,
+                    len(samples),
+                )
+            )
+
+    @staticmethod
+    def _timed(request):
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+        return time.perf_counter() - started
+
+    def _probe(self, url, token, duration):
+        samples = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            request = urllib.request.Request(
+                url, headers={"Authorization": f"Token {token}"}
+            )
+            try:
+                samples.append(self._timed(request))
+            except urllib.error.HTTPError as error:
+                # e.g. 429 from the user throttle, raise its rate for benchmarks
+                raise CommandError(f"probe request failed: {error}")
+        return samples
+
+    def _login_loop(self, url, stop, logins, errors):
+        body = json.dumps(
+            {"username": BENCH_EMAIL, "password": BENCH_PASSWORD}
+        ).encode()
+        while not stop.is_set():
+            request = urllib.request.Request(
+                url, data=body, headers={"Content-Type": "application/json"}
+            )
+            try:
+                logins.append(self._timed(request))
+            except (urllib.error.URLError, OSError) as error:
+                errors.append(error)
@@ -0,0 +1,44 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV file with email and password columns "
+        "(first_name and last_name are optional)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="rows validated and inserted together",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["csv_file"], newline="") as csv_file:
+                rows = list(csv.DictReader(csv_file))
+        except OSError as error:
+            raise CommandError(error)
+
+        chunk_size = options["chunk_size"]
+        created_count = 0
+        for start in range(0, len(rows), chunk_size):
+            created, errors = provision_users(rows[start : start + chunk_size])
+            created_count += len(created)
+            for error in errors:
+                # +2: header line and 1-based line numbers
+                self.stderr.write(
+                    f"line {start + error['row'] + 2}: {json.dumps(error['errors'])}"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Created {created_count} of {len(rows)} users.")
+        )
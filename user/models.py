@@ -6,6 +6,8 @@ from django.contrib.auth.models import (
 from django.db import models
 from django.utils.translation import gettext as _
 
+from user.hashing import hashing_slot
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -20,7 +22,8 @@ class UserManager(BaseUserManager):
 
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        with hashing_slot():
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -0,0 +1,116 @@
+"""Create many users at once (staff bulk endpoint and provision_users command)."""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from user.hashing import make_passwords
+
+TAKEN_ERRORS = {"email": ["User with this email already exists."]}
+
+
+class ProvisionUserSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField(min_length=5, max_length=50, trim_whitespace=False)
+    first_name = serializers.CharField(max_length=150, required=False, default="")
+    last_name = serializers.CharField(max_length=150, required=False, default="")
+
+
+def provision_users(rows):
+    """Validate, hash and insert ``rows`` (dicts with email and password).
+
+    Returns ``(created, errors)``: ``created`` is a list of
+    ``{"row", "id", "email"}`` and ``errors`` a list of ``{"row", "errors"}``,
+    where ``row`` is the index of the input row. Valid rows are created even
+    when other rows fail.
+    """
+    user_model = get_user_model()
+    errors = []
+    valid = {}  # email -> (row, validated data)
+
+    for row, data in enumerate(rows):
+        serializer = ProvisionUserSerializer(data=data)
+        if not serializer.is_valid():
+            errors.append({"row": row, "errors": serializer.errors})
+            continue
+        attrs = dict(serializer.validated_data)
+        attrs["email"] = user_model.objects.normalize_email(attrs["email"])
+        if attrs["email"] in valid:
+            errors.append(
+                {"row": row, "errors": {"email": ["Duplicate email in this batch."]}}
+            )
+            continue
+        valid[attrs["email"]] = (row, attrs)
+
+    valid, taken = _drop_existing(valid)
+    errors.extend(taken)
+
+    rows_to_create = list(valid.values())
+    passwords = make_passwords(attrs.pop("password") for _, attrs in rows_to_create)
+    users = []
+    for (_, attrs), password in zip(rows_to_create, passwords):
+        user = user_model(**attrs)
+        user.password = password
+        users.append(user)
+
+    try:
+        with transaction.atomic():
+            user_model.objects.bulk_create(
+                users, batch_size=settings.USER_PROVISIONING_BATCH_SIZE
+            )
+    except IntegrityError:
+        # someone registered one of the emails meanwhile, check again and retry
+        valid, taken = _drop_existing(valid)
+        errors.extend(taken)
+        users = [user for user in users if user.email in valid]
+        try:
+            with transaction.atomic():
+                user_model.objects.bulk_create(
+                    users, batch_size=settings.USER_PROVISIONING_BATCH_SIZE
+                )
+        except IntegrityError:
+            # still racing, insert the users one at a time to find the rows
+            users, taken = _create_one_by_one(users, valid)
+            errors.extend(taken)
+
+    if users and users[0].pk is None:
+        # backends without RETURNING don't set pks on bulk_create
+        ids = dict(
+            user_model.objects.filter(email__in=valid).values_list("email", "id")
+        )
+        for user in users:
+            user.pk = ids[user.email]
+
+    created = [
+        {"row": valid[user.email][0], "id": user.pk, "email": user.email}
+        for user in users
+    ]
+    errors.sort(key=lambda error: error["row"])
+    return created, errors
+
+
+def _create_one_by_one(users, valid):
+    created, taken = [], []
+    for user in users:
+        user.pk = None  # may be set by a batch rolled back above
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            taken.append({"row": valid[user.email][0], "errors": TAKEN_ERRORS})
+        else:
+            created.append(user)
+    return created, taken
+
+
+def _drop_existing(valid):
+    existing = set(
+        get_user_model()
+        .objects.filter(email__in=list(valid))
+        .values_list("email", flat=True)
+    )
+    taken = [{"row": valid[email][0], "errors": TAKEN_ERRORS} for email in existing]
+    return {
+        email: item for email, item in valid.items() if email not in existing
+    }, taken
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model, authenticate
-from pip._internal.utils._jaraco_text import _
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from user.hashing import hashing_slot
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,7 +29,8 @@ class UserSerializer(serializers.ModelSerializer):
         user = super().update(instance, validated_data)
 
         if password:
-            user.set_password(password)
+            with hashing_slot():
+                user.set_password(password)
             user.save()
 
         return user
@@ -1,3 +1,227 @@
-from django.test import TestCase
+import fcntl
+import pathlib
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-# Create your 1 here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import hashing
+
+REGISTER_URL = reverse("user:create")
+LOGIN_URL = reverse("user:token")
+
+MD5_HASHER = "django.contrib.auth.hashers.MD5PasswordHasher"
+SCRYPT_HASHER = "django.contrib.auth.hashers.ScryptPasswordHasher"
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER])
+class RegisterTests(TestCase):
+    def test_register_hashes_password(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                email="admin@test.test", password="testpassword", is_staff=True
+            )
+        )
+
+        with mock.patch(
+            "user.models.hashing_slot", wraps=hashing.hashing_slot
+        ) as hashing_slot:
+            res = client.post(
+                REGISTER_URL, {"email": "new@test.test", "password": "testpassword"}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        hashing_slot.assert_called_once()
+        self.assertNotIn("password", res.json())
+        user = get_user_model().objects.get(email="new@test.test")
+        self.assertTrue(user.password.startswith("md5$"))
+        self.assertTrue(user.check_password("testpassword"))
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER])
+class ManageUserTests(TestCase):
+    def test_password_change_hashes_in_a_slot(self):
+        user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with mock.patch(
+            "user.serializers.hashing_slot", wraps=hashing.hashing_slot
+        ) as hashing_slot:
+            res = client.patch(reverse("user:manage_user"), {"password": "newpassword"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        hashing_slot.assert_called_once()
+        user.refresh_from_db()
+        self.assertTrue(user.check_password("newpassword"))
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER])
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+
+    def login(self, password="testpassword"):
+        return self.client.post(
+            LOGIN_URL, {"username": "test@test.test", "password": password}
+        )
+
+    def test_login_returns_token(self):
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        token = Token.objects.get(user=self.user)
+        self.assertEqual(res.json()["token"], token.key)
+
+    def test_login_wrong_password(self):
+        self.assertEqual(self.login("wrong").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_rehashes_outdated_password(self):
+        with self.settings(PASSWORD_HASHERS=[SCRYPT_HASHER, MD5_HASHER]):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$"))
+
+    def test_login_keeps_current_hash(self):
+        old_password = self.user.password
+
+        self.login()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, old_password)
+
+
+class HashingSlotTests(SimpleTestCase):
+    def test_slots_are_shared_through_the_lock_dir(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        hashed = threading.Event()
+
+        def hash_in_slot():
+            with hashing.hashing_slot():
+                hashed.set()
+
+        with self.settings(
+            PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_LOCK_DIR=lock_dir
+        ):
+            # another process holding the only slot
+            with open(pathlib.Path(lock_dir) / "slot-0.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                waiting = threading.Thread(target=hash_in_slot)
+                waiting.start()
+                self.assertFalse(hashed.wait(0.1))
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self.assertTrue(hashed.wait(5))
+            waiting.join()
+
+    @override_settings(PASSWORD_HASHERS=[MD5_HASHER], PASSWORD_HASHING_WORKERS=2)
+    def test_make_passwords_keeps_the_order(self):
+        passwords = [f"password{number}" for number in range(5)]
+
+        hashes = hashing.make_passwords(passwords)
+
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+
+
+class PasswordHasherSettingsTests(TestCase):
+    def test_preferred_hasher_is_first(self):
+        self.assertEqual(
+            settings.PASSWORD_HASHERS[0],
+            settings.PASSWORD_HASHER_CHOICES[settings.PASSWORD_HASHER],
+        )
+        self.assertTrue(
+            make_password("testpassword").startswith(settings.PASSWORD_HASHER)
+        )
+
+
+BULK_URL = reverse("user:bulk-create")
+
+
+@override_settings(PASSWORD_HASHERS=[MD5_HASHER])
+class BulkCreateUserTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            email="admin@test.test", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_staff_only(self):
+        user = get_user_model().objects.create_user(
+            email="test@test.test", password="testpassword"
+        )
+        self.client.force_authenticate(user)
+        res = self.client.post(BULK_URL, {"users": []}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_reports_per_row_errors(self):
+        payload = {
+            "users": [
+                {"email": "one@test.test", "password": "password1"},
+                {"email": "not-an-email", "password": "password2"},
+                {"email": "admin@test.test", "password": "password3"},
+                {"email": "two@test.test", "password": "password4"},
+                {"email": "one@test.test", "password": "password5"},
+            ]
+        }
+
+        with self.assertNumQueries(4):  # duplicates check, savepoint, insert, release
+            res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(item["row"], item["email"]) for item in res.data["created"]],
+            [(0, "one@test.test"), (3, "two@test.test")],
+        )
+        self.assertEqual([item["row"] for item in res.data["errors"]], [1, 2, 4])
+        user = get_user_model().objects.get(email="two@test.test")
+        self.assertTrue(user.check_password("password4"))
+
+    def test_rows_registered_during_the_retry_are_reported(self):
+        get_user_model().objects.create_user(email="race@test.test")
+        rows = [
+            {"email": "one@test.test", "password": "password1"},
+            {"email": "race@test.test", "password": "password2"},
+        ]
+
+        # as if race@ was registered after each check for existing emails
+        with mock.patch(
+            "user.provisioning._drop_existing", side_effect=lambda valid: (valid, [])
+        ):
+            res = self.client.post(BULK_URL, {"users": rows}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item["row"] for item in res.data["created"]], [0])
+        self.assertEqual(res.data["errors"][0]["row"], 1)
+        self.assertIn("email", res.data["errors"][0]["errors"])
+        self.assertTrue(get_user_model().objects.filter(email="one@test.test").exists())
+
+    def test_all_rows_invalid(self):
+        res = self.client.post(
+            BULK_URL, {"users": [{"email": "x@test.test"}]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", res.data["errors"][0]["errors"])
+
+    @override_settings(USER_PROVISIONING_MAX_ROWS=1)
+    def test_max_rows(self):
+        rows = [{"email": f"{i}@test.test", "password": "password"} for i in range(2)]
+        res = self.client.post(BULK_URL, {"users": rows}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,15 @@
 from django.urls import path
 
-from user.views import CreateUserView, CreateTokenView, ManageUserView
+from user.views import (
+    CreateUserView,
+    CreateTokenView,
+    ManageUserView,
+    BulkCreateUserView,
+)
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
+    path("bulk/", BulkCreateUserView.as_view(), name="bulk-create"),
     path("login/", CreateTokenView.as_view(), name="token"),
     path("me/", ManageUserView.as_view(), name="manage_user"),
 ]
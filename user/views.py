@@ -1,10 +1,14 @@
-from rest_framework import generics
+from django.conf import settings
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import generics, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from user.provisioning import ProvisionUserSerializer, provision_users
 from user.serializers import UserSerializer
 
 
@@ -24,3 +28,44 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         return self.request.user
+
+
+class BulkCreateUserView(generics.GenericAPIView):
+    """Staff only: create many users from ``{"users": [{email, password}, ...]}``.
+
+    Returns the created users and per-row errors; valid rows are created
+    even if some rows fail.
+    """
+
+    serializer_class = ProvisionUserSerializer
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        request=inline_serializer(
+            "BulkProvisionRequest", {"users": ProvisionUserSerializer(many=True)}
+        )
+    )
+    def post(self, request, *args, **kwargs):
+        rows = request.data.get("users") if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"users": ["Expected a non-empty list of users."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > settings.USER_PROVISIONING_MAX_ROWS:
+            return Response(
+                {
+                    "users": [
+                        f"At most {settings.USER_PROVISIONING_MAX_ROWS} users "
+                        f"per request, not {len(rows)}."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created, errors = provision_users(rows)
+        return Response(
+            {"created": created, "errors": errors},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )